@@ -0,0 +1,195 @@
+"""
+Canonical request URLs - one URL (and one fetch) per page, however the link
+to it was written.
+
+A listing reachable as /televize.html, /televize.html?sort=price&utm_source=x
+and /televize.html/ is one page. canonicalize() turns every variant into
+the same URL:
+
+  * query parameters sorted, percent-encoding normalised, fragment dropped
+    (w3lib canonicalize_url, what Scrapy's fingerprint uses as well)
+  * tracking and sort/view parameters dropped per site (URL_CANONICAL_RULES,
+    `*` = every site; names may end with `*` to match a prefix)
+  * trailing slash of the path stripped or added (`trailing_slash`)
+
+It is used in two places:
+
+  CanonicalRequestFingerprinter  (REQUEST_FINGERPRINTER_CLASS) - every
+      dupefilter (Scrapy's, DiskScheduler, DistributedScheduler) sees the
+      canonical URL. URLs that need no rewrite keep Scrapy's fingerprint,
+      so existing crawl state stays valid; so do redirect targets - the
+      server's choice of slash form or parameters wins over the rules.
+  canonical_request()  - spiders send the canonical URL itself (DatartSpider
+      rules' process_request, PlaneoSpider pagination), the rewritten
+      request remembers the original in meta['canonical_from'].
+
+Per run stats: canonical/rewritten, canonical/dropped/<param> and
+canonical/fetches_avoided - distinct URL variants dropped because their
+canonical URL was already seen (a variant repeated verbatim would have
+been filtered anyway and is not counted).
+"""
+
+import hashlib
+import weakref
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+from scrapy import signals
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.utils.request import fingerprint
+from w3lib.url import canonicalize_url
+
+# crawler -> CanonicalRequestFingerprinter
+_canonicalizers = weakref.WeakKeyDictionary()
+
+
+class UrlCanonicalizer:
+    """Applies URL_CANONICAL_RULES - {domain: {'drop': [...], 'trailing_slash': 'strip'|'add'|None}}"""
+
+    def __init__(self, rules=None):
+        rules = rules or {}
+        self.default = rules.get('*', {})
+        self.domains = {domain: rule for domain, rule in rules.items() if domain != '*'}
+        self._hosts = {}
+
+    def rules_for(self, host):
+        """Merged rule of a host - '*' plus every domain it matches by suffix"""
+        rule = self._hosts.get(host)
+        if rule is None:
+            drop = set(self.default.get('drop', ()))
+            trailing_slash = self.default.get('trailing_slash')
+            for domain, domain_rule in self.domains.items():
+                if host == domain or host.endswith('.' + domain):
+                    drop.update(domain_rule.get('drop', ()))
+                    trailing_slash = domain_rule.get('trailing_slash', trailing_slash)
+            exact = frozenset(name for name in drop if not name.endswith('*'))
+            prefixes = tuple(name[:-1] for name in drop if name.endswith('*'))
+            rule = self._hosts[host] = (exact, prefixes, trailing_slash)
+        return rule
+
+    def canonicalize(self, url):
+        """Canonical form of `url` and the dropped parameter names"""
+        url = canonicalize_url(url)
+        parts = urlsplit(url)
+        exact, prefixes, trailing_slash = self.rules_for(parts.hostname or '')
+
+        dropped = []
+        query = parts.query
+        if query and (exact or prefixes):
+            # dvojice zustavaji tak, jak je zakodoval canonicalize_url
+            kept = []
+            for pair in query.split('&'):
+                name = unquote_plus(pair.split('=', 1)[0])
+                if name in exact or name.startswith(prefixes):
+                    dropped.append(name)
+                else:
+                    kept.append(pair)
+            if dropped:
+                query = '&'.join(kept)
+
+        path = parts.path
+        if trailing_slash == 'strip' and len(path) > 1 and path.endswith('/'):
+            path = path.rstrip('/') or '/'
+        elif trailing_slash == 'add' and not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]:
+            path += '/'
+
+        if dropped or path != parts.path:
+            url = urlunsplit((parts.scheme, parts.netloc, path, query, ''))
+        return url, dropped
+
+
+class CanonicalRequestFingerprinter:
+    """Scrapy's request fingerprint computed over the canonical URL"""
+
+    def __init__(self, crawler=None):
+        settings = crawler.settings if crawler is not None else {}
+        self.canonicalizer = UrlCanonicalizer(settings.get('URL_CANONICAL_RULES'))
+        self.stats = crawler.stats if crawler is not None else None
+        self._cache = weakref.WeakKeyDictionary()
+        self._variants = set()
+        self.rewritten = 0
+        self.avoided = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        fingerprinter = cls(crawler)
+        _canonicalizers[crawler] = fingerprinter
+        crawler.signals.connect(fingerprinter.spider_closed, signal=signals.spider_closed)
+        return fingerprinter
+
+    def fingerprint(self, request):
+        cached = self._cache.get(request)
+        if cached is None:
+            url, _ = self.canonicalizer.canonicalize(request.url)
+            # presmerovani ma posledni slovo - /a -> /a/ by jinak byla "duplicita" a stranka by se ztratila
+            if url != request.url and not request.meta.get('verbatim_url') and not request.meta.get('redirect_urls'):
+                request_fp = fingerprint(request.replace(url=url))
+            else:
+                request_fp = fingerprint(request)
+            cached = self._cache[request] = request_fp
+        return cached
+
+    def rewrite(self, request):
+        """Request for the canonical URL (the same request if it already is one)"""
+        url, dropped = self.canonicalizer.canonicalize(request.url)
+        if url == request.url:
+            return request
+        self.rewritten += 1
+        if self.stats is not None:
+            self.stats.inc_value('canonical/rewritten')
+            for name in dropped:
+                self.stats.inc_value(f'canonical/dropped/{name}')
+        return request.replace(url=url, meta=dict(request.meta, canonical_from=request.url))
+
+    def observe(self, request, duplicate):
+        """Dupefilter verdict for a request - counts variants that canonicalisation saved a fetch for"""
+        raw = request.meta.get('canonical_from', request.url)
+        if request.meta.get('redirect_urls') or raw == request.url and self.canonicalizer.canonicalize(raw)[0] == raw:
+            return
+        # 8 bajtu na variantu - jen URL, ktere se prepisuji
+        key = hashlib.sha1(raw.encode('utf-8')).digest()[:8]
+        if key in self._variants:
+            return
+        self._variants.add(key)
+        if duplicate:
+            self.avoided += 1
+            if self.stats is not None:
+                self.stats.inc_value('canonical/fetches_avoided')
+
+    def spider_closed(self, spider):
+        spider.logger.info(f"Canonical URLs: {self.rewritten} requests rewritten, "
+                           f"{self.avoided} duplicate fetches avoided")
+
+
+class CanonicalDupeFilter(RFPDupeFilter):
+    """Scrapy's dupefilter reporting its verdicts to the canonical fingerprinter"""
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        dupefilter = super().from_crawler(crawler)
+        dupefilter.crawler = crawler
+        return dupefilter
+
+    def request_seen(self, request):
+        duplicate = super().request_seen(request)
+        observe_request(self.crawler, request, duplicate)
+        return duplicate
+
+
+def canonicalizer_for(crawler):
+    """The CanonicalRequestFingerprinter of a crawler, None with another fingerprinter"""
+    return _canonicalizers.get(crawler) if crawler is not None else None
+
+
+def observe_request(crawler, request, duplicate):
+    """For schedulers with their own dupefilter (diskqueue, distributed)"""
+    canonicalizer = canonicalizer_for(crawler)
+    if canonicalizer is not None:
+        canonicalizer.observe(request, duplicate)
+
+
+def canonical_request(spider, request):
+    """`request` rewritten to its canonical URL - for spiders building their own requests"""
+    canonicalizer = canonicalizer_for(getattr(spider, 'crawler', None))
+    if canonicalizer is None:
+        return request
+    return canonicalizer.rewrite(request)
@@ -0,0 +1,253 @@
+"""
+Category taxonomy - one canonical tree for all shops.
+
+Every shop names its categories differently (Datart's GTM path
+"Velké spotřebiče/Lednice/Kombinované lednice", Mironet's URL slug
+"Mobilni Telefony+C10737", Planeo's "Mobily a chytré hodinky"). TREE below
+is the canonical tree with stable integer ids and ALIASES maps each shop's
+names onto it. Both are synced into the `categories` and `category_aliases`
+tables, and BatchWriter stores the resolved id in products.category_id, so
+the web app filters on an indexed integer and builds its nav from the tree.
+
+    python -m Scraper.categories                 # raw categories without a mapping
+    python -m Scraper.categories --remap         # re-resolve every product
+
+Editing TREE or ALIASES is enough - the next crawl (or --remap) notices the
+changed version and re-resolves the products already in the database.
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+
+from Scraper.textnorm import fold
+
+# (id, slug, name, parent slug) - id se nikdy nemeni, nove kategorie na konec skupiny
+TREE = (
+    (1, 'tv-audio-video', 'TV, audio, video', None),
+    (2, 'televize', 'Televize', 'tv-audio-video'),
+    (3, 'projektory', 'Projektory', 'tv-audio-video'),
+    (4, 'set-top-boxy', 'Set-top boxy', 'tv-audio-video'),
+    (10, 'pocitace', 'Počítače a notebooky', None),
+    (11, 'notebooky', 'Notebooky', 'pocitace'),
+    (12, 'stolni-pocitace', 'Stolní počítače', 'pocitace'),
+    (13, 'tablety', 'Tablety', 'pocitace'),
+    (20, 'mobily', 'Mobily a hodinky', None),
+    (21, 'mobilni-telefony', 'Mobilní telefony', 'mobily'),
+    (22, 'hodinky', 'Hodinky', 'mobily'),
+    (30, 'velke-spotrebice', 'Velké spotřebiče', None),
+    (31, 'lednice', 'Lednice', 'velke-spotrebice'),
+    (32, 'pracky', 'Pračky', 'velke-spotrebice'),
+    (40, 'male-spotrebice', 'Malé spotřebiče', None),
+    (41, 'kuchynske-potreby', 'Kuchyňské potřeby', 'male-spotrebice'),
+    (50, 'pece-o-telo', 'Péče o tělo a zdraví', None),
+    (51, 'feny', 'Fény', 'pece-o-telo'),
+    (60, 'dum-a-zahrada', 'Dům, dílna a zahrada', None),
+    (61, 'auto-moto', 'Auto-moto', 'dum-a-zahrada'),
+    (62, 'osvetleni', 'Osvětlení', 'dum-a-zahrada'),
+    (63, 'nabytek', 'Nábytek', 'dum-a-zahrada'),
+    (64, 'chovatelske-potreby', 'Chovatelské potřeby', 'dum-a-zahrada'),
+    (70, 'hry-a-zabava', 'Hry a zábava', None),
+    (71, 'herni-konzole', 'Herní konzole', 'hry-a-zabava'),
+    (72, 'hracky', 'Hračky', 'hry-a-zabava'),
+    (73, 'hudebni-nastroje', 'Hudební nástroje', 'hry-a-zabava'),
+    (74, 'sport-a-outdoor', 'Sport a outdoor', 'hry-a-zabava'),
+    (90, 'ostatni', 'Ostatní', None),
+)
+
+# shop -> {nazev kategorie v shopu: slug}; klice se porovnavaji po fold()
+# '*' plati pro vsechny shopy, nazvy a slugy z TREE jsou aliasy automaticky
+ALIASES = {
+    '*': {
+        'TV, foto, audio, video': 'tv-audio-video',
+        'TV, foto, audio video': 'tv-audio-video',
+        'Notebooky, PC, tablety a IT příslušenství': 'pocitace',
+        'Mobily a chytré hodinky': 'mobily',
+        'Mobil. T.': 'mobilni-telefony',
+        'Hodinky a hodiny': 'hodinky',
+        'Velké domácí spotřebiče': 'velke-spotrebice',
+        'Malé domácí spotřebiče': 'male-spotrebice',
+        'Dům a domácí potřeby': 'dum-a-zahrada',
+        'Dílna a zahrada': 'dum-a-zahrada',
+        'Auto, moto': 'auto-moto',
+        'Herní konzole, zábava, média': 'herni-konzole',
+        'Hračky a dětské potřeby': 'hracky',
+        'Cestování, sport a outdoor': 'sport-a-outdoor',
+        'Drogerie': 'ostatni',
+        'Potraviny': 'ostatni',
+    },
+    'dtrspider': {
+        'Dům, dílna, zahrada, auto, moto': 'dum-a-zahrada',
+        'Kombinované lednice': 'lednice',
+        'Kombinované lednice s mrazákem dole': 'lednice',
+        'Vestavné lednice': 'lednice',
+        'Vestavné lednice s mrazákem dole': 'lednice',
+        'Projektory pro domácí kino': 'projektory',
+        'Videotechnika': 'tv-audio-video',
+        'Péče o vlasy': 'pece-o-telo',
+        'Autožárovky': 'auto-moto',
+        'Hevery': 'auto-moto',
+        'Nosiče a příčky na auto': 'auto-moto',
+        'Startovací boxy': 'auto-moto',
+        'Elektronika a doplňky pro domácí mazlíčky': 'chovatelske-potreby',
+        'Péče o srst': 'chovatelske-potreby',
+        'Uchování a transport potravin': 'kuchynske-potreby',
+    },
+    'mironetspider': {
+        'Mobilni Telefony': 'mobilni-telefony',
+        'Pc Mironet': 'stolni-pocitace',
+        'Macbook': 'notebooky',
+        'Gravitrax': 'hracky',
+    },
+    'planeospider': {
+        'Výhodné sety': 'ostatni',
+        'Multifunkční příslušenství': 'ostatni',
+    },
+}
+
+# Datart drzi celou cestu ("A%s%B%s%C" ze starsich crawlu, "A/B/C" z GTM)
+_PATH_SEPARATOR = re.compile(r'%s%|/')
+# Mironet slug konci id kategorie: "Mobilni Telefony+C10737"
+_SLUG_ID = re.compile(r'\+c\d+$', re.IGNORECASE)
+
+CATEGORIES_TABLE = """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY,
+        slug TEXT UNIQUE,
+        name TEXT,
+        parent_id INTEGER,
+        position INTEGER
+    )
+"""
+
+ALIASES_TABLE = """
+    CREATE TABLE IF NOT EXISTS category_aliases (
+        source_site TEXT,
+        alias TEXT,
+        category_id INTEGER,
+        PRIMARY KEY (source_site, alias)
+    ) WITHOUT ROWID
+"""
+
+
+def taxonomy_version():
+    """Changes whenever TREE or ALIASES are edited"""
+    return hashlib.sha1(repr((TREE, sorted(ALIASES.items()))).encode('utf-8')).hexdigest()[:12]
+
+
+def alias_rows():
+    """(source_site, folded alias, category id) rows of category_aliases"""
+    ids = {slug: category_id for category_id, slug, _, _ in TREE}
+    rows = {}
+    for category_id, slug, name, _ in TREE:
+        rows[('*', fold(slug))] = category_id
+        rows[('*', fold(name))] = category_id
+    for source_site, aliases in ALIASES.items():
+        for alias, slug in aliases.items():
+            rows[(source_site, fold(alias))] = ids[slug]
+    return [key + (category_id,) for key, category_id in rows.items()]
+
+
+class CategoryMapper:
+    """Resolves a shop's raw category to a canonical category id (None if unknown)"""
+
+    def __init__(self, conn):
+        self.aliases = {(source_site, alias): category_id for source_site, alias, category_id
+                        in conn.execute("SELECT source_site, alias, category_id FROM category_aliases")}
+        self.memo = {}
+
+    def lookup(self, source_site, name):
+        key = fold(_SLUG_ID.sub('', name.strip()))
+        category_id = self.aliases.get((source_site, key))
+        if category_id is None:
+            category_id = self.aliases.get(('*', key))
+        return category_id
+
+    def resolve(self, source_site, raw):
+        if not raw:
+            return None
+        if (source_site, raw) not in self.memo:
+            # nejkonkretnejsi segment cesty, ktery zname
+            category_id = None
+            for segment in reversed(_PATH_SEPARATOR.split(raw)):
+                if segment.strip():
+                    category_id = self.lookup(source_site, segment)
+                    if category_id is not None:
+                        break
+            self.memo[(source_site, raw)] = category_id
+        return self.memo[(source_site, raw)]
+
+
+def remap_products(conn, mapper):
+    """Re-resolve category_id of every product - one UPDATE per distinct raw category"""
+    pairs = conn.execute("SELECT DISTINCT source_site, category FROM products").fetchall()
+    with conn:
+        conn.executemany(
+            "UPDATE products SET category_id = ? WHERE source_site = ? AND category IS ?",
+            [(mapper.resolve(source_site, category), source_site, category) for source_site, category in pairs],
+        )
+
+
+def sync_categories(conn, force=False):
+    """
+    Write TREE and ALIASES into their tables and, if they changed since the
+    last sync (meta.category_version), remap the stored products.
+    Returns a CategoryMapper for the current taxonomy.
+    """
+    conn.execute(CATEGORIES_TABLE)
+    conn.execute(ALIASES_TABLE)
+    version = taxonomy_version()
+    stored = conn.execute("SELECT value FROM meta WHERE key = 'category_version'").fetchone()
+    if not force and stored and stored[0] == version:
+        return CategoryMapper(conn)
+
+    ids = {slug: category_id for category_id, slug, _, _ in TREE}
+    with conn:
+        conn.execute("DELETE FROM categories")
+        conn.executemany(
+            "INSERT INTO categories (id, slug, name, parent_id, position) VALUES (?, ?, ?, ?, ?)",
+            [(category_id, slug, name, ids.get(parent), position)
+             for position, (category_id, slug, name, parent) in enumerate(TREE)],
+        )
+        conn.execute("DELETE FROM category_aliases")
+        conn.executemany("INSERT INTO category_aliases (source_site, alias, category_id) VALUES (?, ?, ?)",
+                         alias_rows())
+    mapper = CategoryMapper(conn)
+    remap_products(conn, mapper)
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('category_version', ?)", (version,))
+    return mapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Category taxonomy maintenance")
+    parser.add_argument('--db', default='comparison_data.db', help="SQLite database (default: %(default)s)")
+    parser.add_argument('--remap', action='store_true', help="resync the taxonomy and re-resolve every product")
+    args = parser.parse_args()
+
+    # schema (category_id, meta) zalozi pipeline, stejne jako pri crawlu
+    from Scraper.pipelines import BatchWriter
+
+    writer = BatchWriter(args.db)
+    writer.conn = sqlite3.connect(args.db)
+    writer.ensure_schema()
+    conn = writer.conn
+    if args.remap:
+        sync_categories(conn, force=True)
+
+    unmapped = conn.execute("""
+        SELECT source_site, category, COUNT(*) FROM products
+        WHERE category_id IS NULL AND category IS NOT NULL
+        GROUP BY source_site, category
+        ORDER BY COUNT(*) DESC
+    """).fetchall()
+    mapped = conn.execute("SELECT COUNT(*) FROM products WHERE category_id IS NOT NULL").fetchone()[0]
+    print(f"{mapped} products mapped, {sum(row[2] for row in unmapped)} in {len(unmapped)} unmapped categories")
+    for source_site, category, count in unmapped:
+        print(f"{count:>7}  {source_site:<16} {category}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Crawl-run ledger - one crawl_runs row per finished spider run, and a report
+comparing every run with the spider's own recent history.
+
+CrawlLedger (extension) writes the row at spider_closed from the crawler's
+stats into DB_PATH: duration, pages, items, bytes, retries, dropped items,
+errors and items/s. The report puts every run next to its rolling baseline
+- the median of the spider's previous CRAWL_LEDGER_BASELINE runs that
+finished normally - and flags runs that are slower or less productive:
+
+    python -m Scraper.crawlruns                       # last 10 runs of every spider
+    python -m Scraper.crawlruns dtrspider --last 30
+    python -m Scraper.crawlruns --check               # exit 1 if a spider's latest run is flagged
+
+Flags: SLOW (duration above baseline by --slower), RATE / ITEMS (items/s or
+items below baseline by --less), ERRORS (error rate above baseline by
+--errors), and the finish reason of runs that did not finish normally.
+"""
+
+import argparse
+import sqlite3
+import statistics
+import sys
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+# error_rate = (vyjimky stahovani + odpovedi 4xx/5xx) / requesty
+CRAWL_RUNS_TABLE = """
+    CREATE TABLE IF NOT EXISTS crawl_runs (
+        id INTEGER PRIMARY KEY,
+        spider TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        finish_reason TEXT,
+        duration REAL,
+        requests INTEGER,
+        pages INTEGER,
+        items INTEGER,
+        bytes INTEGER,
+        retries INTEGER,
+        dropped INTEGER,
+        errors INTEGER,
+        error_rate REAL,
+        items_per_sec REAL
+    )
+"""
+
+RUN_COLUMNS = ('spider', 'started_at', 'finished_at', 'finish_reason', 'duration', 'requests', 'pages',
+               'items', 'bytes', 'retries', 'dropped', 'errors', 'error_rate', 'items_per_sec')
+
+
+def ensure_crawl_runs_schema(conn):
+    conn.execute(CRAWL_RUNS_TABLE)
+    conn.execute("CREATE INDEX IF NOT EXISTS crawl_runs_spider ON crawl_runs (spider, id)")
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return str(value)
+
+
+def run_from_stats(spider_name, stats, reason=None):
+    """crawl_runs row (dict) from a crawler's stats"""
+    duration = stats.get('elapsed_time_seconds')
+    if duration is None and stats.get('start_time') is not None:
+        duration = time.time() - stats['start_time'].timestamp()
+    requests = stats.get('downloader/request_count', 0)
+    http_errors = sum(value for key, value in stats.items()
+                      if key.startswith('downloader/response_status_count/') and int(key.rsplit('/', 1)[1]) >= 400)
+    failed = stats.get('downloader/exception_count', 0) + http_errors
+    items = stats.get('item_scraped_count', 0)
+    return {
+        'spider': spider_name,
+        'started_at': _timestamp(stats.get('start_time')),
+        'finished_at': _timestamp(stats.get('finish_time')) or time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'finish_reason': reason or stats.get('finish_reason'),
+        'duration': duration,
+        'requests': requests,
+        'pages': stats.get('response_received_count', 0),
+        'items': items,
+        'bytes': stats.get('downloader/response_bytes', 0),
+        'retries': stats.get('retry/count', 0),
+        'dropped': stats.get('item_dropped_count', 0),
+        'errors': stats.get('log_count/ERROR', 0),
+        'error_rate': failed / requests if requests else 0.0,
+        'items_per_sec': items / duration if duration else None,
+    }
+
+
+def record_run(db_path, run):
+    """Append a run to crawl_runs - returns its id"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            ensure_crawl_runs_schema(conn)
+            cur = conn.execute(
+                f"INSERT INTO crawl_runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+                [run[column] for column in RUN_COLUMNS],
+            )
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+
+class CrawlLedger:
+    """Records every finished spider run in crawl_runs (DB_PATH)"""
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('CRAWL_LEDGER_ENABLED', True):
+            raise NotConfigured
+        self.crawler = crawler
+        self.db_path = settings.get('DB_PATH', 'comparison_data.db')
+        self.baseline = settings.getint('CRAWL_LEDGER_BASELINE', 5)
+        # CoreStats (EXTENSIONS_BASE) je pripojeny driv -> elapsed_time_seconds uz je ve stats
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_closed(self, spider, reason):
+        run = run_from_stats(spider.name, self.crawler.stats.get_stats(), reason)
+        try:
+            run_id = record_run(self.db_path, run)
+        except sqlite3.Error as e:
+            spider.logger.error(f"Recording the run in crawl_runs failed: {e}")
+            return
+        line = f"Crawl run #{run_id} recorded: {run['items']} items, {run['pages']} pages"
+        if run['duration']:
+            line += f" in {run['duration']:.0f} s ({run['items_per_sec']:.2f} items/s)"
+        try:
+            flags = latest_flags(self.db_path, spider.name, window=self.baseline)
+        except sqlite3.Error:
+            flags = []
+        if flags:
+            spider.logger.warning(f"{line} - {', '.join(flags)} against the last {self.baseline} runs")
+        else:
+            spider.logger.info(line)
+
+
+# --- report ---
+
+def load_runs(conn, spider=None):
+    """Runs as dicts, oldest first"""
+    conn.row_factory = sqlite3.Row
+    query = f"SELECT id, {', '.join(RUN_COLUMNS)} FROM crawl_runs"
+    params = ()
+    if spider:
+        query += " WHERE spider = ?"
+        params = (spider,)
+    return [dict(row) for row in conn.execute(query + " ORDER BY id", params)]
+
+
+def baseline_of(history, window):
+    """Median duration / items / items_per_sec / error_rate of the last `window` normal runs"""
+    runs = [run for run in history if run['finish_reason'] == 'finished'][-window:]
+    if not runs:
+        return None
+    baseline = {'runs': len(runs)}
+    for column in ('duration', 'items', 'items_per_sec', 'error_rate'):
+        values = [run[column] for run in runs if run[column] is not None]
+        baseline[column] = statistics.median(values) if values else None
+    return baseline
+
+
+def flags_of(run, baseline, slower=0.25, less=0.25, errors=0.05):
+    """Why `run` looks worse than `baseline` - empty list if it does not"""
+    flags = []
+    if run['finish_reason'] != 'finished':
+        flags.append(run['finish_reason'] or 'unfinished')
+    if baseline is None:
+        return flags
+    if run['duration'] and baseline['duration'] and run['duration'] > baseline['duration'] * (1 + slower):
+        flags.append('SLOW')
+    if run['items_per_sec'] is not None and baseline['items_per_sec'] \
+            and run['items_per_sec'] < baseline['items_per_sec'] * (1 - less):
+        flags.append('RATE')
+    if baseline['items'] and run['items'] < baseline['items'] * (1 - less):
+        flags.append('ITEMS')
+    if baseline['error_rate'] is not None and run['error_rate'] > baseline['error_rate'] + errors:
+        flags.append('ERRORS')
+    return flags
+
+
+def compare_runs(runs, window=5, min_runs=3, **limits):
+    """[(run, baseline, flags)] - every run against the runs of its spider before it"""
+    history = {}
+    compared = []
+    for run in runs:
+        previous = history.setdefault(run['spider'], [])
+        baseline = baseline_of(previous, window)
+        if baseline is not None and baseline['runs'] < min_runs:
+            baseline = None
+        compared.append((run, baseline, flags_of(run, baseline, **limits)))
+        previous.append(run)
+    return compared
+
+
+def latest_flags(db_path, spider, window=5, min_runs=3):
+    """Flags of the latest recorded run of `spider`"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        compared = compare_runs(load_runs(conn, spider), window, min_runs)
+    finally:
+        conn.close()
+    return compared[-1][2] if compared else []
+
+
+def _change(value, base):
+    if value is None or not base:
+        return ''
+    return f"{(value / base - 1) * 100:+.0f}%"
+
+
+def print_report(compared, last):
+    print(f"{'run':>5} {'spider':<14} {'finished':<20} {'time s':>8} {'Δ':>5} {'pages':>7} {'items':>8} "
+          f"{'items/s':>8} {'Δ':>5} {'MB':>7} {'retries':>7} {'dropped':>7} {'err %':>6}  flags")
+    by_spider = {}
+    for entry in compared:
+        by_spider.setdefault(entry[0]['spider'], []).append(entry)
+    for spider in sorted(by_spider):
+        for run, baseline, flags in by_spider[spider][-last:]:
+            duration = run['duration'] or 0
+            rate = run['items_per_sec'] or 0
+            print(f"{run['id']:>5} {spider:<14} {run['finished_at'] or '-':<20} {duration:>8.0f} "
+                  f"{_change(run['duration'], baseline and baseline['duration']):>5} {run['pages']:>7} "
+                  f"{run['items']:>8} {rate:>8.2f} {_change(run['items_per_sec'], baseline and baseline['items_per_sec']):>5} "
+                  f"{(run['bytes'] or 0) / 1e6:>7.1f} {run['retries']:>7} {run['dropped']:>7} "
+                  f"{run['error_rate'] * 100:>6.1f}  {' '.join(flags)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl runs against their rolling baseline")
+    parser.add_argument('spiders', nargs='*', help="spider names (default: all)")
+    parser.add_argument('--db', default='comparison_data.db', help="crawl database (default: %(default)s)")
+    parser.add_argument('--last', type=int, default=10, help="runs shown per spider (default: %(default)s)")
+    parser.add_argument('--baseline', type=int, default=5, help="previous normal runs in the baseline")
+    parser.add_argument('--min-runs', type=int, default=3, help="runs needed before flagging")
+    parser.add_argument('--slower', type=float, default=0.25, help="SLOW above baseline duration * (1 + x)")
+    parser.add_argument('--less', type=float, default=0.25, help="RATE/ITEMS below baseline * (1 - x)")
+    parser.add_argument('--errors', type=float, default=0.05, help="ERRORS above baseline error rate + x")
+    parser.add_argument('--check', action='store_true', help="exit 1 if the latest run of a spider is flagged")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'crawl_runs'").fetchone()
+        runs = load_runs(conn) if exists else []
+    finally:
+        conn.close()
+    if args.spiders:
+        runs = [run for run in runs if run['spider'] in args.spiders]
+    if not runs:
+        print("No crawl runs recorded yet")
+        return
+
+    compared = compare_runs(runs, args.baseline, args.min_runs,
+                            slower=args.slower, less=args.less, errors=args.errors)
+    print_report(compared, args.last)
+
+    latest = {}
+    for run, _, flags in compared:
+        latest[run['spider']] = (run, flags)
+    flagged = {spider: flags for spider, (_, flags) in latest.items() if flags}
+    if flagged:
+        print()
+        for spider, flags in sorted(flagged.items()):
+            print(f"{spider}: latest run flagged {' '.join(flags)}")
+    if args.check and flagged:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+Disk-backed scheduler for long CrawlSpider runs (dtrspider).
+
+The pending requests and the seen fingerprints live in one SQLite file
+instead of RAM, so memory stays flat however big the site is:
+
+  * requests  - pickled request dicts ordered by priority (LIFO within a
+                priority, like Scrapy's default queue - keeps the frontier small)
+  * seen      - 8-byte fingerprint prefixes in a WITHOUT ROWID table,
+                ~20 bytes per URL on disk instead of a 40-char hex string
+                in a Python set
+
+Only two small windows stay in memory: the next DISK_QUEUE_WINDOW requests
+and an LRU of the last DISK_DUPEFILTER_WINDOW fingerprints (menu and
+pagination links repeat on every page, so most duplicates never touch disk).
+
+Every enqueue is one transaction (seen + request together). A request row
+is deleted only at a checkpoint (every DISK_QUEUE_CHECKPOINT handled
+responses) after its callback finished and the pipeline batches were
+flushed, so a crawl killed at any moment (OOM killer, kill -9) resumes where
+it stopped - pages whose items may not have reached the database are simply
+fetched again. Just run the spider again:
+
+    scrapy crawl dtrspider                  # state in crawls/dtrspider.sqlite
+    scrapy crawl dtrspider -s JOBDIR=/data/dtr
+
+After a crawl finishes with an empty queue the state is cleared, so the
+next run starts from scratch.
+"""
+
+import os
+import pickle
+import sqlite3
+import weakref
+from collections import OrderedDict, deque
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.request import request_from_dict
+
+from Scraper.canonical import observe_request
+from Scraper.pipelines import flush_writers
+
+FINGERPRINT_BYTES = 8
+QUEUE_ID_KEY = 'disk_queue_id'
+
+# crawler -> DiskScheduler, for DiskQueueSpiderMiddleware
+_schedulers = weakref.WeakKeyDictionary()
+
+
+class DiskFrontier:
+    """SQLite file holding the request queue and seen fingerprints of one spider"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        # WAL + NORMAL: commit nedela fsync, ale prezije kill procesu
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS requests (
+                id INTEGER PRIMARY KEY,
+                priority INTEGER,
+                data BLOB,
+                taken INTEGER DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS requests_order ON requests (taken, priority DESC, id DESC);
+            CREATE TABLE IF NOT EXISTS seen (fp BLOB PRIMARY KEY) WITHOUT ROWID;
+        """)
+
+    def add(self, fingerprint, priority, data):
+        """Store a request unless its fingerprint was seen; returns False for duplicates"""
+        self.conn.execute("BEGIN")
+        try:
+            if fingerprint is not None:
+                cur = self.conn.execute("INSERT OR IGNORE INTO seen (fp) VALUES (?)", (fingerprint,))
+                if not cur.rowcount:
+                    self.conn.execute("ROLLBACK")
+                    return False
+            self.conn.execute("INSERT INTO requests (priority, data) VALUES (?, ?)", (priority, data))
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return True
+
+    def take(self, count):
+        """Mark the next `count` requests as taken and return [(id, data)]"""
+        self.conn.execute("BEGIN")
+        rows = self.conn.execute("""
+            SELECT id, data FROM requests WHERE taken = 0
+            ORDER BY priority DESC, id DESC LIMIT ?
+        """, (count,)).fetchall()
+        self.conn.executemany("UPDATE requests SET taken = 1 WHERE id = ?", [(row[0],) for row in rows])
+        self.conn.execute("COMMIT")
+        return rows
+
+    def done(self, request_ids):
+        self.conn.execute("BEGIN")
+        self.conn.executemany("DELETE FROM requests WHERE id = ?", [(i,) for i in request_ids])
+        self.conn.execute("COMMIT")
+
+    def release(self):
+        """Requests taken by a killed run go back to the queue"""
+        return self.conn.execute("UPDATE requests SET taken = 0 WHERE taken = 1").rowcount
+
+    def pending(self):
+        return self.conn.execute("SELECT COUNT(*) FROM requests WHERE taken = 0").fetchone()[0]
+
+    def clear(self):
+        self.conn.execute("DELETE FROM requests")
+        self.conn.execute("DELETE FROM seen")
+        self.conn.execute("VACUUM")
+
+    def close(self):
+        self.conn.close()
+
+
+class DiskScheduler:
+    """Scheduler keeping its queue and dupefilter in a DiskFrontier"""
+
+    def __init__(self, crawler, directory, window, dupefilter_window, checkpoint):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.directory = directory
+        self.window_size = window
+        self.dupefilter_window = dupefilter_window
+        self.checkpoint_every = checkpoint
+        self.processed = []
+        self.ready = []
+        self.window = deque()
+        self.recent = OrderedDict()
+        self.pending = 0
+        self.frontier = None
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        scheduler = cls(
+            crawler,
+            settings.get('JOBDIR') or settings.get('DISK_QUEUE_DIR', 'crawls'),
+            settings.getint('DISK_QUEUE_WINDOW', 100),
+            settings.getint('DISK_DUPEFILTER_WINDOW', 100000),
+            settings.getint('DISK_QUEUE_CHECKPOINT', 100),
+        )
+        _schedulers[crawler] = scheduler
+        return scheduler
+
+    def open(self, spider):
+        self.spider = spider
+        os.makedirs(self.directory, exist_ok=True)
+        self.frontier = DiskFrontier(os.path.join(self.directory, f'{spider.name}.sqlite'))
+        released = self.frontier.release()
+        self.pending = self.frontier.pending()
+        if self.pending:
+            spider.logger.info(f"Resuming crawl: {self.pending} pending requests "
+                               f"({released} were in flight) in {self.frontier.path}")
+
+    def close(self, reason):
+        # Pipelines uz jsou zavrene (zapsane) - smazat vse zpracovane
+        self.checkpoint()
+        self.checkpoint()
+        if reason == 'finished' and not self.has_pending_requests():
+            # Dokonceny crawl - pristi beh zacina znovu od zacatku
+            self.frontier.clear()
+        else:
+            self.spider.logger.info(f"Crawl state kept in {self.frontier.path} ({self.pending} pending), "
+                                    f"run the spider again to resume")
+        self.frontier.close()
+
+    def _is_duplicate(self, fingerprint):
+        """Checks only the in-memory window; the frontier decides on a miss"""
+        if fingerprint in self.recent:
+            self.recent.move_to_end(fingerprint)
+            return True
+        self.recent[fingerprint] = None
+        if len(self.recent) > self.dupefilter_window:
+            self.recent.popitem(last=False)
+        return False
+
+    def enqueue_request(self, request):
+        fingerprint = None
+        if not request.dont_filter:
+            fingerprint = self.crawler.request_fingerprinter.fingerprint(request)[:FINGERPRINT_BYTES]
+            if self._is_duplicate(fingerprint):
+                self.stats.inc_value('dupefilter/filtered')
+                observe_request(self.crawler, request, True)
+                return False
+        request.meta.pop(QUEUE_ID_KEY, None)
+        data = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+        if not self.frontier.add(fingerprint, request.priority, data):
+            self.stats.inc_value('dupefilter/filtered')
+            self.stats.inc_value('dupefilter/filtered/disk')
+            observe_request(self.crawler, request, True)
+            return False
+        if fingerprint is not None:
+            observe_request(self.crawler, request, False)
+        self.pending += 1
+        self.stats.inc_value('scheduler/enqueued/disk')
+        return True
+
+    def next_request(self):
+        if not self.window:
+            rows = self.frontier.take(self.window_size)
+            self.pending -= len(rows)
+            self.window.extend(rows)
+        if not self.window:
+            return None
+        request_id, data = self.window.popleft()
+        request = request_from_dict(pickle.loads(data), spider=self.spider)
+        request.meta[QUEUE_ID_KEY] = request_id
+        self.stats.inc_value('scheduler/dequeued/disk')
+        return request
+
+    def has_pending_requests(self):
+        return bool(self.window) or self.pending > 0
+
+    def __len__(self):
+        return len(self.window) + self.pending
+
+    def request_processed(self, request):
+        """The callback of `request` is done - its row can go at the next checkpoint"""
+        request_id = request.meta.get(QUEUE_ID_KEY)
+        if request_id is None:
+            return
+        self.processed.append(request_id)
+        if len(self.processed) >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Flush the pipeline batches, then drop the requests processed before
+        the previous checkpoint. The lag of one checkpoint covers items that
+        Scrapy still had on the way to the pipeline when the callback ended.
+        """
+        # Nejdriv polozky do DB, az pak smazat requesty - kill mezi tim = stahne se znovu
+        flush_writers(self.spider)
+        if self.ready:
+            self.frontier.done(self.ready)
+        self.ready, self.processed = self.processed, []
+
+
+class DiskQueueSpiderMiddleware:
+    """Tells the DiskScheduler when a callback has finished with a response"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get('SCHEDULER', '').endswith('DiskScheduler'):
+            raise NotConfigured
+        return cls(crawler)
+
+    def _done(self, response):
+        scheduler = _schedulers.get(self.crawler)
+        if scheduler is not None and response.request is not None:
+            scheduler.request_processed(response.request)
+
+    def process_spider_output(self, response, result, spider):
+        yield from result
+        self._done(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for value in result:
+            yield value
+        self._done(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        self._done(response)
@@ -0,0 +1,384 @@
+"""
+Distributed crawl mode - several worker processes/nodes share one frontier.
+
+The request queue and the seen-fingerprint set live in Redis, so any number
+of workers can pull requests for the same spiders; scraped items are pushed
+to a Redis list and written to SQLite by a single writer process.
+
+    python -m Scraper.distributed reset  --frontier redis://host:6379/0
+    python -m Scraper.distributed writer --frontier redis://host:6379/0
+    python -m Scraper.distributed worker --frontier redis://host:6379/0 dtrspider planeospider
+
+Start as many workers as needed, on any machine that reaches the frontier.
+The first one to start seeds the frontier with the spider's start requests;
+`reset` clears the queue, seen set and seed flag before a fresh full run.
+
+For tests and single-machine runs, --frontier sqlite:///frontier.db uses
+LocalRedis, a SQLite-backed stand-in for the handful of Redis commands used
+here (processes on one machine can share it).
+
+Per-domain politeness stays global: before each download a worker has to
+win SET throttle:<domain> NX PX <DOWNLOAD_DELAY>, so all workers together
+hit a shop no more often than one worker would.
+"""
+
+import argparse
+import json
+import logging
+import pickle
+import sqlite3
+import time
+import types
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import DontCloseSpider
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.request import request_from_dict
+
+from Scraper.canonical import observe_request
+from Scraper.pipelines import get_writer
+
+logger = logging.getLogger(__name__)
+
+ITEMS_KEY = 'items'
+
+
+def _encode(value):
+    # Redis uklada vse jako bytes a bytes taky vraci
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+class LocalRedis:
+    """SQLite-backed stand-in for the Redis commands the frontier uses"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires REAL);
+            CREATE TABLE IF NOT EXISTS sets (key TEXT, member BLOB, PRIMARY KEY (key, member));
+            CREATE TABLE IF NOT EXISTS zsets (key TEXT, member BLOB, score REAL, PRIMARY KEY (key, member));
+            CREATE INDEX IF NOT EXISTS zsets_score ON zsets (key, score);
+            CREATE TABLE IF NOT EXISTS lists (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, value BLOB);
+        """)
+
+    def _atomic(self, fn):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(self.conn)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return result
+
+    def sadd(self, key, *members):
+        def run(conn):
+            added = 0
+            for member in members:
+                added += conn.execute("INSERT OR IGNORE INTO sets VALUES (?, ?)", (key, _encode(member))).rowcount
+            return added
+        return self._atomic(run)
+
+    def scard(self, key):
+        return self.conn.execute("SELECT COUNT(*) FROM sets WHERE key = ?", (key,)).fetchone()[0]
+
+    def zadd(self, key, mapping):
+        def run(conn):
+            added = 0
+            for member, score in mapping.items():
+                added += conn.execute("INSERT OR REPLACE INTO zsets VALUES (?, ?, ?)",
+                                      (key, _encode(member), score)).rowcount
+            return added
+        return self._atomic(run)
+
+    def zpopmin(self, key, count=1):
+        def run(conn):
+            rows = conn.execute("SELECT member, score FROM zsets WHERE key = ? ORDER BY score LIMIT ?",
+                                (key, count)).fetchall()
+            for member, _ in rows:
+                conn.execute("DELETE FROM zsets WHERE key = ? AND member = ?", (key, member))
+            return [(bytes(member), score) for member, score in rows]
+        return self._atomic(run)
+
+    def zcard(self, key):
+        return self.conn.execute("SELECT COUNT(*) FROM zsets WHERE key = ?", (key,)).fetchone()[0]
+
+    def lpush(self, key, *values):
+        def run(conn):
+            conn.executemany("INSERT INTO lists (key, value) VALUES (?, ?)", [(key, _encode(v)) for v in values])
+            return conn.execute("SELECT COUNT(*) FROM lists WHERE key = ?", (key,)).fetchone()[0]
+        return self._atomic(run)
+
+    def rpop(self, key):
+        def run(conn):
+            row = conn.execute("SELECT id, value FROM lists WHERE key = ? ORDER BY id LIMIT 1", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM lists WHERE id = ?", (row[0],))
+            return bytes(row[1])
+        return self._atomic(run)
+
+    def llen(self, key):
+        return self.conn.execute("SELECT COUNT(*) FROM lists WHERE key = ?", (key,)).fetchone()[0]
+
+    def set(self, key, value, nx=False, px=None):
+        def run(conn):
+            now = time.time()
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires IS NOT NULL AND expires <= ?", (key, now))
+            expires = now + px / 1000 if px else None
+            if nx:
+                inserted = conn.execute("INSERT OR IGNORE INTO kv VALUES (?, ?, ?)", (key, value, expires)).rowcount
+                return True if inserted else None
+            conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, value, expires))
+            return True
+        return self._atomic(run)
+
+    def incr(self, key):
+        def run(conn):
+            conn.execute("INSERT OR IGNORE INTO kv VALUES (?, 0, NULL)", (key,))
+            conn.execute("UPDATE kv SET value = value + 1 WHERE key = ?", (key,))
+            return conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0]
+        return self._atomic(run)
+
+    def delete(self, *keys):
+        def run(conn):
+            removed = 0
+            for key in keys:
+                for table in ('kv', 'sets', 'zsets', 'lists'):
+                    removed += conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,)).rowcount
+            return removed
+        return self._atomic(run)
+
+
+def connect(url):
+    """redis://... -> redis.Redis, sqlite:///path -> LocalRedis"""
+    if url.startswith('sqlite:///'):
+        return LocalRedis(url[len('sqlite:///'):])
+    import redis
+    return redis.Redis.from_url(url)
+
+
+class DistributedScheduler:
+    """Scheduler whose queue and dupefilter live in the shared frontier"""
+
+    def __init__(self, crawler, server, idle_timeout):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.server = server
+        self.idle_timeout = idle_timeout
+        self.idle_since = None
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        scheduler = cls(
+            crawler,
+            connect(crawler.settings.get('FRONTIER_URL')),
+            crawler.settings.getfloat('FRONTIER_IDLE_TIMEOUT', 30),
+        )
+        crawler.signals.connect(scheduler.spider_idle, signal=signals.spider_idle)
+        return scheduler
+
+    def open(self, spider):
+        self.spider = spider
+        self.queue_key = f'{spider.name}:requests'
+        self.seen_key = f'{spider.name}:seen'
+        self.seq_key = f'{spider.name}:seq'
+
+    def close(self, reason):
+        pass
+
+    def enqueue_request(self, request):
+        if not request.dont_filter:
+            fingerprint = self.crawler.request_fingerprinter.fingerprint(request)
+            duplicate = not self.server.sadd(self.seen_key, fingerprint)
+            observe_request(self.crawler, request, duplicate)
+            if duplicate:
+                self.stats.inc_value('dupefilter/filtered')
+                return False
+        # Poradi: priorita, pak FIFO podle globalniho citace
+        seq = self.server.incr(self.seq_key)
+        member = pickle.dumps((seq, request.to_dict(spider=self.spider)), protocol=4)
+        self.server.zadd(self.queue_key, {member: -request.priority * 1e12 + seq})
+        self.stats.inc_value('scheduler/enqueued/frontier')
+        return True
+
+    def next_request(self):
+        popped = self.server.zpopmin(self.queue_key)
+        if not popped:
+            return None
+        _, data = pickle.loads(popped[0][0])
+        self.stats.inc_value('scheduler/dequeued/frontier')
+        return request_from_dict(data, spider=self.spider)
+
+    def has_pending_requests(self):
+        return self.server.zcard(self.queue_key) > 0
+
+    def spider_idle(self, spider):
+        # Jiny worker muze jeste pridat pozadavky - cekame idle_timeout nez skoncime
+        if self.has_pending_requests():
+            self.idle_since = None
+            raise DontCloseSpider
+        if self.idle_since is None:
+            self.idle_since = time.monotonic()
+        if time.monotonic() - self.idle_since < self.idle_timeout:
+            raise DontCloseSpider
+
+
+class DistributedStartMiddleware:
+    """Spider middleware - only the first worker seeds the frontier with start requests"""
+
+    def __init__(self, crawler, server):
+        self.crawler = crawler
+        self.server = server
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler, connect(crawler.settings.get('FRONTIER_URL')))
+
+    async def process_start(self, start):
+        name = self.crawler.spider.name
+        if not self.server.set(f'{name}:seeded', 1, nx=True):
+            logger.info("Frontier for %s already seeded by another worker", name)
+            return
+        async for item_or_request in start:
+            yield item_or_request
+
+
+class GlobalRateLimitMiddleware:
+    """Downloader middleware - DOWNLOAD_DELAY per domain across all workers"""
+
+    def __init__(self, server, delay):
+        self.server = server
+        self.delay = delay
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # crawler.settings already include the spider's custom_settings
+        return cls(connect(crawler.settings.get('FRONTIER_URL')), crawler.settings.getfloat('DOWNLOAD_DELAY'))
+
+    async def process_request(self, request, spider=None):
+        if not self.delay:
+            return None
+        from twisted.internet import reactor, task
+
+        key = f'throttle:{urlparse(request.url).hostname}'
+        px = int(self.delay * 1000)
+        while not self.server.set(key, 1, nx=True, px=px):
+            await maybe_deferred_to_future(task.deferLater(reactor, self.delay / 4, lambda: None))
+        return None
+
+
+class FrontierItemPipeline:
+    """Pushes items to the shared list instead of writing SQLite locally"""
+
+    def __init__(self, server):
+        self.server = server
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(connect(crawler.settings.get('FRONTIER_URL')))
+
+    def process_item(self, item, spider):
+        self.server.lpush(ITEMS_KEY, json.dumps([spider.name, dict(item)], ensure_ascii=False))
+        return item
+
+
+def distributed_settings(settings, frontier_url):
+    settings.set('FRONTIER_URL', frontier_url, priority='cmdline')
+    # Worker si z fronty bere jen tolik, kolik hned stahuje - zbytek zustava ostatnim
+    settings.set('CONCURRENT_REQUESTS', settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN'), priority='cmdline')
+    settings.set('SCHEDULER', 'Scraper.distributed.DistributedScheduler', priority='cmdline')
+    settings.set('ITEM_PIPELINES', {'Scraper.distributed.FrontierItemPipeline': 300}, priority='cmdline')
+    settings.set('SPIDER_MIDDLEWARES', {
+        **settings.getdict('SPIDER_MIDDLEWARES'),
+        'Scraper.distributed.DistributedStartMiddleware': 10,
+    }, priority='cmdline')
+    settings.set('DOWNLOADER_MIDDLEWARES', {
+        **settings.getdict('DOWNLOADER_MIDDLEWARES'),
+        'Scraper.distributed.GlobalRateLimitMiddleware': 50,
+    }, priority='cmdline')
+    return settings
+
+
+def run_worker(frontier_url, spider_names):
+    from Scraper.runner import print_summary
+
+    settings = distributed_settings(get_project_settings(), frontier_url)
+    process = CrawlerProcess(settings)
+    crawlers = []
+    for name in spider_names or process.spider_loader.list():
+        crawler = process.create_crawler(name)
+        crawlers.append(crawler)
+        process.crawl(crawler)
+    process.start()
+    print_summary(crawlers)
+
+
+def run_writer(frontier_url, idle_exit):
+    """Drain the items list into SQLite through the shared BatchWriter"""
+    settings = get_project_settings()
+    server = connect(frontier_url)
+    writer = get_writer(settings.get('DB_PATH'), settings.getint('DB_BATCH_SIZE'), settings.get('SNAPSHOT_PATH'))
+    spiders = {}
+    idle_since = time.monotonic()
+
+    try:
+        while True:
+            data = server.rpop(ITEMS_KEY)
+            if data is None:
+                for spider in spiders.values():
+                    writer.flush(spider)
+                if idle_exit and time.monotonic() - idle_since > idle_exit:
+                    break
+                time.sleep(0.5)
+                continue
+            idle_since = time.monotonic()
+
+            name, item = json.loads(data)
+            if name not in spiders:
+                spiders[name] = types.SimpleNamespace(name=name, logger=logging.getLogger(name))
+                writer.open(spiders[name])
+            writer.add((item.get('title'), item.get('price'), item.get('rating'),
+                        item.get('link'), name, item.get('category')), spiders[name])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for spider in spiders.values():
+            writer.close(spider)
+    logger.info("Writer finished, %d rows written", writer.written)
+
+
+def reset_frontier(frontier_url, spider_names):
+    """Forget queue, seen fingerprints and seeding so the next run starts fresh"""
+    server = connect(frontier_url)
+    names = spider_names or CrawlerProcess(get_project_settings()).spider_loader.list()
+    for name in names:
+        server.delete(f'{name}:requests', f'{name}:seen', f'{name}:seq', f'{name}:seeded')
+    logger.info("Frontier reset for %s", ', '.join(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed crawl with a shared frontier")
+    parser.add_argument('role', choices=['worker', 'writer', 'reset'])
+    parser.add_argument('spiders', nargs='*', help="spider names (default: all)")
+    parser.add_argument('--frontier', required=True, help="redis://host:port/db or sqlite:///path")
+    parser.add_argument('--idle-exit', type=float, default=0,
+                        help="writer: stop after this many seconds without items (0 = run forever)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.role == 'worker':
+        run_worker(args.frontier, args.spiders)
+    elif args.role == 'reset':
+        reset_frontier(args.frontier, args.spiders)
+    else:
+        run_writer(args.frontier, args.idle_exit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+# Custom Scrapy extensions
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import gc
+import json
+import logging
+import os
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+
+class DomainStats:
+    """Latency and error statistics of one downloader slot (one shop host)"""
+
+    def __init__(self, delay, concurrency, latency=None):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.latency = latency          # EWMA, seconds
+        self.best_latency = latency     # lowest EWMA seen - "healthy" baseline
+        self.responses = 0
+        self.errors = 0
+
+    def observe(self, latency, is_error, alpha=0.2):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = alpha * latency + (1 - alpha) * self.latency
+        if self.best_latency is None or self.latency < self.best_latency:
+            self.best_latency = self.latency
+        self.responses += 1
+        self.errors += int(is_error)
+
+    def to_dict(self):
+        return {'delay': self.delay, 'concurrency': self.concurrency, 'latency': self.latency}
+
+
+class AdaptiveThrottle:
+    """
+    Per-domain AIMD throttle, replacing fixed DOWNLOAD_DELAY/AUTOTHROTTLE.
+
+    Every ADAPTIVE_THROTTLE_WINDOW responses of a shop the extension looks at
+    the error rate (ADAPTIVE_THROTTLE_ERROR_CODES, 429/503 by default) and the
+    latency trend:
+      * errors above ADAPTIVE_THROTTLE_MAX_ERROR_RATE -> halve concurrency,
+        double the delay (multiplicative decrease)
+      * latency well above the best seen -> back off the delay a bit
+      * otherwise -> shorten the delay, then add one concurrent request
+        (additive increase)
+    A single 429 backs off immediately. Everything stays inside the global
+    bounds or the per-domain ones from ADAPTIVE_THROTTLE_DOMAINS, and the
+    learned delay/concurrency is saved to ADAPTIVE_THROTTLE_STATE_FILE so the
+    next run starts where this one ended.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_THROTTLE_ENABLED'):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.debug = settings.getbool('ADAPTIVE_THROTTLE_DEBUG')
+        self.window = settings.getint('ADAPTIVE_THROTTLE_WINDOW', 20)
+        self.max_error_rate = settings.getfloat('ADAPTIVE_THROTTLE_MAX_ERROR_RATE', 0.05)
+        self.error_codes = {int(code) for code in settings.getlist('ADAPTIVE_THROTTLE_ERROR_CODES', [429, 503])}
+        self.state_file = settings.get('ADAPTIVE_THROTTLE_STATE_FILE')
+        self.default_bounds = {
+            'min_delay': settings.getfloat('ADAPTIVE_THROTTLE_MIN_DELAY', 0.25),
+            'max_delay': settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 10),
+            'min_concurrency': settings.getint('ADAPTIVE_THROTTLE_MIN_CONCURRENCY', 1),
+            'max_concurrency': settings.getint('ADAPTIVE_THROTTLE_MAX_CONCURRENCY', 4),
+        }
+        self.domain_bounds = settings.getdict('ADAPTIVE_THROTTLE_DOMAINS')
+
+        self.saved = {}
+        self.domains = {}
+        self.slots = {}
+
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(self.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(self.response_downloaded, signal=signals.response_downloaded)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                self.saved = json.load(f)
+
+    def spider_closed(self, spider):
+        if not self.state_file or not self.domains:
+            return
+        # Slouci se s ulozenym stavem - ostatni spideri maji sve domeny
+        state = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+        state.update({key: stats.to_dict() for key, stats in self.domains.items()})
+        with open(self.state_file, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        for key, stats in self.domains.items():
+            spider.logger.info(f"Throttle {key}: delay {stats.delay:.2f}s, concurrency {stats.concurrency}")
+
+    def bounds(self, key):
+        """Bounds for a slot key (host) - per-domain entries match by suffix"""
+        bounds = dict(self.default_bounds)
+        for domain, overrides in self.domain_bounds.items():
+            if key == domain or key.endswith('.' + domain):
+                bounds.update(overrides)
+        return bounds
+
+    def clamp(self, key, stats):
+        b = self.bounds(key)
+        stats.delay = min(max(stats.delay, b['min_delay']), b['max_delay'])
+        stats.concurrency = min(max(stats.concurrency, b['min_concurrency']), b['max_concurrency'])
+
+    def apply(self, slot, stats):
+        slot.delay = stats.delay
+        slot.concurrency = stats.concurrency
+
+    def request_reached_downloader(self, request, spider):
+        key = request.meta.get('download_slot')
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None or self.slots.get(key) is slot:
+            return
+        # Novy slot (prvni request nebo po slot GC) -> nastavit naucene hodnoty
+        self.slots[key] = slot
+        if key not in self.domains:
+            saved = self.saved.get(key, {})
+            self.domains[key] = DomainStats(
+                saved.get('delay', slot.delay),
+                saved.get('concurrency', slot.concurrency),
+                saved.get('latency'),
+            )
+            self.clamp(key, self.domains[key])
+        self.apply(slot, self.domains[key])
+
+    def response_downloaded(self, response, request, spider):
+        key = request.meta.get('download_slot')
+        latency = request.meta.get('download_latency')
+        stats = self.domains.get(key)
+        slot = self.slots.get(key)
+        if stats is None or slot is None or latency is None:
+            return
+
+        is_error = response.status in self.error_codes
+        stats.observe(latency, is_error)
+        old = (stats.delay, stats.concurrency)
+
+        if response.status == 429:
+            # Too Many Requests - hned zpomalit, necekat na konec okna
+            stats.concurrency = max(1, stats.concurrency // 2)
+            stats.delay *= 2
+        elif stats.responses >= self.window:
+            error_rate = stats.errors / stats.responses
+            if error_rate > self.max_error_rate:
+                stats.concurrency = max(1, stats.concurrency // 2)
+                stats.delay *= 2
+            elif stats.latency > 2 * stats.best_latency:
+                # Server se zpomaluje - ubrat tempo drive nez zacne vracet chyby
+                stats.delay *= 1.25
+            elif stats.delay > self.bounds(key)['min_delay']:
+                stats.delay *= 0.75
+            else:
+                stats.concurrency += 1
+            stats.responses = stats.errors = 0
+        else:
+            return
+
+        self.clamp(key, stats)
+        self.apply(slot, stats)
+        self.crawler.stats.set_value(f'throttle/{key}/delay', round(stats.delay, 3))
+        self.crawler.stats.set_value(f'throttle/{key}/concurrency', stats.concurrency)
+        if self.debug and old != (stats.delay, stats.concurrency):
+            logger.info(
+                "slot %s: delay %.2fs -> %.2fs, concurrency %d -> %d, latency %.0f ms",
+                key, old[0], stats.delay, old[1], stats.concurrency, stats.latency * 1000,
+                extra={'spider': spider},
+            )
+
+
+def resident_memory():
+    """Current RSS of this process in bytes (Linux /proc), None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def cgroup_memory_limit():
+    """Memory limit of the container/VM cgroup in bytes, None if unlimited"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+class MemoryGuard:
+    """
+    Slows the crawl down before the process runs out of memory.
+
+    Every MEMORY_GUARD_INTERVAL seconds the RSS is compared with the limit
+    (MEMORY_GUARD_LIMIT_MB, else MEMUSAGE_LIMIT_MB, else the cgroup limit):
+      * above MEMORY_GUARD_SOFT -> halve the downloader's total concurrency
+      * above MEMORY_GUARD_HARD -> pause the engine (no new requests leave
+        the scheduler, running ones finish and their responses are freed)
+      * back under the soft mark (with some slack) -> unpause and add the
+        concurrency back one request at a time
+    Scrapy's MemoryUsage extension would simply close the spider instead.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('MEMORY_GUARD_ENABLED') or resident_memory() is None:
+            raise NotConfigured
+        limit_mb = settings.getint('MEMORY_GUARD_LIMIT_MB') or settings.getint('MEMUSAGE_LIMIT_MB')
+        self.limit = limit_mb * 1024 * 1024 if limit_mb else cgroup_memory_limit()
+        if not self.limit:
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.soft = settings.getfloat('MEMORY_GUARD_SOFT', 0.75) * self.limit
+        self.hard = settings.getfloat('MEMORY_GUARD_HARD', 0.9) * self.limit
+        self.interval = settings.getfloat('MEMORY_GUARD_INTERVAL', 5)
+        self.concurrency = None
+        self.paused = False
+        self.task = None
+
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        self.concurrency = self.crawler.engine.downloader.total_concurrency
+        self.task = task.LoopingCall(self.check, spider)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task and self.task.running:
+            self.task.stop()
+
+    def check(self, spider):
+        rss = resident_memory()
+        engine = self.crawler.engine
+        downloader = engine.downloader
+        self.crawler.stats.max_value('memory_guard/max_rss', rss)
+
+        if rss > self.hard:
+            if not self.paused:
+                engine.pause()
+                self.paused = True
+                gc.collect()
+                self.crawler.stats.inc_value('memory_guard/paused')
+                logger.warning("RSS %d MB over %d MB - scheduling paused", rss >> 20, self.hard / 2**20,
+                               extra={'spider': spider})
+        elif rss > self.soft:
+            if downloader.total_concurrency > 1:
+                downloader.total_concurrency = max(1, downloader.total_concurrency // 2)
+                self.crawler.stats.inc_value('memory_guard/throttled')
+                logger.info("RSS %d MB - total concurrency lowered to %d", rss >> 20,
+                            downloader.total_concurrency, extra={'spider': spider})
+        elif rss < 0.9 * self.soft:
+            if self.paused:
+                engine.unpause()
+                self.paused = False
+                logger.info("RSS %d MB - scheduling resumed", rss >> 20, extra={'spider': spider})
+            if downloader.total_concurrency < self.concurrency:
+                downloader.total_concurrency += 1
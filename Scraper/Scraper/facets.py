@@ -0,0 +1,89 @@
+"""
+Facet posting lists for /api/products (built at publish time).
+
+For every facet value there is one bitmap over products.rowid - bit i is
+set when row i has that value:
+
+    category  canonical category id (a parent also gets its children's rows)
+    source    source_site
+    price     price bucket, value = lower edge in haléře (PRICE_EDGES)
+    rating    rating >= step (RATING_STEPS), cumulative
+    *         every row (the universe)
+
+Bitmaps are stored zlib-compressed in the snapshot's facet_postings table
+and loaded by the web app as Python ints, so filtering is `&`/`|` on ints
+and a facet count is int.bit_count(). The snapshot's rowids are dense
+(1..N), which keeps every bitmap at N/8 bytes before compression.
+"""
+
+import zlib
+
+# dolni hrany cenovych pasem v Kc
+PRICE_EDGES = (0, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+RATING_STEPS = (1, 2, 3, 4, 4.5)
+
+FACETS_TABLE = """
+    CREATE TABLE facet_postings (
+        facet TEXT,
+        value TEXT,
+        count INTEGER,
+        bitmap BLOB,
+        PRIMARY KEY (facet, value)
+    ) WITHOUT ROWID
+"""
+
+
+def price_bucket(halere):
+    """Lower edge (haléře) of the bucket a price falls into"""
+    bucket = 0
+    for edge in PRICE_EDGES:
+        if halere >= edge * 100:
+            bucket = edge * 100
+    return bucket
+
+
+def encode(bitmap):
+    return zlib.compress(bytes(bitmap))
+
+
+def decode(blob):
+    return int.from_bytes(zlib.decompress(blob), 'little')
+
+
+def build_postings(conn):
+    """{(facet, value): bytearray} for every facet value in the products table"""
+    size = (conn.execute("SELECT MAX(rowid) FROM products").fetchone()[0] or 0) // 8 + 1
+    parents = dict(conn.execute("SELECT id, parent_id FROM categories"))
+    postings = {}
+
+    def posting(key):
+        bitmap = postings.get(key)
+        if bitmap is None:
+            bitmap = postings[key] = bytearray(size)
+        return bitmap
+
+    rows = conn.execute("SELECT rowid, category_id, source_site, price, rating FROM products")
+    for rowid, category_id, source_site, price, rating in rows:
+        byte, mask = rowid >> 3, 1 << (rowid & 7)
+        keys = [('*', ''), ('source', source_site or '')]
+        if category_id is not None:
+            keys.append(('category', str(category_id)))
+            if parents.get(category_id) is not None:
+                keys.append(('category', str(parents[category_id])))
+        if price is not None:
+            keys.append(('price', str(price_bucket(price))))
+        if rating is not None:
+            keys.extend(('rating', str(step)) for step in RATING_STEPS if rating >= step)
+        for key in keys:
+            posting(key)[byte] |= mask
+    return postings
+
+
+def write_postings(conn):
+    """Build the posting lists into facet_postings (run after VACUUM - it may renumber rowids)"""
+    conn.execute(FACETS_TABLE)
+    conn.executemany(
+        "INSERT INTO facet_postings (facet, value, count, bitmap) VALUES (?, ?, ?, ?)",
+        [(facet, value, int.from_bytes(bitmap, 'little').bit_count(), encode(bitmap))
+         for (facet, value), bitmap in sorted(build_postings(conn).items())],
+    )
@@ -0,0 +1,81 @@
+"""
+Byte-level helpers for the parsing hot path.
+
+Shop pages are 300-900 KB, mostly mega-menus and inline scripts, while the
+data sits in one region (the product grid, the script with `item_id:`).
+These helpers find that region directly in response.body - bytes.find and
+bytes regexes with a start position don't copy or decode anything - so the
+spider decodes/parses only the slice instead of building a selector (and a
+string per <script>) over the whole page.
+"""
+
+import re
+from urllib.parse import urljoin
+
+from parsel import Selector
+
+_CLASS_ATTR = re.compile(rb'\sclass=["\']([^"\']*)["\']')
+# bajt za jmenem tagu (prazdny = konec dat)
+_NAME_END = (b' ', b'\t', b'\r', b'\n', b'>', b'/', b'')
+_JS_ESCAPE = re.compile(r'\\u([0-9a-fA-F]{4})|\\(/)')
+
+
+def tag_start(body, pos):
+    """Offset of the '<' opening the tag that contains `pos`"""
+    start = body.rfind(b'<', 0, pos)
+    return start if start >= 0 else 0
+
+
+def is_tag(body, pos, tag):
+    """Does the tag opening at `pos` have the name `tag`? (b'a' is not <abbr> or <article>)"""
+    end = pos + 1 + len(tag)
+    return body.startswith(b'<' + tag, pos) and body[end:end + 1] in _NAME_END
+
+
+def find_class(body, name, start=0, tag=None):
+    """
+    Offset of the first tag (optionally only <`tag`) whose class attribute
+    contains the token `name`, or -1. Looks for the literal first and checks
+    the class attribute only around the hits.
+    """
+    pos = body.find(name, start)
+    while pos >= 0:
+        begin = tag_start(body, pos)
+        end = body.find(b'>', pos)
+        if tag is None or is_tag(body, begin, tag):
+            match = _CLASS_ATTR.search(body, begin, end)
+            if match and name in match.group(1).split():
+                return begin
+        pos = body.find(name, pos + len(name))
+    return -1
+
+
+def region(body, start, end_marker=None, limit=None):
+    """body[start:...] up to end_marker (exclusive) and/or `limit` bytes"""
+    end = len(body)
+    if end_marker is not None:
+        found = body.find(end_marker, start)
+        if found >= 0:
+            end = found
+    if limit is not None:
+        end = min(end, start + limit)
+    return body[start:end]
+
+
+def fragment(data, encoding):
+    """Selector over a slice of the page - lxml closes the cut-off tags itself"""
+    return Selector(body=data, encoding=encoding, type='html')
+
+
+def absolute_url(response, href):
+    """response.urljoin without decoding the whole page (it reads response.text for <base>)"""
+    if response.body.find(b'<base', 0, 4096) >= 0:
+        return response.urljoin(href)
+    return urljoin(response.url, href)
+
+
+def js_unescape(text):
+    """Decode \\uXXXX and \\/ escapes of a JavaScript string literal"""
+    if '\\' not in text:
+        return text
+    return _JS_ESCAPE.sub(lambda m: m.group(2) or chr(int(m.group(1), 16)), text)
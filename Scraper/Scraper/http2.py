@@ -0,0 +1,139 @@
+"""
+Opt-in HTTP/2 for the shops, with fallback to HTTP/1.1.
+
+Over HTTP/1.1 every in-flight request of a shop needs its own connection
+(and TLS handshake); over HTTP/2 all of them are streams of one TLS
+connection per shop (Scrapy's H2 connection pool is keyed by host). The
+politeness budget does not change - the downloader slot still allows
+CONCURRENT_REQUESTS_PER_DOMAIN / AdaptiveThrottle requests at a time with
+the same delay, they just stop paying for connections.
+
+    scrapy crawl dtrspider -s HTTP2_ENABLED=1
+
+ShopDownloadHandler is the https handler (DOWNLOAD_HANDLERS); per request:
+
+  * HTTP/2 when HTTP2_ENABLED, the host matches HTTP2_DOMAINS (by suffix)
+    and the request has no proxy (Scrapy's H2 client cannot tunnel)
+  * HTTP/1.1 otherwise, and for every host whose server did not agree to
+    h2 in ALPN, closed the connection on the h2 preface or broke the first
+    h2 exchange - the request is retried over HTTP/1.1 at once and the host
+    stays on HTTP/1.1 for the rest of the run
+
+Hop-by-hop headers (Connection: keep-alive from DEFAULT_REQUEST_HEADERS)
+are not allowed in HTTP/2 and are left out of h2 requests.
+
+Stats: http2/responses, http2/fallback/<host>, http11/responses.
+Needs the h2 package (pip install scrapy[http2]); without it everything
+goes over HTTP/1.1 with a warning.
+"""
+
+import logging
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+logger = logging.getLogger(__name__)
+
+# RFC 9113 8.2.2 - v HTTP/2 zakazane
+HOP_BY_HOP = (b'Connection', b'Keep-Alive', b'Proxy-Connection', b'Transfer-Encoding', b'Upgrade')
+
+
+def _negotiation_error(error):
+    """Did the h2 attempt fail because the server does not speak h2 (not the network)?"""
+    try:
+        from scrapy.core._http2.protocol import InvalidNegotiatedProtocol
+        from scrapy.core._http2.stream import InactiveStreamClosed
+        from h2.exceptions import ProtocolError
+    except ImportError:
+        return False
+    seen = set()
+    pending = [error]
+    while pending:
+        error = pending.pop()
+        if error is None or id(error) in seen:
+            continue
+        seen.add(id(error))
+        # InactiveStreamClosed - server zavrel spojeni hned po h2 prefaci (nginx bez h2: 400 + close)
+        if isinstance(error, (InvalidNegotiatedProtocol, InactiveStreamClosed, ProtocolError)):
+            return True
+        # twisted ResponseFailed / ConnectionLost nesou duvody jako Failure
+        for reason in getattr(error, 'reasons', None) or ():
+            pending.append(getattr(reason, 'value', reason))
+        pending.extend((error.__cause__, error.__context__))
+    return False
+
+
+class ShopDownloadHandler:
+    """https handler - HTTP/2 for HTTP2_DOMAINS, HTTP/1.1 for the rest and as fallback"""
+
+    lazy = False
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.http11 = HTTP11DownloadHandler(crawler)
+        self.domains = [domain.lower() for domain in settings.getlist('HTTP2_DOMAINS')]
+        self.http1_hosts = set()
+        self.h2_hosts = set()
+        self.h2 = None
+        if settings.getbool('HTTP2_ENABLED'):
+            try:
+                from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+                self.h2 = H2DownloadHandler(crawler)
+            except (ImportError, NotConfigured) as e:
+                logger.warning(f"HTTP2_ENABLED but HTTP/2 is not available ({e}), using HTTP/1.1")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def use_h2(self, request):
+        if self.h2 is None or request.meta.get('proxy'):
+            return False
+        parsed = urlparse_cached(request)
+        host = (parsed.hostname or '').lower()
+        if parsed.scheme != 'https' or host in self.http1_hosts:
+            return False
+        return any(host == domain or host.endswith('.' + domain) for domain in self.domains)
+
+    async def download_request(self, request):
+        if not self.use_h2(request):
+            response = await self.http11.download_request(request)
+            self.stats.inc_value('http11/responses')
+            return response
+
+        host = urlparse_cached(request).hostname.lower()
+        h2_request = request
+        if any(name in request.headers for name in HOP_BY_HOP):
+            headers = request.headers.copy()
+            for name in HOP_BY_HOP:
+                headers.pop(name, None)
+            h2_request = request.replace(headers=headers)
+        try:
+            response = await self.h2.download_request(h2_request)
+        except Exception as e:
+            # Server h2 neumi (ALPN, rozbity prvni stream) -> host natrvalo na HTTP/1.1
+            if host in self.h2_hosts or not _negotiation_error(e):
+                raise
+            if host not in self.http1_hosts:
+                # soubezne prvni requesty selzou vsechny - hlasit jednou
+                self.http1_hosts.add(host)
+                self.stats.inc_value(f'http2/fallback/{host}')
+                logger.info(f"{host} does not speak HTTP/2 ({e}), falling back to HTTP/1.1")
+            response = await self.http11.download_request(request)
+            self.stats.inc_value('http11/responses')
+            return response
+
+        self.h2_hosts.add(host)
+        if h2_request is not request:
+            # AdaptiveThrottle cte latenci z meta puvodniho requestu
+            request.meta['download_latency'] = h2_request.meta.get('download_latency')
+        self.stats.inc_value('http2/responses')
+        return response
+
+    async def close(self):
+        await self.http11.close()
+        if self.h2 is not None:
+            await self.h2.close()
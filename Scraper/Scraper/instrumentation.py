@@ -0,0 +1,195 @@
+"""
+Crawl metrics shared by the instrumentation middlewares (middlewares.py).
+
+Metrics are fixed-bucket histograms labelled by spider, URL pattern and
+status, kept per crawler and written at spider close as a JSON report and a
+Prometheus text-format file (INSTRUMENTATION_DIR/<spider>.prom, readable by
+node_exporter's textfile collector and served by the web app at /metrics).
+"""
+
+import json
+import os
+import re
+import time
+import weakref
+from bisect import bisect_left
+from urllib.parse import parse_qsl, urlsplit
+
+# Bucket upper bounds
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250)
+
+_DIGITS = re.compile(r'\d+')
+_LONG_SLUG = re.compile(r'[a-z-]{9,}')
+_PLAIN_SEGMENT = re.compile(r'^[\w.-]+$')
+
+
+def url_pattern(url):
+    """
+    Collapse a URL to its shape so metrics don't get one label per page:
+    /televize/strana-3.html -> /{slug}/strana-{n}.html,
+    /mobilni-telefony+c10737/ -> /{slug}+c{n}/, ?offset=48 -> ?offset={v}
+    """
+    parts = urlsplit(url)
+    segments = []
+    for segment in parts.path.split('/'):
+        if not segment:
+            segments.append(segment)
+            continue
+        shaped = _DIGITS.sub('{n}', segment)
+        if '{n}' not in shaped and _PLAIN_SEGMENT.match(shaped):
+            # Ciste slovo/slug - jmeno kategorie nebo produktu
+            stem, dot, ext = shaped.rpartition('.')
+            shaped = '{slug}.' + ext if dot and len(ext) <= 4 else '{slug}'
+        else:
+            shaped = _LONG_SLUG.sub('{slug}', shaped)
+        segments.append(shaped)
+    pattern = parts.netloc + '/'.join(segments)
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    if keys:
+        pattern += '?' + '&'.join(f'{key}={{v}}' for key in keys)
+    return pattern
+
+
+def callback_name(response, spider):
+    """
+    Name of the spider method handling a response. CrawlSpider routes every
+    rule through its own _callback, so the rule's callback is looked up instead.
+    """
+    request = response.request
+    callback = request.callback if request else None
+    name = getattr(callback, '__name__', None) or 'parse'
+    if name == '_callback' and 'rule' in request.meta:
+        rules = getattr(spider, '_rules', ())
+        index = request.meta['rule']
+        if index < len(rules) and rules[index].callback:
+            name = getattr(rules[index].callback, '__name__', str(rules[index].callback))
+    return name
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class Metrics:
+    """Histograms and counters of one crawler, keyed by (name, labels)"""
+
+    def __init__(self, spider_name=None):
+        self.spider_name = spider_name
+        self.histograms = {}
+        self.counters = {}
+        self.exported = False
+        self.started = time.time()
+
+    def observe(self, name, value, buckets, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(buckets)
+        self.histograms[key].observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self):
+        histograms = {}
+        for (name, labels), hist in sorted(self.histograms.items()):
+            histograms.setdefault(name, []).append({'labels': dict(labels), **hist.to_dict()})
+        counters = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return {
+            'spider': self.spider_name,
+            'started': self.started,
+            'finished': time.time(),
+            'histograms': histograms,
+            'counters': counters,
+        }
+
+    def prometheus(self, prefix='scrapy_'):
+        lines = []
+
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ''
+            inner = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                             for k, v in items)
+            return '{' + inner + '}'
+
+        typed = set()
+        for (name, labels), hist in sorted(self.histograms.items()):
+            metric = prefix + name
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} histogram')
+                typed.add(metric)
+            cumulative = 0
+            for bound, n in zip(hist.buckets + (float('inf'),), hist.counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{fmt_labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{metric}_sum{fmt_labels(labels)} {hist.sum}')
+            lines.append(f'{metric}_count{fmt_labels(labels)} {hist.count}')
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = prefix + name + '_total'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} counter')
+                typed.add(metric)
+            lines.append(f'{metric}{fmt_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory):
+        """Write <spider>.json and <spider>.prom once per crawl"""
+        if self.exported:
+            return None
+        self.exported = True
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.spider_name)
+        with open(base + '.json', 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        with open(base + '.prom', 'w') as f:
+            f.write(self.prometheus())
+        return base
+
+
+_registries = weakref.WeakKeyDictionary()
+
+
+def metrics_for(crawler):
+    """The Metrics registry of a crawler (shared by all middlewares)"""
+    if crawler not in _registries:
+        _registries[crawler] = Metrics()
+    return _registries[crawler]
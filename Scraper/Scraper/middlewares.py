@@ -3,22 +3,34 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
+from urllib.parse import urlparse
+
 from scrapy import signals
+from scrapy.resolver import dnscache
 
 # useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+from itemadapter import ItemAdapter, is_item
+
+from Scraper.instrumentation import (COUNT_BUCKETS, SIZE_BUCKETS, TIME_BUCKETS, callback_name, metrics_for,
+                                    url_pattern)
 
 
 class ScraperSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    # Instrumentation - counts items and follow-up requests produced by each
+    # callback per URL pattern, and callback exceptions. Timings are recorded
+    # by ScraperDownloaderMiddleware; both export together at spider close.
+
+    def __init__(self, crawler):
+        self.metrics = metrics_for(crawler)
+        self.directory = crawler.settings.get('INSTRUMENTATION_DIR', 'crawl_metrics')
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_spider_input(self, response, spider):
@@ -28,20 +40,49 @@ class ScraperSpiderMiddleware:
         # Should return None or raise an exception.
         return None
 
+    def _labels(self, response, spider):
+        return {
+            'spider': spider.name,
+            'pattern': url_pattern(response.url),
+            'callback': callback_name(response, spider),
+        }
+
+    def _record(self, labels, items, requests):
+        self.metrics.observe('callback_items', items, COUNT_BUCKETS, **labels)
+        self.metrics.inc('callback_requests', requests, **labels)
+
     def process_spider_output(self, response, result, spider):
         # Called with the results returned from the Spider, after
         # it has processed the response.
 
         # Must return an iterable of Request, or item objects.
+        items = requests = 0
         for i in result:
+            if is_item(i):
+                items += 1
+            else:
+                requests += 1
             yield i
+        self._record(self._labels(response, spider), items, requests)
+
+    async def process_spider_output_async(self, response, result, spider):
+        # Same as above for async generator callbacks
+        items = requests = 0
+        async for i in result:
+            if is_item(i):
+                items += 1
+            else:
+                requests += 1
+            yield i
+        self._record(self._labels(response, spider), items, requests)
 
     def process_spider_exception(self, response, exception, spider):
         # Called when a spider or process_spider_input() method
         # (from other spider middleware) raises an exception.
 
         # Should return either None or an iterable of Request or item objects.
-        pass
+        self.metrics.inc('callback_errors', exception=type(exception).__name__,
+                         **self._labels(response, spider))
 
     async def process_start(self, start):
         # Called with an async iterator over the spider start() method or the
@@ -50,19 +91,40 @@ class ScraperSpiderMiddleware:
             yield item_or_request
 
     def spider_opened(self, spider):
+        self.metrics.spider_name = spider.name
         spider.logger.info("Spider opened: %s" % spider.name)
 
+    def spider_closed(self, spider):
+        path = self.metrics.export(self.directory)
+        if path:
+            spider.logger.info(f"Crawl metrics written to {path}.json / .prom")
+
 
 class ScraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    # Instrumentation - times every download and records response sizes,
+    # labelled by spider, URL pattern and status. Installed close to the
+    # downloader so response sizes are the bytes on the wire.
+    #
+    # Per request:
+    #   download_queue_seconds - waiting in the slot (DOWNLOAD_DELAY, concurrency)
+    #   download_ttfb_seconds  - connect + request + server time until headers
+    #                            (Scrapy's download_latency); labelled dns=cold
+    #                            when the host was not in the DNS cache yet
+    #   download_body_seconds  - headers -> full body
+    #   download_total_seconds - whole trip through the downloader
+    #   response_bytes
+
+    def __init__(self, crawler):
+        self.metrics = metrics_for(crawler)
+        self.directory = crawler.settings.get('INSTRUMENTATION_DIR', 'crawl_metrics')
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
         return s
 
     def process_request(self, request, spider):
@@ -75,8 +137,13 @@ class ScraperDownloaderMiddleware:
         # - or return a Request object
         # - or raise IgnoreRequest: process_exception() methods of
         #   installed downloader middleware will be called
+        request.meta['instrument_start'] = time.perf_counter()
+        request.meta['instrument_dns'] = 'warm' if urlparse(request.url).hostname in dnscache else 'cold'
         return None
 
+    def headers_received(self, headers, body_length, request, spider):
+        request.meta['instrument_headers'] = time.perf_counter()
+
     def process_response(self, request, response, spider):
         # Called with the response returned from the downloader.
 
@@ -84,6 +151,23 @@ class ScraperDownloaderMiddleware:
         # - return a Response object
         # - return a Request object
         # - or raise IgnoreRequest
+        start = request.meta.pop('instrument_start', None)
+        if start is None:
+            return response
+        now = time.perf_counter()
+        headers_at = request.meta.pop('instrument_headers', None)
+        latency = request.meta.get('download_latency')
+        labels = {'spider': spider.name, 'pattern': url_pattern(request.url), 'status': response.status}
+
+        self.metrics.observe('download_total_seconds', now - start, TIME_BUCKETS, **labels)
+        if latency is not None:
+            self.metrics.observe('download_ttfb_seconds', latency, TIME_BUCKETS,
+                                 dns=request.meta.get('instrument_dns'), **labels)
+            if headers_at is not None:
+                self.metrics.observe('download_queue_seconds', max(0.0, headers_at - latency - start),
+                                     TIME_BUCKETS, **labels)
+                self.metrics.observe('download_body_seconds', now - headers_at, TIME_BUCKETS, **labels)
+        self.metrics.observe('response_bytes', len(response.body), SIZE_BUCKETS, **labels)
         return response
 
     def process_exception(self, request, exception, spider):
@@ -94,7 +178,15 @@ class ScraperDownloaderMiddleware:
         # - return None: continue processing this exception
         # - return a Response object: stops process_exception() chain
         # - return a Request object: stops process_exception() chain
-        pass
+        request.meta.pop('instrument_start', None)
+        self.metrics.inc('download_errors', spider=spider.name, pattern=url_pattern(request.url),
+                         exception=type(exception).__name__)
 
     def spider_opened(self, spider):
+        self.metrics.spider_name = spider.name
         spider.logger.info("Spider opened: %s" % spider.name)
+
+    def spider_closed(self, spider):
+        path = self.metrics.export(self.directory)
+        if path:
+            spider.logger.info(f"Crawl metrics written to {path}.json / .prom")
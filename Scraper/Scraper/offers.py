@@ -0,0 +1,128 @@
+"""
+Materialised best offer per comparison group.
+
+Shops name one product differently ("Televize TCL 98P8K" at Datart, "TCL
+98P8K" at Planeo), so a group is keyed by the title's model numbers, not
+the whole title: tokens of the folded title that mix letters and digits
+(98p8k, oled55b56la) or are long product numbers (21269), without sizes
+and units (256gb, 100w). Used/damaged offers ("zanovni", "s poskozenim")
+get their own group. Titles without a model number fall back to the whole
+folded title. products.group_key holds the key; best_offers keeps one row
+per group:
+
+    group_key | title | min_price | max_price | shops | best_site | best_link
+
+shops counts distinct shops. The key can still join variants of one shop
+(colour codes, -L versions), so a group is only a comparison when shops > 1
+- the listing card and the detail page ignore single-shop groups.
+BatchWriter refreshes the groups touched by each batch right after writing
+it, so listing pages get "od 12 990 Kč, 4 obchody" with one primary-key
+lookup per card.
+"""
+
+import re
+
+from Scraper.textnorm import fold
+
+BEST_OFFERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS best_offers (
+        group_key TEXT PRIMARY KEY,
+        title TEXT,
+        min_price INTEGER,
+        max_price INTEGER,
+        shops INTEGER,
+        best_site TEXT,
+        best_link TEXT
+    ) WITHOUT ROWID
+"""
+
+# nejlevnejsi nabidka skupiny + agregace; vse jen range scan indexu products_group
+REFRESH_GROUP = """
+    INSERT INTO best_offers (group_key, title, min_price, max_price, shops, best_site, best_link)
+    SELECT group_key, title, price,
+           (SELECT MAX(price) FROM products p WHERE p.group_key = best.group_key),
+           (SELECT COUNT(DISTINCT source_site) FROM products p
+            WHERE p.group_key = best.group_key AND p.price IS NOT NULL),
+           source_site, link
+    FROM products best
+    WHERE group_key = ? AND price IS NOT NULL
+    ORDER BY price, source_site
+    LIMIT 1
+"""
+
+
+# zvysit pri zmene group_key() - ulozene klice se pak prepocitaji
+GROUP_KEY_VERSION = '2'
+
+# typove oznaceni: pismena + cislice (98p8k), nebo dlouhe cislo (lego 21269)
+_MODEL = re.compile(r'^(?:(?=.*[a-z])(?=.*[0-9])[a-z0-9]{4,}|[0-9]{5,})$')
+# velikosti a jednotky nejsou model (256gb, 100w, 12v)
+_UNIT = re.compile(r'^[0-9]+(?:gb|tb|mb|mah|wh|kw|w|mm|cm|m|l|ml|kg|g|hz|v|ah|mp|k|p|x|ks|let)$')
+# bazarove nabidky Datartu - samostatna skupina
+_CONDITION = re.compile(r'\b(?:zanovni|poskozen\w*|vad\w*|rozbalen\w*|pouzit\w*|repas\w*)\b')
+
+
+def group_key(title):
+    """Comparison group of a title - its model numbers, else the folded title"""
+    folded = fold(title)
+    models = [token for token in folded.split() if _MODEL.match(token) and not _UNIT.match(token)]
+    if not models:
+        return folded
+    key = ' '.join(dict.fromkeys(models))
+    if _CONDITION.search(folded):
+        key += ' ~b'
+    return key
+
+
+def ensure_offers_schema(conn):
+    """group_key column + index on products and the best_offers table; backfills an older DB"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(products)")]
+    if 'group_key' not in columns:
+        conn.execute("ALTER TABLE products ADD COLUMN group_key TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS products_group ON products (group_key, price)")
+    conn.execute(BEST_OFFERS_TABLE)
+    conn.commit()
+
+    # klice podle starsi verze group_key() se prepocitaji vsechny,
+    # jinak jen radky zapsane pred zavedenim skupin (NULL jsou v indexu na zacatku)
+    version = conn.execute("SELECT value FROM meta WHERE key = 'group_key_version'").fetchone()
+    stale = version is None or version[0] != GROUP_KEY_VERSION
+    if stale or conn.execute("SELECT 1 FROM products WHERE group_key IS NULL LIMIT 1").fetchone():
+        conn.create_function('group_key', 1, group_key, deterministic=True)
+        with conn:
+            conn.execute("UPDATE products SET group_key = group_key(title)"
+                         + ("" if stale else " WHERE group_key IS NULL"))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('group_key_version', ?)",
+                         (GROUP_KEY_VERSION,))
+        rebuild_best_offers(conn)
+
+
+def refresh_best_offers(conn, keys):
+    """Recompute the best offer of the given groups (call inside the batch's transaction)"""
+    keys = [(key,) for key in set(keys) if key]
+    conn.executemany("DELETE FROM best_offers WHERE group_key = ?", keys)
+    conn.executemany(REFRESH_GROUP, keys)
+
+
+def rebuild_best_offers(conn):
+    """Recompute every group in one pass - after a bulk load or a backfill"""
+    with conn:
+        conn.execute("DELETE FROM best_offers")
+        # COUNT(DISTINCT) jako okenni funkce SQLite neumi -> agregace zvlast
+        conn.execute("""
+            INSERT INTO best_offers (group_key, title, min_price, max_price, shops, best_site, best_link)
+            SELECT ranked.group_key, title, price, groups.max_price, groups.shops, source_site, link
+            FROM (
+                SELECT group_key, title, price, source_site, link,
+                       ROW_NUMBER() OVER (PARTITION BY group_key ORDER BY price, source_site) AS rank
+                FROM products
+                WHERE group_key IS NOT NULL AND price IS NOT NULL
+            ) ranked
+            JOIN (
+                SELECT group_key, MAX(price) AS max_price, COUNT(DISTINCT source_site) AS shops
+                FROM products
+                WHERE group_key IS NOT NULL AND price IS NOT NULL
+                GROUP BY group_key
+            ) groups ON groups.group_key = ranked.group_key
+            WHERE rank = 1
+        """)
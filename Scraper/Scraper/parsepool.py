@@ -0,0 +1,99 @@
+"""
+Process-pool parsing offload (opt-in).
+
+Scrapy runs every callback on the reactor thread, so one CPU-heavy parser
+caps the crawl at one core. With PARSE_POOL_ENABLED = True, spiders can
+send the raw response bytes to a ProcessPoolExecutor worker instead:
+
+    pool = parse_pool_for(self.crawler)
+    if pool is not None:
+        result = await pool.run(extract_listing, response.url, response.body, response.encoding)
+
+pool.submit() returns a Deferred fired on the reactor thread with the
+task's return value. The task must be a module-level function taking and
+returning picklable values (bytes, dicts, Links). Meanwhile the reactor
+keeps downloading and parsing other responses; how many are in flight is
+bounded by Scrapy's SCRAPER_SLOT_MAX_ACTIVE_SIZE.
+
+One pool serves every crawler of the process (Scraper.runner). Workers are
+spawned, not forked - forking a process with a running reactor and open
+SQLite connections is asking for trouble.
+"""
+
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import CancelledError, Deferred
+from twisted.python.failure import Failure
+
+# crawler -> ParsePool
+_pools = weakref.WeakKeyDictionary()
+_executor = None
+_users = set()
+
+
+def parse_pool_for(crawler):
+    """The ParsePool of a crawler, None when the offload is disabled"""
+    return _pools.get(crawler) if crawler is not None else None
+
+
+def _fire(deferred, future):
+    # shutdown(cancel_futures=True) pri zavreni spideru - future.exception() by vyhodil
+    if future.cancelled():
+        deferred.errback(Failure(CancelledError()))
+        return
+    error = future.exception()
+    if error is not None:
+        deferred.errback(Failure(error))
+    else:
+        deferred.callback(future.result())
+
+
+class ParsePool:
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PARSE_POOL_ENABLED'):
+            raise NotConfigured
+        self.crawler = crawler
+        self.workers = settings.getint('PARSE_POOL_WORKERS') or os.cpu_count()
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        global _executor
+        if _executor is None:
+            _executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            spider.logger.info(f"Parse pool started with {self.workers} worker processes")
+        _users.add(spider.name)
+        _pools[self.crawler] = self
+
+    def spider_closed(self, spider):
+        global _executor
+        _pools.pop(self.crawler, None)
+        _users.discard(spider.name)
+        if not _users and _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in a worker process; returns a Deferred"""
+        from twisted.internet import reactor
+
+        deferred = Deferred()
+        future = _executor.submit(fn, *args)
+        future.add_done_callback(lambda f: reactor.callFromThread(_fire, deferred, f))
+        self.crawler.stats.inc_value('parse_pool/tasks')
+        return deferred
+
+    async def run(self, fn, *args):
+        return await maybe_deferred_to_future(self.submit(fn, *args))
@@ -1,59 +1,254 @@
 import sqlite3
 from itemadapter import ItemAdapter
 
+from Scraper.categories import sync_categories
+from Scraper.offers import ensure_offers_schema, group_key, refresh_best_offers
+from Scraper.prices import parse_prices
+from Scraper.snapshot import publish_snapshot
+
+# PRIMARY KEY (title, source_site) ensures one unique row per product per site,
+# enabling the INSERT OR REPLACE INTO behavior.
+# price = cele halere vcetne DPH (Scraper/prices.py)
+# category = nazev ze shopu, category_id = kanonicka kategorie (Scraper/categories.py)
+# group_key = srovnavaci skupina napric shopy (Scraper/offers.py)
+PRODUCTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS products (
+        title TEXT,
+        price INTEGER,
+        rating REAL,
+        link TEXT,
+        source_site TEXT,
+        category TEXT,
+        crawled_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        category_id INTEGER,
+        group_key TEXT,
+        PRIMARY KEY (title, source_site)
+    )
+"""
+
+INSERT_PRODUCT = """
+    INSERT OR REPLACE INTO products (title, price, rating, link, source_site, category, category_id, group_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def migrate_prices(conn):
+    """
+    Convert a products table with prices in koruny (REAL, or raw strings
+    from older Datart crawls) to INTEGER haléře. Runs once - meta.price_unit
+    marks a converted database. Returns True if it migrated.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'products' not in tables:
+        return False
+    unit = conn.execute("SELECT value FROM meta WHERE key = 'price_unit'").fetchone()
+    if unit and unit[0] == 'halere':
+        return False
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(products)")]
+    rows = conn.execute(f"SELECT {', '.join(columns)} FROM products").fetchall()
+    price_at = columns.index('price')
+    prices = parse_prices([row[price_at] for row in rows])
+    rows = [row[:price_at] + (price,) + row[price_at + 1:] for row, price in zip(rows, prices)]
+
+    # SQLite neumi zmenit typ sloupce - tabulka se postavi znovu
+    with conn:
+        conn.execute("ALTER TABLE products RENAME TO products_old")
+        conn.execute(PRODUCTS_TABLE)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO products ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows,
+        )
+        conn.execute("DROP TABLE products_old")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('price_unit', 'halere')")
+    return True
+
+
+def ensure_schema(conn):
+    """
+    Create or upgrade every table the crawl and the web app use - returns
+    the category resolver (Scraper/categories.py).
+    """
+    cur = conn.cursor()
+
+    # meta tabulka - data_version se zvedne po kazdem dokoncenem crawlu,
+    # web app podle ni invaliduje cache
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', '0')")
+
+    # stara DB s cenami v korunach (REAL/TEXT) -> halere
+    migrate_prices(conn)
+
+    # vytvori produkty pokud jiz neexistuji
+    cur.execute(PRODUCTS_TABLE)
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(products)")]
+    if 'category_id' not in columns:
+        cur.execute("ALTER TABLE products ADD COLUMN category_id INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS products_price ON products (price)")
+    cur.execute("CREATE INDEX IF NOT EXISTS products_category ON products (category_id, price)")
+    cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('price_unit', 'halere')")
+    conn.commit()
+
+    # strom kategorii + aliasy shopu, pri zmene se premapuji ulozene produkty
+    categories = sync_categories(conn)
+    # srovnavaci skupiny + best_offers
+    ensure_offers_schema(conn)
+    return categories
+
+
+def prepare_database(db_path):
+    """Upgrade db_path to the current schema outside a crawl (web app start)"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        ensure_schema(conn)
+    finally:
+        conn.close()
+
+
+class BatchWriter:
+    """
+    One SQLite connection shared by every spider running in the process.
+    Rows are buffered and written with executemany every `batch_size` items,
+    so spiders started together (Scraper.runner) don't fight over the write lock.
+    """
+
+    def __init__(self, db_path, batch_size=100, snapshot_path=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.snapshot_path = snapshot_path
+        self.conn = None
+        self.categories = None
+        self.rows = []
+        self.spiders = set()
+        self.written = 0
+
+    def open(self, spider):
+        if self.conn is None:
+            # pripojeni k databazi
+            self.conn = sqlite3.connect(self.db_path)
+            # WAL - web app muze cist i behem zapisu
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.ensure_schema()
+        self.spiders.add(spider.name)
+
+    def ensure_schema(self):
+        self.categories = ensure_schema(self.conn)
+
+    def add(self, row, spider):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush(spider)
+
+    def flush(self, spider):
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        # ceny cele davky najednou -> halere
+        prices = parse_prices([row[1] for row in rows])
+        rows = [(row[0], price) + row[2:] + (self.categories.resolve(row[4], row[5]), group_key(row[0]))
+                for row, price in zip(rows, prices)]
+        try:
+            with self.conn:
+                self.conn.executemany(INSERT_PRODUCT, rows)
+                # nejlevnejsi nabidka skupin, kterych se davka dotkla - ve stejne transakci
+                refresh_best_offers(self.conn, [row[7] for row in rows])
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            # Jeden vadny radek by shodil celou davku -> zkusime po jednom
+            spider.logger.error(f"Batch insert failed ({e}), retrying row by row")
+            for row in rows:
+                try:
+                    with self.conn:
+                        self.conn.execute(INSERT_PRODUCT, row)
+                    self.written += 1
+                except sqlite3.Error as e:
+                    spider.logger.error(f"Error inserting item into database: {e} {row!r}")
+            with self.conn:
+                refresh_best_offers(self.conn, [row[7] for row in rows])
+
+    def close(self, spider):
+        self.flush(spider)
+        self.spiders.discard(spider.name)
+        if self.spiders or self.conn is None:
+            return
+
+        # Posledni spider dobehl -> nova verze dat pro web app
+        with self.conn:
+            self.conn.execute("""
+                UPDATE meta SET value = CAST(value AS INTEGER) + 1
+                WHERE key = 'data_version'
+            """)
+            self.conn.execute("""
+                INSERT OR REPLACE INTO meta (key, value)
+                VALUES ('updated_at', strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+            """)
+        self.conn.close()
+        self.conn = None
+
+        # hotova data -> read snapshot pro web app (Scraper/snapshot.py)
+        if self.snapshot_path:
+            try:
+                publish_snapshot(self.db_path, self.snapshot_path)
+            except (sqlite3.Error, OSError) as e:
+                spider.logger.error(f"Publishing snapshot {self.snapshot_path} failed: {e}")
+
+
+_writers = {}
+
+
+def get_writer(db_path, batch_size, snapshot_path=None):
+    """Process-wide BatchWriter for a database file"""
+    if db_path not in _writers:
+        _writers[db_path] = BatchWriter(db_path, batch_size, snapshot_path)
+    return _writers[db_path]
+
+
+def flush_writers(spider):
+    """Write out every buffered batch - a crawl checkpoint (diskqueue.py) relies on it"""
+    for writer in _writers.values():
+        if writer.conn is not None:
+            writer.flush(spider)
+
+
 # class name MUSÍ byt 'ScraperPipelines' aby odpovidal settings.py:
 class ScraperPipeline:
-    
+
+    def __init__(self, db_path='comparison_data.db', batch_size=100, snapshot_path=None):
+        self.writer = get_writer(db_path, batch_size, snapshot_path)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            db_path=crawler.settings.get('DB_PATH', 'comparison_data.db'),
+            batch_size=crawler.settings.getint('DB_BATCH_SIZE', 100),
+            snapshot_path=crawler.settings.get('SNAPSHOT_PATH'),
+        )
+
     def open_spider(self, spider):
-        # pripojeni k databazi
-        self.conn = sqlite3.connect('comparison_data.db')
-        self.cur = self.conn.cursor()
-        
-        # vytvori produkty pokud jiz neexistuji
-        # PRIMARY KEY (title, source_site) ensures one unique row per product per site, 
-        # enabling the INSERT OR REPLACE INTO behavior.
-        self.cur.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                title TEXT,
-                price REAL,
-                rating REAL,
-                link TEXT,
-                source_site TEXT,
-                category TEXT,
-                crawled_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (title, source_site)
-            )
-        """)
-        self.conn.commit()
+        self.writer.open(spider)
         spider.logger.info("Database connection opened and 'products' table ensured.")
 
-
     def close_spider(self, spider):
-        # Close the database connection when the spider finishes
-        if self.conn:
-            self.conn.close()
-            
-            
+        # Zapise zbytek davky; spojeni zavre az posledni spider
+        self.writer.close(spider)
+
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
-        
+
         # 3. Use INSERT OR REPLACE INTO for overwriting
         # The row is replaced entirely if the combination of (title, source_site) exists.
-        try:
-            self.cur.execute("""
-                INSERT OR REPLACE INTO products (title, price, rating, link, source_site, category)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                adapter.get('title'),
-                adapter.get('price'),
-                adapter.get('rating'),
-                adapter.get('link'),
-                spider.name,  # Stores 'dtrspider', 'alza_spider', etc.
-                adapter.get('category')
-            ))
-            
-            self.conn.commit()
-        
-        except Exception as e:
-            spider.logger.error(f"Error inserting item into database: {e}")
-            # You might want to log the item or raise DropItem here if it's a critical failure
\ No newline at end of file
+        self.writer.add((
+            adapter.get('title'),
+            adapter.get('price'),
+            adapter.get('rating'),
+            adapter.get('link'),
+            spider.name,  # Stores 'dtrspider', 'alza_spider', etc.
+            adapter.get('category')
+        ), spider)
+        return item
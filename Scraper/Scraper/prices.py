@@ -0,0 +1,109 @@
+"""
+Price normalisation shared by all spiders - every price ends up as an
+integer number of haléře (1 Kč = 100 haléřů) incl. VAT.
+
+Spiders yield prices as they find them (Datart's data-product-price string,
+Mironet's JS number, Planeo's GTM price) and BatchWriter converts each batch
+with parse_prices() just before the insert. Machine-formatted numbers (JS,
+GTM attributes) go through parse_number() in the spider first - "299.000"
+is 299 Kč there, but 299 000 Kč on a shop's page.
+
+    >>> parse_price("1 299,90 Kč")
+    129990
+    >>> parse_price("od 1\\xa0299,- Kč")
+    129900
+    >>> parse_price("12990.00")
+    1299000
+    >>> parse_price("12990.000")
+    1299000
+    >>> parse_price("83918.38999999998")
+    8391839
+    >>> parse_price(1299.9)
+    129990
+    >>> parse_price("1 000 bez DPH")      # VAT_RATE added
+    121000
+    >>> parse_price("od 1 299 do 2 000")  # first of two prices
+    129900
+    >>> parse_price("-1 299 Kč"), parse_price(float('inf'))
+    (None, None)
+    >>> parse_price(parse_number("299.000"))
+    29900
+
+    python -m doctest Scraper/prices.py
+"""
+
+import math
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+VAT_RATE = 21   # % - zakladni sazba, elektronika
+
+# \s pokryva i NBSP a uzke mezery, ktere shopy davaji mezi tisice;
+# mezera patri k cislu jen pred skupinou tri cifer ("1 299", ne "1 do 2")
+_SPACES = re.compile(r"[\s']+")
+_NUMBER = re.compile(r"\d(?:[\d.,]|[\s']+(?=\d{3}(?!\d)))*")
+_MINUS = re.compile(r'[-\u2212]\s*$')
+_GROUPED = re.compile(r'^\d{1,3}(?:[.,]\d{3})*$')
+_MACHINE = re.compile(r'^\s*\d+(?:\.\d+)?\s*$')
+_EX_VAT = re.compile(r'bez\s*dph', re.IGNORECASE)
+
+
+def _to_halere(number):
+    """Decimal koruny -> haléře, rounded half up"""
+    return int((number * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _number_to_halere(token):
+    """'1.299,90' / '1,299.90' / '1299,-' / '12990.000' -> haléře"""
+    token = token.rstrip('.,')
+    decimal_at = max(token.rfind('.'), token.rfind(','))
+    if decimal_at >= 0:
+        separator = token[decimal_at]
+        whole, fraction = token[:decimal_at], token[decimal_at + 1:]
+        # "1.299" / "1,299" / "1.299.000" jsou tisice, desetinna je jen jedna
+        # carka/tecka, za kterou neni skupina tisicu ("12990.000", "1299.9")
+        if token.count(separator) == 1 and (len(fraction) != 3 or not _GROUPED.match(whole)):
+            whole = whole.replace('.', '').replace(',', '')
+            return _to_halere(Decimal(f"{whole or 0}.{fraction}"))
+    return int(token.replace('.', '').replace(',', '')) * 100
+
+
+def parse_number(text):
+    """Machine-formatted number (JS price, GTM attribute) -> float, None if it is not one"""
+    if text is None or not _MACHINE.match(text):
+        return None
+    return float(text)
+
+
+def parse_price(value):
+    """One raw price (str/int/float/None) -> haléře incl. VAT, None if there is no price"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value * 100 if value >= 0 else None
+    if isinstance(value, float):
+        # nan, inf a zaporne ceny nejsou ceny
+        return round(value * 100) if math.isfinite(value) and value >= 0 else None
+
+    text = str(value)
+    match = _NUMBER.search(text)
+    if not match or _MINUS.search(text, 0, match.start()):
+        return None
+    halere = _number_to_halere(_SPACES.sub('', match.group(0)))
+    if _EX_VAT.search(text):
+        halere = round(halere * (100 + VAT_RATE) / 100)
+    return halere
+
+
+def parse_prices(values):
+    """Normalise a whole column at once - repeated strings are parsed only once"""
+    memo = {}
+    result = []
+    for value in values:
+        if isinstance(value, str):
+            if value not in memo:
+                memo[value] = parse_price(value)
+            result.append(memo[value])
+        else:
+            result.append(parse_price(value))
+    return result
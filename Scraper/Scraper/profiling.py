@@ -0,0 +1,270 @@
+"""
+Per-callback profiling of spider callbacks and pipelines.
+
+Enable with PROFILING_ENABLED = True (or scrapy crawl ... -s PROFILING_ENABLED=1).
+
+CallbackProfiler (extension) wraps process_item of every ITEM_PIPELINES
+class, ProfilingSpiderMiddleware wraps each step of every callback's output.
+For every label (spider callback or pipeline) it measures:
+
+  * CPU time (time.thread_time) and wall time
+  * allocations with tracemalloc - net bytes and peak per call
+  * stack samples taken every PROFILING_SAMPLE_INTERVAL seconds from a
+    background thread, prefixed with the active label
+
+Steps of async callbacks are awaited, so other callbacks can run before a
+step finishes. They are not pushed as the active label, and a step that
+was suspended that way is charged only its call and wall time - its CPU
+and allocations belong to whatever ran in between.
+
+At spider close it writes to PROFILING_DIR:
+
+  <spider>.folded   collapsed stacks for flamegraph.pl / speedscope
+  <spider>-top.txt  top-N labels and hottest functions
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter, defaultdict
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.misc import load_object
+
+from Scraper.instrumentation import callback_name
+
+IDLE_LABEL = '[reactor]'
+
+# spider -> CallbackProfiler, used by the wrapped pipeline methods
+_profilers = weakref.WeakKeyDictionary()
+
+
+class LabelStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.cpu = 0.0
+        self.wall = 0.0
+        self.alloc = 0
+        self.peak = 0
+
+    def add(self, cpu, wall, alloc, peak):
+        self.calls += 1
+        self.cpu += cpu
+        self.wall += wall
+        self.alloc += alloc
+        self.peak = max(self.peak, peak)
+
+
+class CallbackProfiler:
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PROFILING_ENABLED'):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.directory = settings.get('PROFILING_DIR', 'profiles')
+        self.interval = settings.getfloat('PROFILING_SAMPLE_INTERVAL', 0.005)
+        self.top_n = settings.getint('PROFILING_TOP_N', 20)
+        self.trace_memory = settings.getbool('PROFILING_TRACEMALLOC', True)
+
+        self.stats = defaultdict(LabelStats)
+        self.samples = Counter()
+        self.active = []
+        self.started = 0
+        self.thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+
+        for path in settings.getdict('ITEM_PIPELINES'):
+            wrap_pipeline(load_object(path))
+
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    # --- measuring ---
+
+    def begin(self, label, sampled=True):
+        """Start charging work to `label`; returns the token for end()
+
+        sampled=False keeps the label off the active stack - for steps that
+        await, which other callbacks can interleave with.
+        """
+        self.started += 1
+        if sampled:
+            self.active.append(label)
+        mem_before = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            mem_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        return label, sampled, self.started, mem_before, time.thread_time(), time.perf_counter()
+
+    def end(self, token):
+        label, sampled, started, mem_before, cpu_before, wall_before = token
+        cpu = time.thread_time() - cpu_before
+        wall = time.perf_counter() - wall_before
+        alloc = peak = 0
+        if mem_before is not None:
+            mem_after, mem_peak = tracemalloc.get_traced_memory()
+            alloc = mem_after - mem_before
+            peak = mem_peak - mem_before
+        if sampled:
+            self.active.pop()
+        if started != self.started:
+            # mezitim bezelo neco jineho -> CPU a alokace nepatri tomuto kroku
+            cpu = alloc = peak = 0
+        self.stats[label].add(cpu, wall, alloc, peak)
+
+    def measure(self, label, fn, *args, **kwargs):
+        """Run fn(*args) and charge its CPU/wall/allocations to `label`"""
+        token = self.begin(label)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.end(token)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < 64:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            label = self.active[-1] if self.active else IDLE_LABEL
+            stack.append(label)
+            self.samples[';'.join(reversed(stack))] += 1
+
+    # --- lifecycle ---
+
+    def spider_opened(self, spider):
+        _profilers[spider] = self
+        self.thread_id = threading.get_ident()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._sampler = threading.Thread(target=self._sample_loop, name='callback-profiler', daemon=True)
+        self._sampler.start()
+
+    def spider_closed(self, spider):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        _profilers.pop(spider, None)
+
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, spider.name)
+        with open(base + '.folded', 'w') as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        report = self.report(spider.name)
+        with open(base + '-top.txt', 'w') as f:
+            f.write(report)
+        spider.logger.info(f"Profile written to {base}.folded / {base}-top.txt\n{report}")
+
+    # --- output ---
+
+    def report(self, spider_name):
+        lines = [f"Profile of {spider_name} - top {self.top_n} by CPU time", '']
+        lines.append(f"{'label':<40} {'calls':>7} {'cpu s':>8} {'cpu ms/call':>11} "
+                     f"{'wall s':>8} {'alloc KB':>9} {'peak KB':>8}")
+        ranked = sorted(self.stats.items(), key=lambda kv: kv[1].cpu, reverse=True)
+        for label, s in ranked[:self.top_n]:
+            per_call = s.cpu / s.calls * 1000 if s.calls else 0
+            lines.append(f"{label:<40} {s.calls:>7} {s.cpu:>8.3f} {per_call:>11.2f} "
+                         f"{s.wall:>8.3f} {s.alloc / 1024:>9.0f} {s.peak / 1024:>8.0f}")
+
+        # Self time podle vzorku - posledni ramec zasobniku
+        total = sum(self.samples.values())
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            leaves[(frames[0], frames[-1])] += count
+        lines += ['', f"Hottest functions ({total} samples, {self.interval * 1000:.0f} ms interval)", '']
+        for (label, func), count in leaves.most_common(self.top_n):
+            lines.append(f"{count / total * 100 if total else 0:>6.1f}%  {label:<30} {func}")
+        return '\n'.join(lines) + '\n'
+
+
+def wrap_pipeline(cls):
+    """Charge cls.process_item to the spider's profiler (class-level, once)"""
+    original = getattr(cls, 'process_item', None)
+    if original is None or getattr(original, '_profiled', False):
+        return
+
+    label = f"{cls.__name__}.process_item"
+
+    @functools.wraps(original)
+    def process_item(self, item, spider):
+        profiler = _profilers.get(spider)
+        if profiler is None:
+            return original(self, item, spider)
+        return profiler.measure(label, original, self, item, spider)
+
+    process_item._profiled = True
+    cls.process_item = process_item
+
+
+class ProfilingSpiderMiddleware:
+    """Measures every step of a callback's output (closest to the spider)"""
+
+    def __init__(self, crawler):
+        if not crawler.settings.getbool('PROFILING_ENABLED'):
+            raise NotConfigured
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _profiler(self, spider):
+        return _profilers.get(spider)
+
+    def process_spider_output(self, response, result, spider):
+        profiler = self._profiler(spider)
+        if profiler is None:
+            yield from result
+            return
+        label = f"{spider.name}.{callback_name(response, spider)}"
+        iterator = iter(result)
+        while True:
+            try:
+                value = profiler.measure(label, next, iterator)
+            except StopIteration:
+                return
+            yield value
+
+    async def process_spider_output_async(self, response, result, spider):
+        profiler = self._profiler(spider)
+        if profiler is None:
+            async for value in result:
+                yield value
+            return
+        label = f"{spider.name}.{callback_name(response, spider)}"
+        # Scrapy prevadi synchronni callbacky na async generator, takze krok
+        # vetsinou nikde neprestane; kdyz ano, bezi mezitim jine callbacky -
+        # label se proto nedava na sdileny zasobnik
+        while True:
+            token = profiler.begin(label, sampled=False)
+            try:
+                value = await result.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                profiler.end(token)
+            yield value
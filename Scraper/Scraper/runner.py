@@ -0,0 +1,75 @@
+"""
+Run every shop spider concurrently in one process.
+
+    python -m Scraper.runner                    # all spiders in Scraper.spiders
+    python -m Scraper.runner dtrspider planeospider
+    python -m Scraper.runner -s CLOSESPIDER_ITEMCOUNT=50
+
+All crawlers share one Twisted reactor and one BatchWriter (see
+pipelines.py), while each keeps its own downloader - DOWNLOAD_DELAY,
+concurrency and the spider's custom_settings stay per shop. A full refresh
+takes about as long as the slowest shop instead of the sum of all of them.
+"""
+
+import argparse
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+SUMMARY_STATS = (
+    ('items', 'item_scraped_count'),
+    ('pages', 'response_received_count'),
+    ('errors', 'log_count/ERROR'),
+    ('dropped', 'item_dropped_count'),
+)
+
+
+def print_summary(crawlers):
+    print()
+    print(f"{'spider':<16} {'items':>8} {'pages':>8} {'errors':>7} {'dropped':>8} {'time s':>8}  finish")
+    totals = {name: 0 for name, _ in SUMMARY_STATS}
+    longest = 0
+    for crawler in crawlers:
+        # crawl() mohl selhat pri startu - spider ani stats pak nejsou
+        try:
+            stats = crawler.stats.get_stats()
+        except RuntimeError:
+            stats = {}
+        values = {name: stats.get(key, 0) for name, key in SUMMARY_STATS}
+        elapsed = stats.get('elapsed_time_seconds', 0)
+        longest = max(longest, elapsed)
+        for name in totals:
+            totals[name] += values[name]
+        print(f"{crawler.spidercls.name:<16} {values['items']:>8} {values['pages']:>8} {values['errors']:>7} "
+              f"{values['dropped']:>8} {elapsed:>8.0f}  {stats.get('finish_reason', '-')}")
+    print(f"{'TOTAL':<16} {totals['items']:>8} {totals['pages']:>8} {totals['errors']:>7} "
+          f"{totals['dropped']:>8} {longest:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run shop spiders concurrently")
+    parser.add_argument('spiders', nargs='*', help="spider names (default: all)")
+    parser.add_argument('-s', '--set', action='append', default=[], metavar='NAME=VALUE',
+                        help="override a setting, like scrapy crawl -s")
+    args = parser.parse_args()
+
+    settings = get_project_settings()
+    for override in args.set:
+        name, _, value = override.partition('=')
+        settings.set(name, value, priority='cmdline')
+
+    process = CrawlerProcess(settings)
+    names = args.spiders or process.spider_loader.list()
+
+    crawlers = []
+    for name in names:
+        crawler = process.create_crawler(name)
+        crawlers.append(crawler)
+        process.crawl(crawler)
+
+    process.start()
+    print_summary(crawlers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Selector health - notices when a shop changed its markup and the spider's
+selectors stopped matching, instead of crawling empty pages for hours.
+
+A renamed .product-box (Datart) or a missing data-gtm-product-id (Planeo)
+does not raise anything: the listing callback just returns no items.
+SelectorHealthMiddleware counts the items of every listing page per URL
+pattern (instrumentation.url_pattern) and keeps a streak of empty pages:
+
+  * SELECTOR_HEALTH_PATTERN_PAGES empty listing pages in a row of one
+    pattern -> the pattern is flagged (warning, selector_health/flagged/...)
+    and unflagged again by its next page with items
+  * SELECTOR_HEALTH_SPIDER_PAGES listing pages of the whole spider with
+    no item at all since the start of the run (selectors broken from the
+    start), or that many empty pages in a row of patterns that did yield
+    items this run (selectors broke mid-crawl) -> the spider is closed
+    with reason "selector_health" (only logged with
+    SELECTOR_HEALTH_CLOSE = False)
+
+A listing callback also sees pages that never have items (Datart's
+parse_list gets brand and filter pages); once the spider has items, a run
+of those does not close it.
+
+Listing pages are responses handled by a callback named in the spider's
+`listing_callbacks`; spiders without it are not watched. A single empty
+page (end of pagination, empty category) only extends a streak, any page
+with items resets it.
+
+Stats: selector_health/listing_pages, selector_health/empty_pages,
+selector_health/flagged/<pattern>.
+"""
+
+from itemadapter import is_item
+from scrapy import signals
+from scrapy.exceptions import CloseSpider, NotConfigured
+
+from Scraper.instrumentation import callback_name, url_pattern
+
+CLOSE_REASON = 'selector_health'
+
+
+class PatternHealth:
+    """Listing pages of one URL pattern"""
+
+    def __init__(self):
+        self.pages = 0
+        self.items = 0
+        self.empty_streak = 0
+        self.flagged = False
+
+
+class SelectorHealthMiddleware:
+    """Flags URL patterns / closes the spider after a streak of empty listing pages"""
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('SELECTOR_HEALTH_ENABLED', True):
+            raise NotConfigured
+        self.stats = crawler.stats
+        self.pattern_pages = settings.getint('SELECTOR_HEALTH_PATTERN_PAGES', 30)
+        self.spider_pages = settings.getint('SELECTOR_HEALTH_SPIDER_PAGES', 60)
+        self.close = settings.getbool('SELECTOR_HEALTH_CLOSE', True)
+        self.patterns = {}
+        self.pages = 0
+        self.items = 0
+        self.empty_streak = 0
+        self.tripped = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _watched(self, response, spider):
+        callbacks = getattr(spider, 'listing_callbacks', None)
+        return bool(callbacks) and callback_name(response, spider) in callbacks
+
+    def process_spider_output(self, response, result, spider):
+        if not self._watched(response, spider):
+            yield from result
+            return
+        items = 0
+        for value in result:
+            if is_item(value):
+                items += 1
+            yield value
+        self.observe(response.url, items, spider)
+
+    async def process_spider_output_async(self, response, result, spider):
+        if not self._watched(response, spider):
+            async for value in result:
+                yield value
+            return
+        items = 0
+        async for value in result:
+            if is_item(value):
+                items += 1
+            yield value
+        self.observe(response.url, items, spider)
+
+    def observe(self, url, items, spider):
+        """One listing page with `items` items - raises CloseSpider when the spider trips"""
+        pattern = url_pattern(url)
+        health = self.patterns.get(pattern)
+        if health is None:
+            health = self.patterns[pattern] = PatternHealth()
+        health.pages += 1
+        health.items += items
+        self.pages += 1
+        self.items += items
+        self.stats.inc_value('selector_health/listing_pages')
+
+        if items:
+            if health.flagged:
+                health.flagged = False
+                spider.logger.info(f"Selector health: {pattern} yields items again")
+            health.empty_streak = 0
+            self.empty_streak = 0
+            return
+
+        health.empty_streak += 1
+        if health.items:
+            # vzor, ktery uz polozky daval -> selektory mohly prestat fungovat
+            self.empty_streak += 1
+        self.stats.inc_value('selector_health/empty_pages')
+
+        if health.empty_streak == self.pattern_pages and not health.flagged:
+            health.flagged = True
+            self.stats.inc_value(f'selector_health/flagged/{pattern}')
+            spider.logger.warning(
+                f"Selector health: {self.pattern_pages} listing pages in a row of {pattern} "
+                f"had no items (last {url}) - selectors of {spider.name} may be broken")
+
+        if self.tripped:
+            return
+        if not self.items and self.pages >= self.spider_pages:
+            problem = f"none of the first {self.pages} listing pages had items"
+        elif self.empty_streak >= self.spider_pages:
+            problem = f"{self.empty_streak} listing pages in a row had no items"
+        else:
+            return
+        self.tripped = True
+        spider.logger.error(f"Selector health: {problem}, {'closing' if self.close else 'not closing'} {spider.name}")
+        if self.close:
+            raise CloseSpider(CLOSE_REASON)
+
+    def spider_closed(self, spider):
+        flagged = [pattern for pattern, health in self.patterns.items() if health.flagged]
+        if flagged:
+            spider.logger.warning(f"Selector health: patterns without items at close: {', '.join(flagged)}")
@@ -22,6 +22,8 @@ USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTM
 ROBOTSTXT_OBEY = True
 
 # Concurrency and throttling settings
+# These are only the starting values for a shop never crawled before -
+# AdaptiveThrottle (below) tunes delay and concurrency per domain.
 #CONCURRENT_REQUESTS = 16
 CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 1
@@ -49,9 +51,15 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "Scraper.middlewares.ScraperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "Scraper.middlewares.ScraperSpiderMiddleware": 543,
+    # Marks requests done for the disk scheduler (no-op with other schedulers)
+    "Scraper.diskqueue.DiskQueueSpiderMiddleware": 50,
+    # Selector health - flags/stops crawls whose listing pages stopped yielding items
+    "Scraper.selectorhealth.SelectorHealthMiddleware": 800,
+    # Profiling - closest to the spider so it times only the callback itself
+    "Scraper.profiling.ProfilingSpiderMiddleware": 990,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -59,17 +67,26 @@ DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
     'scrapy.downloadermiddlewares.retry.RetryMiddleware': 90,
     'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 110,
+    # Instrumentation - last before the downloader, sees raw (compressed) responses
+    'Scraper.middlewares.ScraperDownloaderMiddleware': 950,
 }
 
+# Where the middlewares write <spider>.json / <spider>.prom at spider close
+INSTRUMENTATION_DIR = "crawl_metrics"
+
 # Retry settings
 RETRY_TIMES = 3
 RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "Scraper.extensions.AdaptiveThrottle": 500,
+    "Scraper.profiling.CallbackProfiler": 510,
+    "Scraper.extensions.MemoryGuard": 520,
+    "Scraper.parsepool.ParsePool": 530,
+    "Scraper.crawlruns.CrawlLedger": 540,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -77,13 +94,97 @@ ITEM_PIPELINES = {
     "Scraper.pipelines.ScraperPipeline": 300,
 }
 
-# Enable and configure the AutoThrottle extension (disabled by default)
-# See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
-AUTOTHROTTLE_START_DELAY = 2
-AUTOTHROTTLE_MAX_DELAY = 10
-AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
-AUTOTHROTTLE_DEBUG = False
+# SQLite database shared by all spiders and the web app
+DB_PATH = "comparison_data.db"
+# Items buffered per executemany() in the shared BatchWriter
+DB_BATCH_SIZE = 100
+# Read snapshot published for the web app after each crawl (Scraper/snapshot.py),
+# None = web app reads DB_PATH directly
+SNAPSHOT_PATH = "comparison_snapshot.db"
+
+# Crawl-run ledger (Scraper/crawlruns.py) - a crawl_runs row in DB_PATH per
+# finished spider run; python -m Scraper.crawlruns compares runs with the
+# median of the previous CRAWL_LEDGER_BASELINE normal runs
+CRAWL_LEDGER_ENABLED = True
+CRAWL_LEDGER_BASELINE = 5
+
+# Per-domain adaptive throttle (Scraper.extensions.AdaptiveThrottle),
+# replaces AutoThrottle - the two would fight over the slot delay
+AUTOTHROTTLE_ENABLED = False
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_MIN_DELAY = 0.25
+ADAPTIVE_THROTTLE_MAX_DELAY = 10
+ADAPTIVE_THROTTLE_MIN_CONCURRENCY = 1
+ADAPTIVE_THROTTLE_MAX_CONCURRENCY = 4
+ADAPTIVE_THROTTLE_WINDOW = 20            # responses between adjustments
+ADAPTIVE_THROTTLE_MAX_ERROR_RATE = 0.05
+ADAPTIVE_THROTTLE_ERROR_CODES = [429, 503]   # "slow down" answers from RETRY_HTTP_CODES
+ADAPTIVE_THROTTLE_STATE_FILE = "throttle_state.json"
+ADAPTIVE_THROTTLE_DEBUG = False
+# Stricter bounds for shops that need them (matched by domain suffix)
+ADAPTIVE_THROTTLE_DOMAINS = {
+    "mironet.cz": {"min_delay": 2, "max_concurrency": 1},
+}
+
+# Canonical request URLs (Scraper/canonical.py) - sorted query, tracking and
+# sort/view parameters dropped, one trailing-slash form; used by every
+# dupefilter and by the spiders' link following
+REQUEST_FINGERPRINTER_CLASS = "Scraper.canonical.CanonicalRequestFingerprinter"
+DUPEFILTER_CLASS = "Scraper.canonical.CanonicalDupeFilter"
+# Parameters to drop per shop (matched by domain suffix, "*" = every site,
+# "name*" = prefix); trailing_slash: "strip", "add" or None
+URL_CANONICAL_RULES = {
+    "*": {
+        "drop": ["utm_*", "gclid", "fbclid", "msclkid", "srsltid", "_ga", "mc_cid", "mc_eid"],
+        "trailing_slash": "strip",
+    },
+    "datart.cz": {"drop": ["sort", "sortBy", "order", "view", "listingView", "limit"]},
+    "planeo.cz": {"drop": ["sort", "order", "view"]},
+}
+
+# HTTP/2 (Scraper/http2.py) - opt-in, one multiplexed TLS connection per shop,
+# HTTP/1.1 fallback for servers without h2 and for proxied requests
+#   scrapy crawl dtrspider -s HTTP2_ENABLED=1
+DOWNLOAD_HANDLERS = {
+    "https": "Scraper.http2.ShopDownloadHandler",
+}
+HTTP2_ENABLED = False
+HTTP2_DOMAINS = ["datart.cz", "mironet.cz", "planeo.cz"]
+
+# Disk-backed scheduler (Scraper/diskqueue.py) - used by dtrspider, resumable after a kill
+DISK_QUEUE_DIR = "crawls"                # <dir>/<spider>.sqlite, JOBDIR wins if set
+DISK_QUEUE_WINDOW = 100                  # requests read ahead into memory
+DISK_DUPEFILTER_WINDOW = 100000          # recent fingerprints kept in memory
+DISK_QUEUE_CHECKPOINT = 100              # handled responses between checkpoints
+
+# Memory guard - slows scheduling before the OOM killer steps in
+# (limit: MEMORY_GUARD_LIMIT_MB, else MEMUSAGE_LIMIT_MB, else the cgroup limit)
+MEMORY_GUARD_ENABLED = True
+MEMORY_GUARD_LIMIT_MB = 0
+MEMORY_GUARD_SOFT = 0.75                 # halve total concurrency above this share
+MEMORY_GUARD_HARD = 0.9                  # pause the engine above this share
+MEMORY_GUARD_INTERVAL = 5
+
+# Selector health (Scraper/selectorhealth.py) - empty listing pages in a row
+# (callbacks in the spider's listing_callbacks) before flagging a URL pattern
+# and before closing the spider with reason "selector_health"
+SELECTOR_HEALTH_ENABLED = True
+SELECTOR_HEALTH_PATTERN_PAGES = 30
+SELECTOR_HEALTH_SPIDER_PAGES = 60
+SELECTOR_HEALTH_CLOSE = True
+
+# Parse pool (Scraper/parsepool.py) - dtrspider parses listing pages in worker processes
+#   scrapy crawl dtrspider -s PARSE_POOL_ENABLED=1
+PARSE_POOL_ENABLED = False
+PARSE_POOL_WORKERS = 0                   # 0 = os.cpu_count()
+
+# Per-callback profiling (Scraper/profiling.py) - off by default, adds overhead
+#   scrapy crawl dtrspider -s PROFILING_ENABLED=1
+PROFILING_ENABLED = False
+PROFILING_DIR = "profiles"
+PROFILING_SAMPLE_INTERVAL = 0.005        # seconds between stack samples
+PROFILING_TOP_N = 20
+PROFILING_TRACEMALLOC = True
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
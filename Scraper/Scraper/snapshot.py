@@ -0,0 +1,143 @@
+"""
+Read snapshot of the crawl database for the web app.
+
+The crawl writes comparison_data.db (WAL, constantly changing). After the
+last spider finishes, BatchWriter publishes a separate read-only copy:
+
+    comparison_snapshot.db  - products clustered by (category_id, price),
+                              every index the web app needs, ANALYZEd,
+                              VACUUMed, rollback journal (no -wal/-shm)
+                              + best_offers, a stats table and facet
+                              bitmaps (Scraper/facets.py)
+
+The copy is built under a temporary name next to the target and moved over
+it with os.replace(), so the swap is atomic - the web app opens the file
+with immutable=1 (no locks, no change detection) and reopens it when the
+inode changes. Connections opened before the swap keep reading the old
+file until they are closed.
+
+    python -m Scraper.snapshot                        # comparison_data.db -> comparison_snapshot.db
+    python -m Scraper.snapshot --out /srv/web/comparison_snapshot.db
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from urllib.request import pathname2url
+
+from Scraper.facets import write_postings
+
+logger = logging.getLogger(__name__)
+
+# tabulky, ktere web app cte (category_aliases a spol. potrebuje jen crawl)
+TABLES = ('products', 'meta', 'categories', 'best_offers')
+
+# poradi radku v products - filtr kategorie + razeni podle ceny cte souvisly kus souboru
+CLUSTER_ORDER = {'products': 'category_id, price'}
+
+READ_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS products_source_site ON products (source_site)",
+)
+
+STATS_TABLE = """
+    CREATE TABLE stats (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    ) WITHOUT ROWID
+"""
+
+
+def copy_tables(conn):
+    """Schema and rows of TABLES from the attached `src` database"""
+    for table in TABLES:
+        row = conn.execute("SELECT sql FROM src.sqlite_master WHERE type = 'table' AND name = ?",
+                           (table,)).fetchone()
+        if row is None:
+            continue
+        conn.execute(row[0])
+        order = CLUSTER_ORDER.get(table)
+        conn.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}"
+                     + (f" ORDER BY {order}" if order else ""))
+
+        # indexy az po naplneni - postavi se jednim serazenim misto po radcich
+        for (sql,) in conn.execute("""
+            SELECT sql FROM src.sqlite_master
+            WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+        """, (table,)).fetchall():
+            conn.execute(sql)
+    for sql in READ_INDEXES:
+        conn.execute(sql)
+
+
+def build_stats(conn):
+    """Counts the app would otherwise compute per request"""
+    conn.execute(STATS_TABLE)
+    conn.execute("INSERT INTO stats SELECT 'products', COUNT(*) FROM products")
+    conn.execute("""
+        INSERT INTO stats
+        SELECT 'products/' || source_site, COUNT(*) FROM products GROUP BY source_site
+    """)
+    conn.execute("""
+        INSERT INTO stats
+        SELECT 'category/' || category_id, COUNT(*) FROM products
+        WHERE category_id IS NOT NULL GROUP BY category_id
+    """)
+
+
+def build_snapshot(source_path, target_path):
+    """Build a snapshot of source_path into target_path (overwritten)"""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    conn = sqlite3.connect(target_path, isolation_level=None, uri=True)
+    try:
+        # soubor se po dokonceni uz nikdy nemeni - journal ani fsync po krocich netreba
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("ATTACH DATABASE ? AS src", (f"file:{pathname2url(os.path.abspath(source_path))}?mode=ro",))
+        conn.execute("BEGIN")
+        copy_tables(conn)
+        build_stats(conn)
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        # bitmapy az po VACUUM - ten smi precislovat rowid
+        conn.execute("BEGIN")
+        write_postings(conn)
+        conn.execute("COMMIT")
+        # immutable=1 cte jen soubory bez WAL
+        conn.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        conn.close()
+
+
+def publish_snapshot(source_path, target_path):
+    """Build the snapshot under a temporary name and atomically swap it in"""
+    started = time.monotonic()
+    tmp_path = f"{target_path}.tmp-{os.getpid()}"
+    try:
+        build_snapshot(source_path, tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info("Published snapshot %s (%.1f MB) in %.2f s", target_path,
+                os.path.getsize(target_path) / 1e6, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a read snapshot of the crawl database")
+    parser.add_argument('--db', default='comparison_data.db', help="crawl database (default: %(default)s)")
+    parser.add_argument('--out', default='comparison_snapshot.db', help="snapshot path (default: %(default)s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    publish_snapshot(args.db, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,83 +1,165 @@
+from scrapy.http import HtmlResponse
 from scrapy.spiders import CrawlSpider, Rule
 from scrapy.linkextractors import LinkExtractor
 import json
 
+from Scraper.canonical import canonical_request
+from Scraper.htmlslice import absolute_url, find_class, fragment, region
+from Scraper.parsepool import parse_pool_for
+
+
+def parse_products(response):
+    """
+    Items of a listing page plus the number of product boxes with broken
+    GTM JSON. A plain function, so it runs inline or in a parse pool worker.
+    """
+    items = []
+    errors = 0
+    # aplikuje se na vsechny produkty v ramci html kodu - parsuje se jen
+    # mrizka produktu (od prvniho .product-box po paticku), ne cele menu
+    start = find_class(response.body, b'product-box')
+    if start < 0:
+        return items, errors
+    grid = fragment(region(response.body, start, end_marker=b'<footer'), response.encoding)
+    product_boxes = grid.css(".product-box")
+
+    if not product_boxes:
+        return items, errors
+
+    for product_box in product_boxes:
+        
+
+        data_attr = product_box.css("::attr(data-gtm-data-product)").get()
+        item_name = None
+        item_price = None
+        item_link = None
+        item_rating = None
+        item_category = None
+
+        # extrakt jmena
+        if data_attr:
+            try:
+                # lxml uz entity v atributu dekodoval; replace jen pro dvojite escapovani
+                if "&quot;" in data_attr:
+                    data_attr = data_attr.replace("&quot;", '"')
+                data_json = json.loads(data_attr)
+                item_name = data_json.get("item_name")
+                full_category = data_json.get("item_category")
+
+                if full_category:
+                    segments = [s.strip() for s in full_category.split('/') if s.strip()]
+                    if segments:
+                         item_category = segments[-1]
+            except json.JSONDecodeError:
+                errors += 1
+        # extrakt ceny
+        item_price = product_box.css('[data-product-price]::attr(data-product-price)').get()
+
+        # extrakt linku na produkt
+        item_link = product_box.css('a::attr(href)').get()
+        if item_link:
+            item_link = absolute_url(response, item_link)
+
+        # extrakt hodnoceni
+        item_rating = product_box.css('.rating-wrap span.bold::text').get()
+        if item_rating:
+            item_rating = item_rating.strip()
+        
+        
+        
+
+        # vysledny yield
+        if item_name:
+            yield_item = {
+                "title": item_name
+            }
+            
+            # pokud extraknul cenu, prida se cena do yieldu
+            if item_price:
+                yield_item["price"] = item_price
+            
+            # pokud extraknul link na produkt, prida se cena do yieldu
+            if item_link:
+                yield_item["link"] = item_link
+
+            # pokud extraknul hodnoceni, prida se cena do yieldu
+            if item_rating:
+                yield_item["rating"] = item_rating
+
+            # pokud extraknul kategorii, prida se cena do yieldu
+            if item_category:
+                yield_item["category"] = item_category
+
+            items.append(yield_item)
+
+    return items, errors
+
+
+def extract_listing(url, body, encoding, link_extractors):
+    """Parse pool task - products and the rules' links of a page from its raw bytes"""
+    response = HtmlResponse(url=url, body=body, encoding=encoding)
+    items, errors = parse_products(response)
+    links = [extractor.extract_links(response) for extractor in link_extractors]
+    return items, errors, links
+
+
 class DatartSpider(CrawlSpider):
     name = "dtrspider"
     allowed_domains = ["datart.cz"]
     start_urls = ["https://www.datart.cz/"]
 
+    # fronta a dupefilter na disku - cely web se do pameti nevejde, crawl jde obnovit po killu
+    custom_settings = {
+        "SCHEDULER": "Scraper.diskqueue.DiskScheduler",
+    }
+
+    # vypisy hlida SelectorHealthMiddleware - prejmenovany .product-box crawl zastavi
+    listing_callbacks = ("parse_list",)
+
     rules = (
-        Rule(LinkExtractor(allow=(r"/[a-z0-9-]+\.html($|\?.+$)", r"/[a-z0-9-]+/strana-[0-9]+\.html$"), deny=(r"-[0-9a-z]{5,}\.html$", r".*/vyprodej-poslednich-kusu\.html")), callback="parse_list", follow=True),
+        Rule(LinkExtractor(allow=(r"/[a-z0-9-]+\.html($|\?.+$)", r"/[a-z0-9-]+/strana-[0-9]+\.html$"), deny=(r"-[0-9a-z]{5,}\.html$", r".*/vyprodej-poslednich-kusu\.html")), callback="parse_list", follow=True,
+             process_request="canonicalize_request"),
     )
+
+    def canonicalize_request(self, request, response):
+        # ?sort=, ?utm_... varianty jednoho vypisu -> jedna URL (URL_CANONICAL_RULES)
+        return canonical_request(self, request)
     
     def parse_list(self, response):
-        # aplikuje se na vsechny produkty v ramci html kodu
-        product_boxes = response.css(".product-box") 
+        pool = parse_pool_for(getattr(self, 'crawler', None))
+        if pool is not None:
+            return self.parse_list_in_pool(response, pool)
+        items, errors = parse_products(response)
+        self.log_errors(errors)
+        return items
 
-        if not product_boxes:
-            return
+    async def parse_list_in_pool(self, response, pool):
+        # parsovani i hledani odkazu bezi ve worker procesu, reaktor mezitim stahuje
+        items, errors, links = await pool.run(
+            extract_listing, response.url, response.body, response.encoding,
+            [rule.link_extractor for rule in self._rules],
+        )
+        self.log_errors(errors)
+        for item in items:
+            yield item
 
-        for product_box in product_boxes:
-            
-
-            data_attr = product_box.css("::attr(data-gtm-data-product)").get()
-            item_name = None
-            item_price = None
-            item_link = None
-            item_rating = None
-            item_category = None
-
-            # extrakt jmena
-            if data_attr:
-                try:
-                    data_json = json.loads(data_attr.replace("&quot;", '"'))
-                    item_name = data_json.get("item_name")
-                    full_category = data_json.get("item_category")
-
-                    if full_category:
-                        segments = [s.strip() for s in full_category.split('/') if s.strip()]
-                        if segments:
-                             item_category = segments[-1]
-                except json.JSONDecodeError:
-                    self.logger.warning(f"Failed to decode JSON for a product box.")
-                    pass
-            # extrakt ceny
-            item_price = product_box.css('[data-product-price]::attr(data-product-price)').get()
-
-            # extrakt linku na produkt
-            item_link = product_box.css('a::attr(href)').get()
-            if item_link:
-                item_link = response.urljoin(item_link)
+        # Odkazy uz jsou extrahovane - CrawlSpider je podruhe nehleda (_requests_to_follow)
+        response.meta['links_extracted'] = True
+        if not (self._follow_links and self._rules[response.meta['rule']].follow):
+            return
+        seen = set()
+        for rule_index, (rule, rule_links) in enumerate(zip(self._rules, links)):
+            for link in rule.process_links([link for link in rule_links if link not in seen]):
+                seen.add(link)
+                request = rule.process_request(self._build_request(rule_index, link), response)
+                if request is not None:
+                    yield request
 
-            # extrakt hodnoceni
-            item_rating = product_box.css('.rating-wrap span.bold::text').get()
-            if item_rating:
-                item_rating = item_rating.strip()
-            
-            
-            
+    def _requests_to_follow(self, response):
+        if response.meta.get('links_extracted'):
+            return []
+        return super()._requests_to_follow(response)
 
-            # vysledny yield
-            if item_name:
-                yield_item = {
-                    "title": item_name
-                }
-                
-                # pokud extraknul cenu, prida se cena do yieldu
-                if item_price:
-                    yield_item["price"] = item_price
-                
-                # pokud extraknul link na produkt, prida se cena do yieldu
-                if item_link:
-                    yield_item["link"] = item_link
-
-                # pokud extraknul hodnoceni, prida se cena do yieldu
-                if item_rating:
-                    yield_item["rating"] = item_rating
-
-                # pokud extraknul kategorii, prida se cena do yieldu
-                if item_category:
-                    yield_item["category"] = item_category
-
-                yield yield_item
\ No newline at end of file
+    def log_errors(self, errors):
+        for _ in range(errors):
+            self.logger.warning(f"Failed to decode JSON for a product box.")
@@ -2,6 +2,20 @@ import scrapy
 import json
 import re
 
+from Scraper.htmlslice import absolute_url, find_class, fragment, is_tag, js_unescape, region, tag_start
+from Scraper.prices import parse_number
+
+# Regex nad bajty stranky (match s pozici nic nekopiruje)
+ITEMS_ARRAY = re.compile(rb'items:\s*\[(.*?)\](?=\s*[,}])', re.DOTALL)
+FRAGMENT_LIMIT = 16384
+REL_NEXT = re.compile(rb'\srel=["\']?next(?=[\s"\'>])')
+
+# Regexy nad dekodovanym polem items
+ITEM_OBJECT = re.compile(r'\{[^}]*item_id:[^}]*\}', re.DOTALL)
+ITEM_ID = re.compile(r'item_id:\s*"([^"]+)"')
+ITEM_NAME = re.compile(r'item_name:\s*"([^"]+)"')
+ITEM_PRICE = re.compile(r'price:\s*(\d+(?:\.\d+)?)')
+
 
 class MironetSpider(scrapy.Spider):
     name = "mironetspider"
@@ -10,13 +24,15 @@ class MironetSpider(scrapy.Spider):
     # Start from homepage to discover all categories
     start_urls = ['https://www.mironet.cz/']
 
+    # Delay/concurrency bounds for mironet.cz are in ADAPTIVE_THROTTLE_DOMAINS (settings.py)
     custom_settings = {
         'DOWNLOAD_DELAY': 2,
-        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
-        'CONCURRENT_REQUESTS': 1,  # Process one at a time
         'DEPTH_LIMIT': 0,  # No depth limit
     }
 
+    # Listing pages watched by SelectorHealthMiddleware (Scraper/selectorhealth.py)
+    listing_callbacks = ('parse_category',)
+
     def parse(self, response):
         """Parse homepage to find all category links"""
         
@@ -72,104 +88,106 @@ class MironetSpider(scrapy.Spider):
         
         # Extract category from URL
         category = self.extract_category(response)
-        
-        # Find all script tags
-        scripts = response.css('script::text').getall()
+        body = response.body
         
         scraped_count = 0
         found_items = False
         
-        for script in scripts:
-            # Look for the items array in JavaScript
-            if 'items:' in script and 'item_id:' in script:
-                self.logger.debug("Found JavaScript with product data!")
-                found_items = True
-                
-                # Extract the items array using regex
-                items_match = re.search(r'items:\s*\[(.*?)\](?=\s*[,}])', script, re.DOTALL)
+        # Pole items hledame primo v bajtech stranky - zadne dekodovani
+        # vsech <script> do stringu, dekoduje se jen samotne pole
+        item_pos = body.find(b'item_id:')
+        items_pos = body.rfind(b'items:', 0, item_pos) if item_pos >= 0 else -1
+        if items_pos >= 0:
+            self.logger.debug("Found JavaScript with product data!")
+            found_items = True
+            
+            # Extract the items array using regex
+            items_match = ITEMS_ARRAY.match(body, items_pos)
+            
+            if items_match:
+                items_str = items_match.group(1).decode(response.encoding, errors='replace')
                 
-                if items_match:
-                    items_str = items_match.group(1)
-                    
-                    # Find all item objects
-                    item_pattern = r'\{[^}]*item_id:[^}]*\}'
-                    item_matches = re.finditer(item_pattern, items_str, re.DOTALL)
+                # Find all item objects
+                for item_match in ITEM_OBJECT.finditer(items_str):
+                    item_str = item_match.group(0)
                     
-                    for item_match in item_matches:
-                        item_str = item_match.group(0)
+                    try:
+                        # Extract fields using regex
+                        item_id = ITEM_ID.search(item_str)
+                        item_name = ITEM_NAME.search(item_str)
+                        price = ITEM_PRICE.search(item_str)
                         
-                        try:
-                            # Extract fields using regex
-                            item_id = re.search(r'item_id:\s*"([^"]+)"', item_str)
-                            item_name = re.search(r'item_name:\s*"([^"]+)"', item_str)
-                            price = re.search(r'price:\s*(\d+(?:\.\d+)?)', item_str)
+                        if item_name:
+                            # Decode unicode escapes
+                            title = js_unescape(item_name.group(1))
                             
-                            if item_name:
-                                title = item_name.group(1)
-                                
-                                # Decode unicode escapes manually
-                                unicode_map = {
-                                    '\\u00e1': 'á', '\\u00c1': 'Á',
-                                    '\\u00e9': 'é', '\\u00c9': 'É',
-                                    '\\u00ed': 'í', '\\u00cd': 'Í',
-                                    '\\u00f3': 'ó', '\\u00d3': 'Ó',
-                                    '\\u00fa': 'ú', '\\u00da': 'Ú',
-                                    '\\u00fd': 'ý', '\\u00dd': 'Ý',
-                                    '\\u010d': 'č', '\\u010c': 'Č',
-                                    '\\u010f': 'ď', '\\u010e': 'Ď',
-                                    '\\u011b': 'ě', '\\u011a': 'Ě',
-                                    '\\u0148': 'ň', '\\u0147': 'Ň',
-                                    '\\u0159': 'ř', '\\u0158': 'Ř',
-                                    '\\u0161': 'š', '\\u0160': 'Š',
-                                    '\\u0165': 'ť', '\\u0164': 'Ť',
-                                    '\\u016f': 'ů', '\\u016e': 'Ů',
-                                    '\\u017e': 'ž', '\\u017d': 'Ž',
-                                    '\\/': '/',
-                                }
-                                
-                                for code, char in unicode_map.items():
-                                    title = title.replace(code, char)
-                                
-                                price_val = float(price.group(1)) if price else None
-                                
-                                # Build product URL
-                                link = None
-                                if item_id:
-                                    link = f"https://www.mironet.cz/produkt/d{item_id.group(1)}"
-                                
-                                scraped_count += 1
-                                yield {
-                                    'title': title,
-                                    'price': price_val,
-                                    'link': link,
-                                    'category': category,
-                                    'rating': None,
-                                }
-                        except Exception as e:
-                            self.logger.debug(f"Error parsing item: {e}")
-                            continue
-                
-                break  # Found the data, no need to check other scripts
+                            # JS cislo (i "83918.38999999998") -> float, halere az v pipeline
+                            price_val = parse_number(price.group(1)) if price else None
+                            
+                            # Build product URL
+                            link = None
+                            if item_id:
+                                link = f"https://www.mironet.cz/produkt/d{item_id.group(1)}"
+                            
+                            scraped_count += 1
+                            yield {
+                                'title': title,
+                                'price': price_val,
+                                'link': link,
+                                'category': category,
+                                'rating': None,
+                            }
+                    except Exception as e:
+                        self.logger.debug(f"Error parsing item: {e}")
+                        continue
         
         if scraped_count == 0 and not found_items:
             self.logger.warning(f"⚠️ No products found in {category}")
         
         # Pagination - look for next page
-        next_page = (
-            response.css('a.next::attr(href)').get() or
-            response.css('a[rel="next"]::attr(href)').get() or
-            response.css('.pagination a:contains("›")::attr(href)').get() or
-            response.css('.pagination .next a::attr(href)').get()
-        )
+        next_page = self.find_next_page(response)
         
         if next_page:
             self.logger.info(f"➡️ Next page found")
-            yield response.follow(next_page, callback=self.parse_category, dont_filter=True)
+            yield scrapy.Request(absolute_url(response, next_page), callback=self.parse_category, dont_filter=True)
+    
+    def find_next_page(self, response):
+        """Next-page link - parses only the <a rel/class=next> tag or the pagination block"""
+        body = response.body
+        for start in (find_class(body, b'next', tag=b'a'), self.find_rel_next(body)):
+            if start >= 0:
+                link = fragment(region(body, start, end_marker=b'>') + b'>', response.encoding)
+                next_page = link.css('a::attr(href)').get()
+                if next_page:
+                    return next_page
+        
+        start = find_class(body, b'pagination')
+        if start < 0:
+            return None
+        pagination = fragment(region(body, start, limit=FRAGMENT_LIMIT), response.encoding)
+        return (
+            pagination.css('.pagination a:contains("›")::attr(href)').get() or
+            pagination.css('.pagination .next a::attr(href)').get()
+        )
+    
+    def find_rel_next(self, body):
+        # prvni rel=next byva <link> v <head> (SEO) - hleda se dal az k <a>
+        for match in REL_NEXT.finditer(body):
+            start = tag_start(body, match.start())
+            if is_tag(body, start, b'a'):
+                return start
+        return -1
     
     def extract_category(self, response):
         """Extract category from breadcrumbs or URL"""
-        # Try breadcrumbs first
-        breadcrumbs = response.css('.breadcrumbs a::text, .breadcrumb a::text').getall()
+        # Try breadcrumbs first - parsuje se jen blok drobecku
+        breadcrumbs = []
+        start = find_class(response.body, b'breadcrumbs')
+        if start < 0:
+            start = find_class(response.body, b'breadcrumb')
+        if start >= 0:
+            block = fragment(region(response.body, start, limit=FRAGMENT_LIMIT), response.encoding)
+            breadcrumbs = block.css('.breadcrumbs a::text, .breadcrumb a::text').getall()
         if breadcrumbs:
             categories = [b.strip() for b in breadcrumbs if b.strip().lower() not in ['home', 'domů', 'úvod']]
             if categories:
@@ -185,20 +203,3 @@ class MironetSpider(scrapy.Spider):
                     return category
         
         return "Unknown"
-    
-    def parse_price(self, price_text):
-        """Parse price from text"""
-        if not price_text:
-            return None
-        
-        price_cleaned = re.sub(r'[^\d,.]', '', str(price_text))
-        price_cleaned = price_cleaned.replace(',', '.').replace(' ', '')
-        
-        try:
-            if price_cleaned.count('.') > 1:
-                parts = price_cleaned.split('.')
-                price_cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
-            
-            return float(price_cleaned) if price_cleaned else None
-        except (ValueError, AttributeError):
-            return None
\ No newline at end of file
@@ -1,7 +1,10 @@
 from scrapy.spiders import Spider
-from urllib.parse import urljoin, urlparse, parse_qs, urlunparse
+from urllib.parse import urljoin, urlparse, parse_qs, urlunparse, urlencode
 from scrapy.http import Request
 
+from Scraper.canonical import canonical_request
+from Scraper.prices import parse_number
+
 class PlaneoSpider(Spider):
     name = "planeospider"
     allowed_domains = ["planeo.cz"]
@@ -9,6 +12,9 @@ class PlaneoSpider(Spider):
     # přepínání stránek pro zobrazení víc produktů
     OFFSET_STEP = 24
 
+    # výpisy hlídá SelectorHealthMiddleware - chybějící data-gtm-product-id crawl zastaví
+    listing_callbacks = ("parse",)
+
     # učení odkud budeme scrapovat
     start_urls = [
         "https://www.planeo.cz/velke-domaci-spotrebice",
@@ -57,7 +63,8 @@ class PlaneoSpider(Spider):
             rating_value = tile.css('span[data-testid="catalogue.item.rating.value-rating"]::text').get()
             
             item_rating = float(rating_value.replace(',', '.')) if rating_value else None
-            item_price = float(item_price_gross) if item_price_gross else None
+            # GTM cislo ('12990.000') -> float, halere v pipeline
+            item_price = parse_number(item_price_gross)
 
             # --- VÝSLEDKOVÝ YIELD ---
             if item_name and item_price is not None and item_link:
@@ -92,8 +99,8 @@ class PlaneoSpider(Spider):
         # Vytvoříme novou URL s novým offsetem
         query_params['offset'] = [str(new_offset)]
         
-        # Znovu sestavíme query string a celou URL
-        new_query = "&".join([f"{k}={v[0]}" for k, v in query_params.items()])
+        # Znovu sestavíme query string (zakódovaný, všechny hodnoty) - pořadí srovná canonical_request
+        new_query = urlencode(query_params, doseq=True)
         
         # Vytvoříme novou URL (schéma, netloc, path, params, query, fragment)
         next_page_url = urlunparse(parsed_url._replace(query=new_query))
@@ -102,4 +109,4 @@ class PlaneoSpider(Spider):
         
         # Pokračujeme na novou URL
         # Použijeme Request, abychom se vyhnuli chybám v response.follow
-        yield Request(url=next_page_url, callback=self.parse)
\ No newline at end of file
+        yield canonical_request(self, Request(url=next_page_url, callback=self.parse))
\ No newline at end of file
@@ -0,0 +1,13 @@
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def fold(text):
+    """Lowercase, strip diacritics and punctuation: 'Fén  Philips/Série' -> 'fen philips serie'"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
@@ -1,55 +1,241 @@
 """
 Price Comparison Web Application
-Run: python app.py
+Run: python app.py          (development server)
+     python serve.py        (production, multi-worker WSGI server)
 Then open: http://localhost:5000
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import (Flask, Response, render_template, stream_template, request, jsonify,
+                   make_response, g, has_request_context)
+from datetime import datetime
+import functools
+import itertools
 import sqlite3
 import os
+import threading
+
+from assets import init_assets
+from autocomplete import Autocomplete
+from facetindex import Facets
+from Scraper.facets import decode
+from Scraper.offers import group_key
+from Scraper.snapshot import publish_snapshot
+from Scraper.textnorm import fold
+from dbpool import ConnectionPool
+from webcache import LRUCache, make_etag
 
 app = Flask(__name__)
 
-# Database path
+# Hashed/pre-compressed assets from build_assets.py (asset_url() in templates);
+# the build's version is part of page ETags - pages link the hashed names
+ASSET_VERSION = init_assets(app)
+
+
+@app.template_filter('koruny')
+def koruny(halere):
+    """Prices are stored as integer haléře (Scraper/prices.py) -> Kč"""
+    return halere / 100 if halere is not None else None
+
+# Database path - the crawl DB, read directly only until the first snapshot exists
 DB_PATH = 'comparison_data.db'
 
+# Read snapshot published after each crawl (Scraper/snapshot.py), opened
+# immutable - no locks, no contention with the crawl writing DB_PATH
+SNAPSHOT_PATH = os.environ.get('WEB_SNAPSHOT_PATH', 'comparison_snapshot.db')
+SNAPSHOT_MMAP_SIZE = 256 * 1024 * 1024
+
+# WEB_DB_MODE=memory - every worker loads the snapshot into an in-memory
+# database (backup API) and serves from RAM, reloading on each new snapshot
+DB_IN_MEMORY = os.environ.get('WEB_DB_MODE', 'file') == 'memory'
+
+# Crawl metrics written by the Scrapy instrumentation middlewares
+METRICS_DIR = 'crawl_metrics'
+
+# Products per page when ?page= is given (without it the whole list is shown)
+PER_PAGE = 60
+
+# Unpaged listings with more rows than this are streamed instead of cached
+STREAM_MIN_ROWS = int(os.environ.get('WEB_STREAM_MIN_ROWS', 2000))
+STREAM_BATCH = 500      # rows per cursor fetch
+STREAM_BUFFER = 16384   # characters per response chunk
+
+# Query results and rendered pages, invalidated when the data version changes
+query_cache = LRUCache(maxsize=512)
+page_cache = LRUCache(maxsize=256)
+
+# One pool per worker process, sized to the worker's thread count
+db_pool = ConnectionPool(DB_PATH, size=int(os.environ.get('WEB_THREADS', 8)),
+                         mmap_size=SNAPSHOT_MMAP_SIZE)
+snapshot_id = None
+snapshot_lock = threading.Lock()
+
 def get_db_connection():
-    """Create database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Access columns by name
-    return conn
+    """Get a database connection from the pool (conn.close() returns it)"""
+    return db_pool.acquire()
 
-def get_categories():
-    """Get all unique categories"""
+def refresh_db_source():
+    """Move the pool to the snapshot file once a new one has been swapped in"""
+    global snapshot_id
+    try:
+        st = os.stat(SNAPSHOT_PATH)
+    except OSError:
+        return  # zadny snapshot zatim neni -> cte se primo DB_PATH
+    current = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if current == snapshot_id:
+        return
+    # Nacitani do pameti trva - ostatni vlakna zatim obsluhuji starou verzi
+    if not snapshot_lock.acquire(blocking=snapshot_id is None):
+        return
+    try:
+        if current != snapshot_id:
+            db_pool.switch(SNAPSHOT_PATH, immutable=True, in_memory=DB_IN_MEMORY)
+            snapshot_id = current
+    finally:
+        snapshot_lock.release()
+
+def prepare_database():
+    """
+    Upgrade DB_PATH to the current schema (categories, best_offers, price
+    migration ...) and publish the first snapshot when there is none yet -
+    a crawl does the same, but the app may start on a database no crawl has
+    opened. Facets are served only from a snapshot: their bitmaps point at
+    rowids, which BatchWriter keeps changing in the crawl DB.
+    """
+    if os.path.exists(SNAPSHOT_PATH) or not os.path.exists(DB_PATH):
+        return
+    # pipeline tahne Scrapy - jen pri startu, ne pri importu
+    from Scraper.pipelines import prepare_database as upgrade
+    upgrade(DB_PATH)
+    publish_snapshot(DB_PATH, SNAPSHOT_PATH)
+
+def get_data_version():
+    """Get (data_version, updated_at) written by the pipeline after each crawl"""
+    refresh_db_source()
     conn = get_db_connection()
-    categories = conn.execute("""
-        SELECT DISTINCT category 
-        FROM products 
-        WHERE category IS NOT NULL AND category != 'Unknown'
-        ORDER BY category
-    """).fetchall()
+    try:
+        rows = conn.execute("""
+            SELECT key, value FROM meta
+            WHERE key IN ('data_version', 'updated_at')
+        """).fetchall()
+    except sqlite3.OperationalError:
+        # DB from before the meta table existed
+        rows = []
     conn.close()
-    return [cat['category'] for cat in categories]
+    meta = {row['key']: row['value'] for row in rows}
+    return int(meta.get('data_version', 0)), meta.get('updated_at')
+
+def current_data_version():
+    """Data version, looked up once per request"""
+    if not has_request_context():
+        return get_data_version()
+    if 'data_version' not in g:
+        g.data_version = get_data_version()
+    return g.data_version
+
+def cached_query(func):
+    """Cache query results by arguments until the next crawl finishes"""
+    @functools.wraps(func)
+    def wrapper(*args):
+        version, _ = current_data_version()
+        key = (func.__name__,) + args
+        result = query_cache.get(key, version)
+        if result is None:
+            result = func(*args)
+            query_cache.set(key, result, version)
+        return result
+    return wrapper
 
-def get_products(category=None, search=None, sort_by='price_asc'):
-    """Get products with optional filtering and sorting"""
+def cached_page(key, render):
+    """Serve a rendered page from cache with ETag/Last-Modified (304 when unchanged)"""
+    version, updated_at = current_data_version()
+    key = (ASSET_VERSION,) + key
+    etag = make_etag(version, key)
+    html = page_cache.get(key, version)
+    
+    if html is None:
+        if etag in request.if_none_match:
+            # Client already has it - no need to render at all
+            html = ''
+        else:
+            html = render()
+            page_cache.set(key, html, version)
+    
+    response = make_response(html)
+    response.set_etag(etag)
+    if updated_at:
+        response.last_modified = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+    response.cache_control.no_cache = True  # always revalidate, 304 is cheap
+    return response.make_conditional(request)
+
+@cached_query
+def get_categories():
+    """Canonical category tree (Scraper/categories.py) - top-level categories
+    with their children, only those that have products"""
     conn = get_db_connection()
+    rows = conn.execute("""
+        SELECT c.id, c.slug, c.name, c.parent_id,
+               (SELECT COUNT(*) FROM products p WHERE p.category_id = c.id) AS count
+        FROM categories c
+        ORDER BY c.position
+    """).fetchall()
+    conn.close()
     
-    query = """
-        SELECT title, price, rating, link, source_site, category
-        FROM products
-        WHERE 1=1
-    """
+    nodes = {row['id']: dict(row, ids=[row['id']], children=[]) for row in rows}
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id'])
+        if parent:
+            parent['children'].append(node)
+            parent['ids'].append(node['id'])
+            parent['count'] += node['count']
+    for node in nodes.values():
+        node['children'] = [child for child in node['children'] if child['count']]
+    return [node for node in nodes.values() if node['parent_id'] is None and node['count']]
+
+def find_category(slug):
+    """(top-level category, selected category) for a slug or name, (None, None) if unknown"""
+    key = fold(slug)
+    for top in get_categories():
+        for node in [top] + top['children']:
+            if key and key in (fold(node['slug']), fold(node['name'])):
+                return top, node
+    return None, None
+
+def build_products_query(category=None, search=None, sort_by='price_asc', columns=None):
+    """Build the products SELECT for the given filters and sorting"""
+    if columns:
+        query = f"""
+            SELECT {columns}
+            FROM products
+            WHERE 1=1
+        """
+    else:
+        # kanonicky nazev kategorie, nazev ze shopu jen pro nenamapovane;
+        # souhrn srovnani z best_offers - jedno cteni podle primarniho klice na kartu
+        query = """
+            SELECT products.title, price, rating, link, source_site,
+                   COALESCE(categories.name, products.category) AS category,
+                   best_offers.min_price AS best_price, best_offers.shops AS shops,
+                   best_offers.best_site AS best_site
+            FROM products
+            LEFT JOIN categories ON categories.id = products.category_id
+            LEFT JOIN best_offers ON best_offers.group_key = products.group_key
+            WHERE 1=1
+        """
     params = []
     
-    # Filter by category
+    # Filter by category - id kategorie a jejich podkategorii, products_category index
     if category and category != 'all':
-        query += " AND category = ?"
-        params.append(category)
+        _, selected = find_category(category)
+        ids = selected['ids'] if selected else []
+        if ids:
+            query += f" AND category_id IN ({', '.join('?' * len(ids))})"
+            params += ids
+        else:
+            query += " AND 0"
     
     # Search filter
     if search:
-        query += " AND title LIKE ?"
+        query += " AND products.title LIKE ?"
         params.append(f"%{search}%")
     
     # Sorting
@@ -58,71 +244,366 @@ def get_products(category=None, search=None, sort_by='price_asc'):
     elif sort_by == 'price_desc':
         query += " ORDER BY price DESC"
     elif sort_by == 'name_asc':
-        query += " ORDER BY title ASC"
+        query += " ORDER BY products.title ASC"
     elif sort_by == 'name_desc':
-        query += " ORDER BY title DESC"
+        query += " ORDER BY products.title DESC"
+    
+    return query, params
+
+@cached_query
+def get_products(category=None, search=None, sort_by='price_asc', page=None):
+    """Get products with optional filtering, sorting and paging"""
+    conn = get_db_connection()
+    query, params = build_products_query(category, search, sort_by)
+    
+    # Paging
+    if page:
+        query += " LIMIT ? OFFSET ?"
+        params += [PER_PAGE, (page - 1) * PER_PAGE]
     
     products = conn.execute(query, params).fetchall()
     conn.close()
     
     return [dict(row) for row in products]
 
+@cached_query
+def count_products(category=None, search=None):
+    """Number of products matching the filters"""
+    conn = get_db_connection()
+    query, params = build_products_query(category, search, sort_by=None, columns='COUNT(*) AS count')
+    count = conn.execute(query, params).fetchone()['count']
+    conn.close()
+    return count
+
+class RowStream:
+    """Lazy row iterator that can still answer `{% if products %}` in templates"""
+    
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._head = []
+    
+    def __bool__(self):
+        if not self._head:
+            self._head = list(itertools.islice(self._rows, 1))
+        return bool(self._head)
+    
+    def __iter__(self):
+        yield from self._head
+        self._head = []
+        yield from self._rows
+
+def iter_products(category=None, search=None, sort_by='price_asc'):
+    """Stream matching products from a server-side cursor, STREAM_BATCH rows at a time"""
+    conn = get_db_connection()
+    try:
+        query, params = build_products_query(category, search, sort_by)
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH)
+            if not rows:
+                break
+            yield from rows
+        cursor.close()
+    finally:
+        conn.close()
+
+def buffered(chunks, size):
+    """Join small template chunks into ~size characters per write"""
+    buf = []
+    buf_len = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        buf_len += len(chunk)
+        if buf_len >= size:
+            yield ''.join(buf)
+            buf = []
+            buf_len = 0
+    if buf:
+        yield ''.join(buf)
+
+def streamed_page(key, template_name, **context):
+    """Render a template as a stream - for listings too big to build in memory"""
+    version, updated_at = current_data_version()
+    etag = make_etag(version, (ASSET_VERSION,) + key)
+    
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        chunks = stream_template(template_name, **context)
+        response = Response(buffered(chunks, STREAM_BUFFER), mimetype='text/html')
+    
+    response.set_etag(etag)
+    if updated_at:
+        response.last_modified = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+    response.cache_control.no_cache = True
+    return response
+
+@cached_query
 def get_product_comparison(product_name):
     """Get all sellers for a specific product (similar names)"""
     conn = get_db_connection()
     
-    # Find products with similar names (fuzzy matching)
+    # Find products with similar names (fuzzy matching) + offers of other shops
+    # sharing the model number (Scraper/offers.py) - the group only counts
+    # when it really spans shops, a single-shop group can join variants
     products = conn.execute("""
         SELECT title, price, rating, link, source_site, category
         FROM products
         WHERE title LIKE ?
+           OR group_key = (SELECT group_key FROM best_offers WHERE group_key = ? AND shops > 1)
         ORDER BY price ASC
-    """, (f"%{product_name}%",)).fetchall()
+    """, (f"%{product_name}%", group_key(product_name))).fetchall()
     
     conn.close()
     return [dict(row) for row in products]
 
+@cached_query
 def get_stats():
     """Get database statistics"""
     conn = get_db_connection()
     
+    # Snapshot has the counts precomputed (stats table)
+    try:
+        counts = dict(conn.execute("SELECT key, value FROM stats").fetchall())
+    except sqlite3.OperationalError:
+        counts = {
+            'products': conn.execute("SELECT COUNT(*) as count FROM products").fetchone()['count'],
+            'products/dtrspider': conn.execute("SELECT COUNT(*) as count FROM products WHERE source_site = 'dtrspider'").fetchone()['count'],
+            'products/mironetspider': conn.execute("SELECT COUNT(*) as count FROM products WHERE source_site = 'mironetspider'").fetchone()['count'],
+        }
+    
     stats = {
-        'total_products': conn.execute("SELECT COUNT(*) as count FROM products").fetchone()['count'],
-        'total_datart': conn.execute("SELECT COUNT(*) as count FROM products WHERE source_site = 'dtrspider'").fetchone()['count'],
-        'total_mironet': conn.execute("SELECT COUNT(*) as count FROM products WHERE source_site = 'mironetspider'").fetchone()['count'],
-        'categories': len(get_categories())
+        'total_products': counts.get('products', 0),
+        'total_datart': counts.get('products/dtrspider', 0),
+        'total_mironet': counts.get('products/mironetspider', 0),
+        'categories': sum(1 + len(top['children']) for top in get_categories())
     }
     
     conn.close()
     return stats
 
+def load_title_rows():
+    """(title, number of shops with a price) for the autocomplete index"""
+    conn = get_db_connection()
+    rows = conn.execute("""
+        SELECT title, COUNT(price) AS shops
+        FROM products
+        GROUP BY title
+    """).fetchall()
+    conn.close()
+    return [(row['title'], row['shops']) for row in rows]
+
+# Prefix index over all titles, rebuilt when a crawl finishes
+autocomplete = Autocomplete(load_title_rows)
+
+def load_facet_rows():
+    """(facet, value, bitmap) posting lists for the facet index"""
+    conn = get_db_connection()
+    try:
+        return [(row['facet'], row['value'], decode(row['bitmap']))
+                for row in conn.execute("SELECT facet, value, bitmap FROM facet_postings")]
+    finally:
+        conn.close()
+
+def load_rowids(column, lo, hi):
+    """Rowids with lo <= column < hi - the part of a range facet cutting through a bucket"""
+    query = f"SELECT rowid FROM products WHERE {column} IS NOT NULL"
+    params = []
+    if lo is not None:
+        query += f" AND {column} >= ?"
+        params.append(lo)
+    if hi is not None:
+        query += f" AND {column} < ?"
+        params.append(hi)
+    conn = get_db_connection()
+    rowids = [row[0] for row in conn.execute(query, params)]
+    conn.close()
+    return rowids
+
+# Facet bitmaps of the snapshot (Scraper/facets.py), reloaded with each new version
+facets = Facets(load_facet_rows, load_rowids)
+
+@cached_query
+def facet_search(categories=(), sources=(), price_min=None, price_max=None, min_rating=None,
+                 sort_by='price_asc', page=1):
+    """One page of products + facet counts for /api/products"""
+    version, _ = current_data_version()
+    index = facets.get(version)
+    
+    category_ids = []
+    for slug in categories:
+        _, selected = find_category(slug)
+        category_ids += selected['ids'] if selected else []
+    # haleře, horni mez vcetne
+    price_lo = round(price_min * 100) if price_min is not None else None
+    price_hi = round(price_max * 100) + 1 if price_max is not None else None
+    
+    matching, counts = index.search({
+        'category': (index.union('category', category_ids) or 0) if categories else None,
+        'source': index.union('source', sources),
+        'price': index.range('price', price_lo, price_hi),
+        'rating': index.range('rating', min_rating) if min_rating else None,
+    })
+    
+    # Stranka ze SQL se stejnymi podminkami - pocty uz daly bitmapy
+    query, params = build_products_query(sort_by=None)
+    if categories:
+        query += f" AND category_id IN ({', '.join('?' * len(category_ids)) or 'NULL'})"
+        params += category_ids
+    if sources:
+        query += f" AND source_site IN ({', '.join('?' * len(sources))})"
+        params += list(sources)
+    if price_lo is not None:
+        query += " AND price >= ?"
+        params.append(price_lo)
+    if price_hi is not None:
+        query += " AND price < ?"
+        params.append(price_hi)
+    if min_rating:
+        query += " AND rating >= ?"
+        params.append(min_rating)
+    query += {
+        'price_desc': " ORDER BY price DESC",
+        'name_asc': " ORDER BY products.title ASC",
+        'name_desc': " ORDER BY products.title DESC",
+    }.get(sort_by, " ORDER BY price ASC")
+    query += " LIMIT ? OFFSET ?"
+    params += [PER_PAGE, (page - 1) * PER_PAGE]
+    
+    conn = get_db_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    products = []
+    for row in rows:
+        product = dict(row)
+        product['price'] = koruny(product['price'])
+        product['best_price'] = koruny(product['best_price'])
+        products.append(product)
+    
+    def category_node(node):
+        return {
+            'slug': node['slug'],
+            'name': node['name'],
+            'count': counts['category'].get(str(node['id']), 0),
+            'children': [category_node(child) for child in node['children']],
+        }
+    
+    price_edges = [edge for edge, _ in counts['price']] + [None]
+    # pasma hodnoceni jsou disjunktni, filtr min_rating je ">= hrana" -> soucty od konce
+    rating_at_least = list(itertools.accumulate(count for _, count in reversed(counts['rating'])))[::-1]
+    return {
+        'total': matching.bit_count(),
+        'page': page,
+        'per_page': PER_PAGE,
+        'products': products,
+        'facets': {
+            'category': [category_node(top) for top in get_categories()],
+            'source': [{'value': value, 'count': count} for value, count in sorted(counts['source'].items())],
+            'price': [{'min': koruny(edge), 'max': koruny(price_edges[i + 1]), 'count': count}
+                      for i, (edge, count) in enumerate(counts['price'])],
+            'rating': [{'min': edge, 'count': count}
+                       for (edge, _), count in zip(counts['rating'], rating_at_least)],
+        },
+    }
+
+def warm_up():
+    """Open DB connections and fill caches - called once per worker"""
+    db_pool.warm()
+    version = get_data_version()[0]
+    autocomplete.refresh(version)
+    if snapshot_id is not None:
+        facets.get(version)
+    get_categories()
+    get_stats()
+    # "/" je u velke DB streamovany a nic se necachuje - odpoved se docte
+    # (sablona, dotazy, stranky DB); strankovany vypis jde do page_cache
+    for path in ('/', '/?page=1'):
+        with app.test_request_context(path):
+            index().get_data()
+
+@app.route('/health')
+def health():
+    """Worker health - pool and cache state"""
+    version, updated_at = get_data_version()
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'data_version': version,
+        'updated_at': updated_at,
+        'pool': db_pool.info(),
+        'cache': {
+            'pages': page_cache.info(),
+            'queries': query_cache.info(),
+        },
+        'autocomplete': autocomplete.info(),
+        'facets': facets.info(),
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text endpoint - metrics of the last crawl of every spider"""
+    chunks = []
+    if os.path.isdir(METRICS_DIR):
+        for name in sorted(os.listdir(METRICS_DIR)):
+            if name.endswith('.prom'):
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    chunks.append(f.read())
+    return Response(''.join(chunks), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     """Homepage - show all products"""
     category = request.args.get('category', 'all')
+    category_group, selected = find_category(category)
+    if selected:
+        # ?category=Televize (stare odkazy) -> slug
+        category = selected['slug']
     search = request.args.get('search', '')
     sort_by = request.args.get('sort', 'price_asc')
+    page = request.args.get('page', type=int)
+    if page is not None and page < 1:
+        page = 1
+    
+    # Big unpaged listing - stream rows straight from the cursor, memory stays flat
+    if page is None and count_products(category, search) > STREAM_MIN_ROWS:
+        return streamed_page(('index', category, search, sort_by, page), 'index.html',
+                             products=RowStream(iter_products(category, search, sort_by)),
+                             categories=get_categories(),
+                             category_group=category_group,
+                             selected_category=category,
+                             search_query=search,
+                             sort_by=sort_by,
+                             page=page,
+                             stats=get_stats())
     
-    categories = get_categories()
-    products = get_products(category, search, sort_by)
-    stats = get_stats()
+    def render():
+        categories = get_categories()
+        products = get_products(category, search, sort_by, page)
+        stats = get_stats()
+        
+        return render_template('index.html', 
+                             products=products, 
+                             categories=categories,
+                             category_group=category_group,
+                             selected_category=category,
+                             search_query=search,
+                             sort_by=sort_by,
+                             page=page,
+                             stats=stats)
     
-    return render_template('index.html', 
-                         products=products, 
-                         categories=categories,
-                         selected_category=category,
-                         search_query=search,
-                         sort_by=sort_by,
-                         stats=stats)
+    return cached_page(('index', category, search, sort_by, page), render)
 
 @app.route('/product/<path:product_name>')
 def product_detail(product_name):
     """Product detail page - compare prices across stores"""
-    sellers = get_product_comparison(product_name)
+    def render():
+        sellers = get_product_comparison(product_name)
+        
+        return render_template('product_detail.html', 
+                             product_name=product_name,
+                             sellers=sellers)
     
-    return render_template('product_detail.html', 
-                         product_name=product_name,
-                         sellers=sellers)
+    return cached_page(('product', product_name), render)
 
 @app.route('/api/search')
 def api_search():
@@ -132,23 +613,36 @@ def api_search():
     if len(query) < 2:
         return jsonify([])
     
-    conn = get_db_connection()
-    results = conn.execute("""
-        SELECT DISTINCT title 
-        FROM products 
-        WHERE title LIKE ? 
-        LIMIT 10
-    """, (f"%{query}%",)).fetchall()
-    conn.close()
+    version, _ = current_data_version()
+    return jsonify(autocomplete.search(query, version))
+
+@app.route('/api/products')
+def api_products():
+    """Faceted product listing - one page + facet counts as JSON
     
-    return jsonify([row['title'] for row in results])
+    ?category=<slug>&category=...&source=<spider>&...&price_min=<Kč>&price_max=<Kč>
+    &min_rating=<0-5>&sort=price_asc|price_desc|name_asc|name_desc&page=<n>
+    """
+    current_data_version()
+    if snapshot_id is None:
+        # bitmapy jen ze snapshotu - rowid crawl DB se pri zapisu meni
+        return jsonify({'error': "No snapshot published yet - run a crawl or python -m Scraper.snapshot"}), 503
+    page = max(request.args.get('page', 1, type=int), 1)
+    return jsonify(facet_search(tuple(sorted(set(request.args.getlist('category')) - {'all'})),
+                                tuple(sorted(set(request.args.getlist('source')))),
+                                request.args.get('price_min', type=float),
+                                request.args.get('price_max', type=float),
+                                request.args.get('min_rating', type=float),
+                                request.args.get('sort', 'price_asc'),
+                                page))
 
 if __name__ == '__main__':
     # Check if database exists
-    if not os.path.exists(DB_PATH):
+    if not os.path.exists(DB_PATH) and not os.path.exists(SNAPSHOT_PATH):
         print(f"⚠️ Database not found: {DB_PATH}")
         print("Run your scrapers first to populate the database!")
     else:
+        prepare_database()
         stats = get_stats()
         print(f"""
 ╔══════════════════════════════════════════════════════════════╗
@@ -167,4 +661,5 @@ if __name__ == '__main__':
 Press Ctrl+C to stop
         """)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Dev server only - use serve.py for real traffic
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Serving of the hashed, pre-compressed assets built by build_assets.py.
+
+Templates link assets with {{ asset_url('css/index.css') }}. After a build
+that resolves to /assets/css/index.<hash>.css, served with the .br/.gz
+variant the client accepts and a one year immutable Cache-Control. Without a
+build it falls back to the plain /static/ file, so development works as is.
+Files of the previous build are served too. init_assets() returns the
+build's version, which app.py mixes into page ETags, so a rebuild
+invalidates pages that link the old names.
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_from_directory, url_for
+
+from build_assets import DIST_DIR, MANIFEST_NAME, PREVIOUS_MANIFEST_NAME
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# (Accept-Encoding token, file suffix) in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def load_manifest(root, name=MANIFEST_NAME):
+    path = os.path.join(root, DIST_DIR, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def init_assets(app):
+    dist_dir = os.path.join(app.root_path, DIST_DIR)
+    manifest = load_manifest(app.root_path)
+    # predchozi build - stranky vydane pred prebuildem na nej jeste odkazuji
+    hashed_files = set(manifest.values()) | set(load_manifest(app.root_path, PREVIOUS_MANIFEST_NAME).values())
+
+    def asset_url(path):
+        hashed = manifest.get(path)
+        if hashed is None:
+            return url_for('static', filename=path)
+        return url_for('asset', filename=hashed)
+
+    @app.route('/assets/<path:filename>')
+    def asset(filename):
+        if filename not in hashed_files:
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        send_name, encoding = filename, None
+        for token, suffix in ENCODINGS:
+            if request.accept_encodings[token] and os.path.exists(os.path.join(dist_dir, filename + suffix)):
+                send_name, encoding = filename + suffix, token
+                break
+
+        response = send_from_directory(dist_dir, send_name, mimetype=mimetype,
+                                       max_age=IMMUTABLE_MAX_AGE, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Disposition', None)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    return asset_version(manifest)
+
+
+def asset_version(manifest):
+    """Short hash of a manifest - '' without a build"""
+    if not manifest:
+        return ''
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:8]
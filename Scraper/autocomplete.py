@@ -0,0 +1,200 @@
+"""
+In-memory prefix index for /api/search autocomplete.
+
+All titles are diacritics-folded and concatenated into one string; the
+index is a sorted array of offsets into that string, one per word start of
+the first KEY_WORDS words (product type, brand, model). Because entries are
+sorted, every entry starting with a query is one contiguous range, found
+with two bisects over a view that truncates each entry to len(query).
+
+Titles are ranked by price coverage (how many shops sell them). For short
+prefixes with huge ranges the top results are precomputed at build time,
+so a lookup is two bisects plus at most SCAN_LIMIT entries. Longer
+prefixes that still match a huge range rank the first SCAN_CAP entries once
+and remember the result.
+"""
+
+import bisect
+import heapq
+import sys
+import threading
+import time
+from array import array
+
+from Scraper.textnorm import fold
+
+KEY_WORDS = 4           # index word starts within the first N words
+KEY_LENGTH = 24         # characters of each entry used for sorting
+SCAN_LIMIT = 256        # bigger ranges use precomputed top results...
+PRECOMPUTE_DEPTH = 4    # ...for prefixes up to this length
+SCAN_CAP = 1000         # longer prefixes with huge ranges rank only this many...
+MEMO_SIZE = 10000       # ...and are remembered after the first lookup
+TOP_K = 10
+
+
+class _TruncatedView:
+    """Sequence of index entries cut to `length` chars, for bisect"""
+
+    def __init__(self, blob, offsets, length):
+        self.blob = blob
+        self.offsets = offsets
+        self.length = length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        off = self.offsets[i]
+        return self.blob[off:off + self.length]
+
+
+class PrefixIndex:
+
+    def __init__(self, rows, version=None):
+        """rows: iterable of (title, shop_count)"""
+        started = time.perf_counter()
+        self.version = version
+
+        titles = {}
+        for title, shops in rows:
+            key = fold(title)
+            if not key:
+                continue
+            # Stejny nazev z vice obchodu -> jeden zaznam, skore se secte
+            if key in titles:
+                titles[key][1] += shops or 0
+            else:
+                titles[key] = [title, shops or 0]
+
+        self.titles = []
+        self.scores = array('I')
+        parts = []
+        entries = []
+        pos = 0
+        for title_id, (key, (title, shops)) in enumerate(titles.items()):
+            self.titles.append(title)
+            self.scores.append(shops)
+            parts.append(key)
+            word_start = 0
+            for _ in range(KEY_WORDS):
+                entries.append((pos + word_start, title_id))
+                word_start = key.find(' ', word_start) + 1
+                if word_start == 0:
+                    break
+            pos += len(key) + 1
+        self.blob = '\n'.join(parts)
+        del parts, titles
+
+        blob = self.blob
+        entries.sort(key=lambda e: blob[e[0]:e[0] + KEY_LENGTH])
+        self.offsets = array('I', (e[0] for e in entries))
+        self.title_ids = array('I', (e[1] for e in entries))
+        del entries
+
+        self.top = {}
+        self._precompute()
+        self.build_seconds = time.perf_counter() - started
+
+    def _range(self, prefix):
+        view = _TruncatedView(self.blob, self.offsets, len(prefix))
+        return bisect.bisect_left(view, prefix), bisect.bisect_right(view, prefix)
+
+    def _rank(self, lo, hi, limit=TOP_K):
+        # Vice zaznamu jednoho titulu v rozsahu -> nlargest nad unikatnimi
+        ids = set(self.title_ids[lo:hi])
+        best = heapq.nlargest(limit, ids, key=lambda i: (self.scores[i], -len(self.titles[i])))
+        return [self.titles[i] for i in best]
+
+    def _precompute(self):
+        """Top results for short prefixes whose range is too big to scan"""
+        blob = self.blob
+        for depth in range(2, PRECOMPUTE_DEPTH + 1):
+            seen = set()
+            i = 0
+            while i < len(self.offsets):
+                off = self.offsets[i]
+                prefix = blob[off:off + depth]
+                if len(prefix) < depth or '\n' in prefix or prefix in seen:
+                    i += 1
+                    continue
+                seen.add(prefix)
+                lo, hi = self._range(prefix)
+                if hi - lo > SCAN_LIMIT:
+                    self.top[prefix] = self._rank(lo, hi)
+                i = max(hi, i + 1)
+
+    def search(self, query, limit=TOP_K):
+        q = fold(query)[:KEY_LENGTH]
+        if not q:
+            return []
+        if q in self.top:
+            return self.top[q][:limit]
+        lo, hi = self._range(q)
+        if hi - lo <= SCAN_LIMIT:
+            return self._rank(lo, hi, limit)
+        results = self._rank(lo, min(hi, lo + SCAN_CAP))
+        if len(self.top) < MEMO_SIZE:
+            self.top[q] = results
+        return results[:limit]
+
+    def memory_bytes(self):
+        return (sys.getsizeof(self.blob)
+                + self.offsets.buffer_info()[1] * self.offsets.itemsize
+                + self.title_ids.buffer_info()[1] * self.title_ids.itemsize
+                + self.scores.buffer_info()[1] * self.scores.itemsize
+                + sys.getsizeof(self.titles) + sum(sys.getsizeof(t) for t in self.titles)
+                + sys.getsizeof(self.top) + sum(sys.getsizeof(v) for v in self.top.values()))
+
+    def info(self):
+        return {
+            'version': self.version,
+            'titles': len(self.titles),
+            'entries': len(self.offsets),
+            'precomputed_prefixes': len(self.top),
+            'memory_bytes': self.memory_bytes(),
+            'build_seconds': round(self.build_seconds, 3),
+        }
+
+
+class Autocomplete:
+    """Holds the current PrefixIndex and rebuilds it when the data version changes"""
+
+    def __init__(self, load_rows):
+        self.load_rows = load_rows
+        self.index = None
+        self._building = False
+        self._lock = threading.Lock()
+
+    def build(self, version):
+        self.index = PrefixIndex(self.load_rows(), version)
+
+    def refresh(self, version):
+        """Rebuild in the background; the old index keeps serving meanwhile"""
+        if self.index is not None and self.index.version == version:
+            return
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+
+        def run():
+            try:
+                self.build(version)
+            finally:
+                self._building = False
+
+        if self.index is None:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
+
+    def search(self, query, version, limit=TOP_K):
+        self.refresh(version)
+        index = self.index
+        if index is None:
+            # First build still running in another thread
+            return []
+        return index.search(query, limit)
+
+    def info(self):
+        return self.index.info() if self.index is not None else None
@@ -0,0 +1,193 @@
+"""
+Synthetic catalogue generator - fills the products schema with N realistic
+rows for load testing the web app at production scale.
+
+    python bench/gen_catalogue.py --rows 2000000 --db big.db
+    python bench/gen_catalogue.py --rows 500000 --db big.db --skew 1.3 --offers 3 --snapshot big_snapshot.db
+
+Rows look like the crawl's: Czech titles ("Televize Samsung QLED 55 Q7KX3B
+černá"), prices in haléře, each shop's own raw category (Datart path,
+Mironet slug, Planeo name) resolved to category_id by the real taxonomy.
+The same product is offered by several shops under the same title, so the
+comparison page and the autocomplete have realistic work to do.
+
+Title distribution knobs:
+  --skew    Zipf exponent for categories and brands (1.0 = mild long tail,
+            1.5+ = a few categories/brands dominate)
+  --offers  mean number of shops selling one product (1 = no overlap)
+  --noise   share of offers whose title the shop words a bit differently
+            (upper case, "(2024)" suffix)
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+import types
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Scraper.categories import TREE  # noqa: E402
+from Scraper.offers import group_key, rebuild_best_offers  # noqa: E402
+from Scraper.pipelines import INSERT_PRODUCT, BatchWriter  # noqa: E402
+
+# tri crawlene shopy + ty, na ktere spidery teprve prijdou (prazdne soubory ve spiders/)
+SHOPS = ('dtrspider', 'mironetspider', 'planeospider', 'bohemiaspider', 'expertspider', 'exasoftspider')
+
+COLORS = ('černá', 'bílá', 'stříbrná', 'šedá', 'modrá', 'zelená', 'růžová', 'zlatá')
+
+# slug -> (nazev produktu, znacky, serie, cenove rozpeti v Kc)
+PRODUCTS = {
+    'televize': ('Televize', ('Samsung', 'LG', 'Sony', 'Philips', 'TCL', 'Hisense', 'Panasonic'),
+                 ('QLED 55', 'OLED 65', 'LED 43', 'Smart 50', 'Mini LED 75'), (5990, 89990)),
+    'projektory': ('Projektor', ('Epson', 'BenQ', 'Optoma', 'XGIMI', 'ViewSonic'),
+                   ('Full HD', '4K', 'LED', 'Mini'), (2990, 69990)),
+    'set-top-boxy': ('Set-top box', ('Xiaomi', 'Sencor', 'Tesla', 'Strong'), ('DVB-T2', 'Android TV'), (690, 3490)),
+    'notebooky': ('Notebook', ('Lenovo', 'HP', 'Dell', 'Asus', 'Acer', 'Apple', 'MSI'),
+                  ('IdeaPad 5', 'ThinkPad E14', 'Vivobook 15', 'Aspire 7', 'MacBook Air', 'Pavilion 15'), (9990, 79990)),
+    'stolni-pocitace': ('Počítač', ('Lenovo', 'HP', 'Dell', 'Acer', 'Mironet'), ('ThinkCentre', 'OptiPlex', 'Veriton', 'Pro'),
+                        (8990, 59990)),
+    'tablety': ('Tablet', ('Apple', 'Samsung', 'Lenovo', 'Xiaomi'), ('iPad 10.9', 'Galaxy Tab S9', 'Tab M10', 'Pad 6'),
+                (3990, 34990)),
+    'mobilni-telefony': ('Mobilní telefon', ('Samsung', 'Apple', 'Xiaomi', 'Motorola', 'Honor', 'Realme', 'Nokia'),
+                         ('Galaxy A55 8GB/256GB', 'iPhone 15 128GB', 'Redmi Note 13', 'moto g84', 'Magic6 Lite'),
+                         (2490, 39990)),
+    'hodinky': ('Chytré hodinky', ('Garmin', 'Apple', 'Samsung', 'Amazfit', 'Huawei'), ('Forerunner', 'Watch', 'GTR', 'Fit'),
+                (1290, 24990)),
+    'lednice': ('Kombinovaná lednice', ('Bosch', 'Samsung', 'Whirlpool', 'Beko', 'Electrolux', 'Gorenje', 'LG'),
+                ('NoFrost 186 cm', 's mrazákem dole', 'vestavná 177 cm', 'americká'), (7990, 54990)),
+    'pracky': ('Pračka', ('Bosch', 'Samsung', 'Whirlpool', 'Beko', 'Electrolux', 'AEG', 'LG'),
+               ('předem plněná 8 kg', 'vrchem plněná 6 kg', 'se sušičkou 9/6 kg'), (6990, 32990)),
+    'kuchynske-potreby': ('Sada dóz', ('Tescoma', 'Lock&Lock', 'Orion', 'Lamart'), ('3 ks', '5 ks', 'skleněná'), (149, 1490)),
+    'feny': ('Fén', ('Philips', 'Rowenta', 'Dyson', 'Remington', 'Braun'), ('2200 W', 'ionic', 'Supersonic', 'travel'),
+             (390, 12990)),
+    'auto-moto': ('Autožárovka', ('Osram', 'Philips', 'Bosch', 'Tungsram'), ('H7', 'H4', 'LED H7', 'W5W'), (99, 1990)),
+    'osvetleni': ('Stolní lampa', ('Philips', 'Ledvance', 'Solight', 'Rabalux'), ('LED', 'Hue', 'stmívatelná'), (299, 3990)),
+    'nabytek': ('Herní židle', ('Sparco', 'Genesis', 'Trust', 'Arozzi'), ('Nitro', 'Racing', 'Pro'), (1990, 12990)),
+    'chovatelske-potreby': ('Zastřihovač pro psy', ('Moser', 'Wahl', 'Oster'), ('Max 45', 'Pet Pro', 'Arco'), (590, 4990)),
+    'herni-konzole': ('Herní konzole', ('Sony', 'Microsoft', 'Nintendo', 'Valve'), ('PlayStation 5', 'Xbox Series X',
+                      'Switch OLED', 'Steam Deck'), (6990, 17990)),
+    'hracky': ('Stavebnice', ('LEGO', 'Gravitrax', 'Cobi', 'Seva'), ('Technic', 'City', 'Starter Set', 'Classic'), (299, 8990)),
+    'hudebni-nastroje': ('Digitální piano', ('Yamaha', 'Casio', 'Roland', 'Korg'), ('P-145', 'CDP-S110', 'FP-30X'),
+                         (7990, 39990)),
+    'sport-a-outdoor': ('Elektrokoloběžka', ('Xiaomi', 'Segway', 'Kaabo', 'Sencor'), ('Pro 2', 'Max G30', 'Scooter 10'),
+                        (6990, 29990)),
+}
+
+CANONICAL = {slug: (name, parent) for _, slug, name, parent in TREE}
+
+
+def raw_category(shop, slug):
+    """The category the way each shop's spider stores it"""
+    name, parent = CANONICAL[slug]
+    if shop == 'dtrspider':
+        return f"{CANONICAL[parent][0]}/{name}" if parent else name
+    if shop == 'mironetspider':
+        return f"{name}+C{zlib.crc32(slug.encode()) % 90000 + 10000}"
+    return name
+
+
+def zipf_weights(count, skew):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def model_code(serial):
+    """Unique, random-looking 6 char code per product (bijection mod 36**6)"""
+    n = (serial * 2654435761) % 36 ** 6
+    digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    code = ''
+    for _ in range(6):
+        n, d = divmod(n, 36)
+        code += digits[d]
+    return code
+
+
+def generate(rows, skew, offers, noise, seed):
+    """Yield products rows (title, price, rating, link, source_site, category)"""
+    rnd = random.Random(seed)
+    slugs = list(PRODUCTS)
+    category_weights = zipf_weights(len(slugs), skew)
+    shop_weights = zipf_weights(len(SHOPS), 0.6)
+    produced = 0
+    serial = 0
+    while produced < rows:
+        serial += 1
+        slug = rnd.choices(slugs, category_weights)[0]
+        noun, brands, series, (low, high) = PRODUCTS[slug]
+        brand = rnd.choices(brands, zipf_weights(len(brands), skew))[0]
+        title = f"{noun} {brand} {rnd.choice(series)} {model_code(serial)}"
+        if rnd.random() < 0.6:
+            title += f" {rnd.choice(COLORS)}"
+        # cena kolem log-normalniho stredu rozpeti, konci na 90 nebo 99
+        base = min(high, max(low, int(rnd.lognormvariate(0, 0.6) * (low * high) ** 0.5)))
+
+        # pocet shopu ~ geometricke rozdeleni se stredni hodnotou `offers`
+        count = 1
+        while count < len(SHOPS) and rnd.random() > 1 / max(offers, 1):
+            count += 1
+        shops = set()
+        while len(shops) < count:
+            shops.add(rnd.choices(SHOPS, shop_weights)[0])
+
+        for shop in shops:
+            shop_title = title
+            if rnd.random() < noise:
+                shop_title = title.upper() if rnd.random() < 0.5 else f"{title} (2024)"
+            price = (int(base * rnd.uniform(0.92, 1.08)) // 10 * 10 + rnd.choice((0, 9))) * 100
+            rating = round(rnd.uniform(3.0, 5.0), 1) if rnd.random() < 0.4 else None
+            link = f"https://www.{shop.replace('spider', '')}.cz/p/{model_code(serial).lower()}"
+            yield (shop_title, price, rating, link, shop, raw_category(shop, slug))
+            produced += 1
+            if produced >= rows:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic product catalogue")
+    parser.add_argument('--rows', type=int, default=1000000, help="product rows (default: %(default)s)")
+    parser.add_argument('--db', default='catalogue.db', help="SQLite file, created if missing (default: %(default)s)")
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of categories/brands")
+    parser.add_argument('--offers', type=float, default=2.5, help="mean shops per product")
+    parser.add_argument('--noise', type=float, default=0.05, help="share of offers with a shop-specific title")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch', type=int, default=50000, help="rows per executemany")
+    parser.add_argument('--snapshot', help="also publish a read snapshot here (Scraper/snapshot.py)")
+    args = parser.parse_args()
+
+    spider = types.SimpleNamespace(name='generator', logger=logging.getLogger('generator'))
+    writer = BatchWriter(args.db, snapshot_path=args.snapshot)
+    writer.open(spider)
+    conn = writer.conn
+    conn.execute("PRAGMA synchronous=OFF")
+    categories = writer.categories
+
+    started = time.perf_counter()
+    batch = []
+    written = 0
+    for row in generate(args.rows, args.skew, args.offers, args.noise, args.seed):
+        batch.append(row + (categories.resolve(row[4], row[5]), group_key(row[0])))
+        if len(batch) >= args.batch:
+            with conn:
+                conn.executemany(INSERT_PRODUCT, batch)
+            written += len(batch)
+            batch = []
+            print(f"\r{written:>10} rows  {written / (time.perf_counter() - started):>8.0f} rows/s", end='', flush=True)
+    with conn:
+        conn.executemany(INSERT_PRODUCT, batch)
+    written += len(batch)
+    # best_offers jednim pruchodem misto po davkach
+    rebuild_best_offers(conn)
+
+    # zvedne data_version (web app invaliduje cache) a pripadne publikuje snapshot
+    writer.close(spider)
+    print(f"\r{written:>10} rows in {time.perf_counter() - started:.1f} s -> {args.db} "
+          f"({os.path.getsize(args.db) / 1e6:.0f} MB)")
+    if args.snapshot:
+        print(f"snapshot {args.snapshot} ({os.path.getsize(args.snapshot) / 1e6:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
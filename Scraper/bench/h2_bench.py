@@ -0,0 +1,182 @@
+"""
+HTTP/1.1 vs HTTP/2 crawl benchmark - listing pages per second at the same
+politeness budget (Scraper/http2.py).
+
+    python bench/h2_bench.py
+    python bench/h2_bench.py --pages 300 --latency 80 --concurrency 4 --delay 0.1
+    python bench/h2_bench.py --output bench/results/h2.json
+
+Starts the local shop (bench/h2server.py) and crawls its --pages listing
+pages once per mode, each in its own process with the project settings:
+
+  http1     HTTP2_ENABLED=0
+  http2     HTTP2_ENABLED=1
+  fallback  HTTP2_ENABLED=1 against a server offering only http/1.1 in
+            ALPN - must finish like http1, one fallback for the host
+
+Every mode gets the same CONCURRENT_REQUESTS_PER_DOMAIN (--concurrency) and
+DOWNLOAD_DELAY (--delay), AdaptiveThrottle off, so the shop sees the same
+request rate limit - only the transport differs. Reported: pages/s, TLS
+connections the server accepted and requests per protocol. --rtt adds a
+delay on the client side before every TLS connection, to stand in for the
+handshake round trips to a real shop that loopback does not have.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import ssl
+import sys
+import urllib.request
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, APP_DIR)
+
+MODES = ('http1', 'http2', 'fallback')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, http1_only):
+    port = free_port()
+    command = [sys.executable, os.path.join(APP_DIR, 'bench', 'h2server.py'), '--port', str(port),
+               '--pages', str(args.pages), '--latency', str(args.latency)]
+    if http1_only:
+        command.append('--http1-only')
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()     # URL az po startu
+    return server, port
+
+
+def server_stats(port):
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    with urllib.request.urlopen(f'https://localhost:{port}/stats', context=context, timeout=10) as response:
+        return json.load(response)
+
+
+def run_worker(args):
+    """One crawl in this process - prints a JSON result line"""
+    os.chdir(APP_DIR)
+    from scrapy import Spider
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from Scraper.spiders.datart_spider import parse_products
+
+    class ListingSpider(Spider):
+        name = 'h2bench'
+        start_urls = [f'https://localhost:{args.port}/list/{n}.html' for n in range(args.pages)]
+
+        def parse(self, response):
+            items, _ = parse_products(response)
+            self.crawler.stats.inc_value('bench/products', len(items))
+            self.crawler.stats.inc_value(f'bench/protocol/{response.protocol}')
+
+    settings = get_project_settings()
+    settings.setdict({
+        'HTTP2_ENABLED': args.worker != 'http1',
+        'HTTP2_DOMAINS': ['localhost'],
+        'CONCURRENT_REQUESTS_PER_DOMAIN': args.concurrency,
+        'CONCURRENT_REQUESTS': args.concurrency,
+        'DOWNLOAD_DELAY': args.delay,
+        'RANDOMIZE_DOWNLOAD_DELAY': False,
+        'ADAPTIVE_THROTTLE_ENABLED': False,
+        'MEMORY_GUARD_ENABLED': False,
+        'ROBOTSTXT_OBEY': False,
+        'ITEM_PIPELINES': {},
+        'SNAPSHOT_PATH': None,
+        'LOG_LEVEL': 'WARNING',
+    }, priority='cmdline')
+
+    if args.rtt:
+        # "handshake" realneho shopu - kazde nove TLS spojeni ceka rtt
+        # reactor se importuje az uvnitr - CrawlerProcess instaluje asyncio reactor sam
+        from twisted.internet.endpoints import HostnameEndpoint
+        original_connect = HostnameEndpoint.connect
+
+        def delayed_connect(self, factory):
+            from twisted.internet import reactor, task
+            return task.deferLater(reactor, args.rtt / 1000, original_connect, self, factory)
+        HostnameEndpoint.connect = delayed_connect
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(ListingSpider)
+    process.crawl(crawler)
+    process.start()
+
+    stats = crawler.stats.get_stats()
+    elapsed = stats.get('elapsed_time_seconds')
+    pages = stats.get('response_received_count', 0)
+    print(json.dumps({
+        'mode': args.worker,
+        'pages': pages,
+        'products': stats.get('bench/products', 0),
+        'seconds': round(elapsed, 3),
+        'pages_per_s': round(pages / elapsed, 2) if elapsed else None,
+        'protocols': {key.rsplit('/', 1)[1]: value for key, value in stats.items()
+                      if key.startswith('bench/protocol/')},
+        'fallbacks': sum(value for key, value in stats.items() if key.startswith('http2/fallback/')),
+        'errors': stats.get('log_count/ERROR', 0),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/1.1 vs HTTP/2 crawl benchmark")
+    parser.add_argument('--pages', type=int, default=200, help="listing pages per mode (default: %(default)s)")
+    parser.add_argument('--latency', type=float, default=50, help="server time per page in ms")
+    parser.add_argument('--concurrency', type=int, default=4, help="CONCURRENT_REQUESTS_PER_DOMAIN")
+    parser.add_argument('--delay', type=float, default=0, help="DOWNLOAD_DELAY in seconds")
+    parser.add_argument('--rtt', type=float, default=0, help="extra ms before every new connection")
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = []
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode!r}, choose from {', '.join(MODES)}")
+        server, port = start_server(args, http1_only=mode == 'fallback')
+        try:
+            command = [sys.executable, os.path.abspath(__file__), '--worker', mode, '--port', str(port),
+                       '--pages', str(args.pages), '--concurrency', str(args.concurrency),
+                       '--delay', str(args.delay), '--rtt', str(args.rtt)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result['server'] = server_stats(port)
+            results.append(result)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{args.pages} pages, {args.latency:.0f} ms per page, concurrency {args.concurrency}, "
+          f"delay {args.delay} s, rtt {args.rtt:.0f} ms\n")
+    print(f"{'mode':<9} {'pages/s':>8} {'seconds':>8} {'conns':>6} {'h2':>6} {'http/1.1':>9} {'fallbacks':>10}")
+    for result in results:
+        requests = result['server']['requests']
+        print(f"{result['mode']:<9} {result['pages_per_s']:>8} {result['seconds']:>8} "
+              f"{result['server']['connections'] - 1:>6} {requests['h2']:>6} {requests['http/1.1'] - 1:>9} "
+              f"{result['fallbacks']:>10}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'pages': args.pages, 'latency_ms': args.latency, 'concurrency': args.concurrency,
+                       'delay': args.delay, 'rtt_ms': args.rtt, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
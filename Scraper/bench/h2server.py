@@ -0,0 +1,206 @@
+"""
+Local TLS test server speaking HTTP/2 and HTTP/1.1 (ALPN) - fixture for
+bench/h2_bench.py and for trying Scraper/http2.py without a real shop.
+
+    python bench/h2server.py --port 8443                   # h2 + http/1.1
+    python bench/h2server.py --port 8443 --http1-only      # no h2 in ALPN (fallback)
+    python bench/h2server.py --port 8443 --latency 80 --pages 500
+
+Serves /list/<n>.html - a listing page with --products product boxes
+(~20 kB, datart-like markup) answered after --latency ms, so the page
+takes the time a real shop's listing takes. /stats returns JSON with the
+number of TLS connections and requests per protocol since start.
+A self-signed certificate for localhost is generated on start (Scrapy does
+not verify certificates by default).
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import re
+import ssl
+import tempfile
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import ConnectionTerminated, RequestReceived, StreamReset, WindowUpdated
+from h2.exceptions import StreamClosedError
+
+PAGE_RE = re.compile(r'^/list/(\d+)\.html')
+
+
+def make_certificate(directory):
+    """Self-signed localhost certificate -> (cert path, key path)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=30))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName('localhost')]), critical=False)
+            .sign(key, hashes.SHA256()))
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class Site:
+    """Pages and counters shared by all connections"""
+
+    def __init__(self, pages, products, latency):
+        self.pages = pages
+        self.products = products
+        self.latency = latency
+        self.stats = {'connections': 0, 'requests': {'h2': 0, 'http/1.1': 0}}
+
+    def page(self, path):
+        if path == '/stats':
+            return 200, 'application/json', json.dumps(self.stats).encode()
+        match = PAGE_RE.match(path)
+        if not match or int(match.group(1)) >= self.pages:
+            return 404, 'text/html; charset=utf-8', b'<html><body>not found</body></html>'
+        n = int(match.group(1))
+        boxes = ''.join(
+            f'<div class="product-box" data-gtm-data-product=\'{{"item_name": "Produkt {n}-{i}", '
+            f'"item_category": "Televize"}}\'><a href="/p/{n}-{i}.html">Produkt {n}-{i}</a>'
+            f'<span data-product-price="{(n * 37 + i * 11) % 9000 + 990}"></span>'
+            f'<p class="description">{"Lorem ipsum dolor sit amet. " * 8}</p></div>'
+            for i in range(self.products)
+        )
+        body = f'<html><body><div class="grid">{boxes}</div><footer></footer></body></html>'
+        return 200, 'text/html; charset=utf-8', body.encode()
+
+
+class ShopProtocol(asyncio.Protocol):
+    """One TLS connection - HTTP/2 or HTTP/1.1 keep-alive, whichever ALPN chose"""
+
+    def __init__(self, site):
+        self.site = site
+        self.transport = None
+        self.conn = None
+        self.buffer = b''
+        self.windows = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.site.stats['connections'] += 1
+        ssl_object = transport.get_extra_info('ssl_object')
+        if ssl_object is not None and ssl_object.selected_alpn_protocol() == 'h2':
+            self.conn = H2Connection(H2Configuration(client_side=False, header_encoding='utf-8'))
+            self.conn.initiate_connection()
+            transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        if self.conn is None:
+            self.http1_received(data)
+            return
+        for event in self.conn.receive_data(data):
+            if isinstance(event, RequestReceived):
+                headers = dict(event.headers)
+                asyncio.ensure_future(self.h2_respond(event.stream_id, headers[':path']))
+            elif isinstance(event, WindowUpdated):
+                for stream_window in ([self.windows.get(event.stream_id)] if event.stream_id
+                                      else list(self.windows.values())):
+                    if stream_window is not None:
+                        stream_window.set()
+            elif isinstance(event, StreamReset):
+                self.windows.pop(event.stream_id, None)
+            elif isinstance(event, ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.conn.data_to_send())
+
+    async def h2_respond(self, stream_id, path):
+        await asyncio.sleep(self.site.latency)
+        self.site.stats['requests']['h2'] += 1
+        status, content_type, body = self.site.page(path)
+        try:
+            self.conn.send_headers(stream_id, [(':status', str(status)), ('content-type', content_type),
+                                               ('content-length', str(len(body)))])
+            # flow control - posila se jen tolik, kolik klient dovolil
+            while body:
+                window = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+                if window <= 0:
+                    event = self.windows[stream_id] = asyncio.Event()
+                    self.transport.write(self.conn.data_to_send())
+                    await event.wait()
+                    continue
+                chunk, body = body[:window], body[window:]
+                self.conn.send_data(stream_id, chunk, end_stream=not body)
+        except StreamClosedError:
+            pass
+        self.windows.pop(stream_id, None)
+        self.transport.write(self.conn.data_to_send())
+
+    def http1_received(self, data):
+        self.buffer += data
+        while b'\r\n\r\n' in self.buffer:
+            head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+            request_line = head.split(b'\r\n', 1)[0].decode('latin-1')
+            if request_line.startswith('PRI * HTTP/2.0'):
+                # h2 preface bez ALPN - jako nginx: 400 a konec spojeni
+                self.transport.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                self.transport.close()
+                return
+            path = request_line.split(' ')[1] if ' ' in request_line else '/'
+            asyncio.ensure_future(self.http1_respond(path))
+
+    async def http1_respond(self, path):
+        await asyncio.sleep(self.site.latency)
+        self.site.stats['requests']['http/1.1'] += 1
+        status, content_type, body = self.site.page(path)
+        head = (f'HTTP/1.1 {status} {"OK" if status == 200 else "Not Found"}\r\n'
+                f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                f'Connection: keep-alive\r\n\r\n')
+        if not self.transport.is_closing():
+            self.transport.write(head.encode() + body)
+
+
+def ssl_context(cert_path, key_path, http1_only):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    context.set_alpn_protocols(['http/1.1'] if http1_only else ['h2', 'http/1.1'])
+    return context
+
+
+async def serve(port, site, http1_only, ready=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        context = ssl_context(*make_certificate(tmp), http1_only)
+        server = await asyncio.get_running_loop().create_server(lambda: ShopProtocol(site), '127.0.0.1', port,
+                                                                ssl=context)
+    if ready is not None:
+        ready()
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/2 + HTTP/1.1 TLS shop for benchmarks")
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--pages', type=int, default=200, help="listing pages /list/0.html .. (default: %(default)s)")
+    parser.add_argument('--products', type=int, default=48, help="product boxes per page")
+    parser.add_argument('--latency', type=float, default=50, help="server time per response in ms")
+    parser.add_argument('--http1-only', action='store_true', help="offer only http/1.1 in ALPN")
+    args = parser.parse_args()
+
+    site = Site(args.pages, args.products, args.latency / 1000)
+    protocols = 'http/1.1' if args.http1_only else 'h2, http/1.1'
+    asyncio.run(serve(args.port, site, args.http1_only,
+                      ready=lambda: print(f"https://localhost:{args.port}/list/0.html ({protocols})", flush=True)))
+
+
+if __name__ == '__main__':
+    main()
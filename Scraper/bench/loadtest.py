@@ -0,0 +1,122 @@
+"""
+Load-test profile for sizing serve.py workers/threads.
+
+Run the app (python serve.py --workers N --threads M), then:
+
+    python bench/loadtest.py --url http://localhost:5000 --steps 1,2,4,8,16,32
+
+Each step keeps `concurrency` clients busy for --duration seconds and
+prints throughput and latency percentiles. Throughput stops growing (and
+p99 shoots up) once the server is saturated - the knee is reported at the
+end. Repeat with different --workers/--threads and keep the cheapest
+configuration that reaches the same knee.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Default request mix - (weight, path)
+DEFAULT_MIX = [
+    (50, '/'),
+    (20, '/?category=Televize'),
+    (10, '/?sort=price_desc'),
+    (10, '/product/iPhone'),
+    (10, '/api/search?q=sam'),
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p90_ms': round(percentile(latencies, 90) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def run_step(base_url, mix, concurrency, duration):
+    """Keep `concurrency` clients busy for `duration` seconds"""
+    paths = [path for weight, path in mix for _ in range(weight)]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        rng = random.Random()
+        local = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            url = base_url + rng.choice(paths)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                local_errors += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def find_knee(results, min_gain=0.10):
+    """First step after which throughput grows by less than min_gain"""
+    for prev, cur in zip(results, results[1:]):
+        if cur['rps'] < prev['rps'] * (1 + min_gain):
+            return prev['concurrency']
+    return results[-1]['concurrency'] if results else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test profile for the web app")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--steps', default='1,2,4,8,16,32', help="comma separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per step")
+    parser.add_argument('--output', help="write results as JSON")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    results = []
+    print(f"{'clients':>8} {'rps':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in [int(s) for s in args.steps.split(',')]:
+        step = run_step(base_url, DEFAULT_MIX, concurrency, args.duration)
+        step['concurrency'] = concurrency
+        results.append(step)
+        print(f"{concurrency:>8} {step['rps']:>9} {step['p50_ms']!s:>9} {step['p90_ms']!s:>9} "
+              f"{step['p99_ms']!s:>9} {step['errors']:>7}")
+
+    knee = find_knee(results)
+    print(f"\nSaturation at ~{knee} concurrent clients")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': base_url, 'steps': results, 'knee': knee}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+File-backed vs in-memory serving (WEB_DB_MODE=memory) - per-endpoint latency.
+
+    python bench/memdb_bench.py                          # comparison_data.db
+    python bench/memdb_bench.py --db big.db --requests 3000 --output memdb.json
+    python bench/memdb_bench.py --cached                 # with the page/query caches on
+
+Publishes a snapshot of --db (Scraper/snapshot.py), then starts one worker
+process per mode that imports app.py against that snapshot and replays the
+same request list in-process (Flask test client, no HTTP) - `/` with
+category/sort/page variants, `/product/<title>` and `/api/search?q=<prefix>`
+drawn from the catalogue. The page and query caches are cleared before each
+request unless --cached, so the numbers are the database path, not the LRU.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, APP_DIR)
+
+ENDPOINTS = ('/', '/product/<name>', '/api/search')
+SORTS = ('price_asc', 'price_desc', 'name_asc')
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def build_requests(snapshot, count, seed):
+    """(endpoint, path) list with titles, prefixes and categories from the catalogue"""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(f"file:{snapshot}?immutable=1", uri=True)
+    titles = [row[0] for row in conn.execute("SELECT title FROM products ORDER BY random() LIMIT 5000")]
+    slugs = [row[0] for row in conn.execute("SELECT slug FROM categories")] or ['all']
+    conn.close()
+
+    requests = []
+    for i in range(count):
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        if endpoint == '/':
+            path = f"/?category={rnd.choice(slugs)}&sort={rnd.choice(SORTS)}&page={rnd.randint(1, 3)}"
+        elif endpoint == '/product/<name>':
+            path = '/product/' + quote(rnd.choice(titles))
+        else:
+            words = rnd.choice(titles).split()
+            path = '/api/search?q=' + quote(rnd.choice(words)[:rnd.randint(2, 5)])
+        requests.append((endpoint, path))
+    return requests
+
+
+def run_worker(mode, snapshot, count, seed, cached):
+    """One mode in this process - prints a JSON result line"""
+    os.environ['WEB_DB_MODE'] = mode
+    os.environ['WEB_SNAPSHOT_PATH'] = snapshot
+    os.chdir(APP_DIR)
+    import app
+
+    started = time.perf_counter()
+    app.warm_up()
+    load_s = time.perf_counter() - started
+
+    client = app.app.test_client()
+    requests = build_requests(snapshot, count, seed)
+    # zahrati: sablony, plany dotazu
+    for _, path in requests[:30]:
+        client.get(path)
+
+    latencies = {endpoint: [] for endpoint in ENDPOINTS}
+    for endpoint, path in requests:
+        if not cached:
+            app.page_cache.clear()
+            app.query_cache.clear()
+        start = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise SystemExit(f"{path}: HTTP {response.status_code}")
+
+    result = {
+        'mode': mode,
+        'startup_s': round(load_s, 3),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'pool': app.db_pool.info(),
+        'endpoints': {},
+    }
+    for endpoint, values in latencies.items():
+        values.sort()
+        result['endpoints'][endpoint] = {
+            'requests': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        }
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="File-backed vs in-memory serving benchmark")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'comparison_data.db'), help="crawl database")
+    parser.add_argument('--requests', type=int, default=1500, help="requests per mode (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cached', action='store_true', help="keep the page/query caches on")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--snapshot', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.snapshot, args.requests, args.seed, args.cached)
+        return
+
+    from Scraper.snapshot import publish_snapshot
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'snapshot.db')
+        publish_snapshot(os.path.abspath(args.db), snapshot)
+        size_mb = os.path.getsize(snapshot) / 1e6
+        print(f"snapshot {size_mb:.1f} MB, {args.requests} requests per mode"
+              f"{'' if args.cached else ', caches cleared per request'}\n")
+        for mode in ('file', 'memory'):
+            command = [sys.executable, os.path.abspath(__file__), '--worker', mode, '--snapshot', snapshot,
+                       '--requests', str(args.requests), '--seed', str(args.seed)]
+            if args.cached:
+                command.append('--cached')
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'endpoint':<18} {'mode':<7} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for endpoint in ENDPOINTS:
+        for result in results:
+            row = result['endpoints'][endpoint]
+            print(f"{endpoint:<18} {result['mode']:<7} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['mean_ms']:>8.3f}")
+    print()
+    for result in results:
+        print(f"{result['mode']:<7} startup {result['startup_s']:.2f} s, max RSS {result['max_rss_mb']:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'db': args.db, 'snapshot_mb': round(size_mb, 1), 'cached': args.cached,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
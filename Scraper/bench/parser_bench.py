@@ -0,0 +1,285 @@
+"""
+Parser benchmark - per-page parse time and peak memory of the spider callbacks.
+
+    python bench/parser_bench.py                     # synthetic pages
+    python bench/parser_bench.py --pages saved/      # saved pages: mironet-*.html, datart-*.html
+    python bench/parser_bench.py --iterations 200 --output parser.json
+    python bench/parser_bench.py --workers 1,2,4,8        # + parse pool throughput
+
+Compares the current parsers (byte-slice fast path, Scraper/htmlslice.py)
+with the reference full-page implementations kept below, and checks that
+both produce the same items and follow-up requests. Save real pages with
+e.g. `scrapy fetch --nolog URL > saved/mironet-tv.html`.
+
+--workers measures dtrspider listing pages per second (products + rule
+links, the parse pool task) inline and in a ProcessPoolExecutor of each size.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapy.http import HtmlResponse, Request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Scraper.spiders.datart_spider import DatartSpider, extract_listing, parse_products  # noqa: E402
+from Scraper.spiders.mironet_spider import MironetSpider  # noqa: E402
+from Scraper.prices import parse_price  # noqa: E402
+
+MIRONET_URL = 'https://www.mironet.cz/televize+c10781/'
+DATART_URL = 'https://www.datart.cz/televize.html'
+
+
+# --- reference implementations (full-page selectors, before the fast path) ---
+
+UNICODE_MAP = {
+    '\\u00e1': 'á', '\\u00e9': 'é', '\\u00ed': 'í', '\\u00f3': 'ó', '\\u00fa': 'ú', '\\u00fd': 'ý',
+    '\\u010d': 'č', '\\u010f': 'ď', '\\u011b': 'ě', '\\u0148': 'ň', '\\u0159': 'ř', '\\u0161': 'š',
+    '\\u0165': 'ť', '\\u016f': 'ů', '\\u017e': 'ž', '\\u017d': 'Ž', '\\u0160': 'Š', '\\u010c': 'Č',
+    '\\u0158': 'Ř', '\\/': '/',
+}
+
+
+def reference_mironet(spider, response):
+    breadcrumbs = response.css('.breadcrumbs a::text, .breadcrumb a::text').getall()
+    category = [b.strip() for b in breadcrumbs if b.strip().lower() not in ['home', 'domů', 'úvod']][-1]
+    for script in response.css('script::text').getall():
+        if 'items:' in script and 'item_id:' in script:
+            items_match = re.search(r'items:\s*\[(.*?)\](?=\s*[,}])', script, re.DOTALL)
+            for item_match in re.finditer(r'\{[^}]*item_id:[^}]*\}', items_match.group(1), re.DOTALL):
+                item_str = item_match.group(0)
+                item_id = re.search(r'item_id:\s*"([^"]+)"', item_str)
+                item_name = re.search(r'item_name:\s*"([^"]+)"', item_str)
+                price = re.search(r'price:\s*(\d+(?:\.\d+)?)', item_str)
+                title = item_name.group(1)
+                for code, char in UNICODE_MAP.items():
+                    title = title.replace(code, char)
+                yield {
+                    'title': title,
+                    'price': float(price.group(1)) if price else None,
+                    'link': f"https://www.mironet.cz/produkt/d{item_id.group(1)}",
+                    'category': category,
+                    'rating': None,
+                }
+            break
+    next_page = (
+        response.css('a.next::attr(href)').get() or
+        response.css('a[rel="next"]::attr(href)').get() or
+        response.css('.pagination a:contains("›")::attr(href)').get() or
+        response.css('.pagination .next a::attr(href)').get()
+    )
+    if next_page:
+        yield response.follow(next_page)
+
+
+def reference_datart(spider, response):
+    for product_box in response.css('.product-box'):
+        data_json = json.loads(product_box.css('::attr(data-gtm-data-product)').get().replace('&quot;', '"'))
+        item = {'title': data_json.get('item_name')}
+        price = product_box.css('[data-product-price]::attr(data-product-price)').get()
+        if price:
+            item['price'] = price
+        link = product_box.css('a::attr(href)').get()
+        if link:
+            item['link'] = response.urljoin(link)
+        rating = product_box.css('.rating-wrap span.bold::text').get()
+        if rating:
+            item['rating'] = rating.strip()
+        segments = [s.strip() for s in data_json.get('item_category', '').split('/') if s.strip()]
+        if segments:
+            item['category'] = segments[-1]
+        yield item
+
+
+# --- synthetic pages ---
+
+WORDS = ['televize', 'lednice', 'pracka', 'notebook', 'telefon', 'sluchatka', 'kavovar', 'vysavac',
+         'mikrovlnka', 'monitor', 'tiskarna', 'reproduktor', 'tablet', 'fotoaparat', 'trouba']
+NAMES = ['Samsung', 'LG', 'Philips', 'Sony', 'Bosch', 'Xiaomi', 'Lenovo', 'Apple', 'Electrolux']
+
+
+def mega_menu(rnd, links=2500):
+    parts = ['<header><nav class="mega-menu"><ul>']
+    for i in range(links):
+        slug = '-'.join(rnd.sample(WORDS, 3))
+        parts.append(f'<li class="menu-item"><a href="/{slug}+c{10000 + i}/" title="{slug}">'
+                     f'<span class="icon icon-{i % 40}"></span>{slug.replace("-", " ").title()}</a></li>')
+    parts.append('</ul></nav></header>')
+    return ''.join(parts)
+
+
+def tracking_scripts(rnd, count=25, size=6000):
+    return ''.join(
+        '<script>window.dataLayer=window.dataLayer||[];var cfg' + str(i) + '={' +
+        ','.join(f'"k{j}":"{rnd.random():.12f}"' for j in range(size // 24)) + '};</script>'
+        for i in range(count)
+    )
+
+
+def js_price(rnd):
+    """Price as Mironet's JS prints it - 12990, 1299.9 or a float artefact like 83918.38999999998"""
+    koruny = rnd.randint(299, 89999)
+    kind = rnd.random()
+    if kind < 0.5:
+        return str(koruny)
+    if kind < 0.85:
+        # cena bez DPH (v halerich) * 1.21 v JS -> binarni zbytek
+        return repr(round(koruny / 1.21, 2) * 1.21)
+    return f"{koruny}.{rnd.randint(1, 9)}"
+
+
+def mironet_page(rnd, products=40):
+    items = ','.join(
+        '{item_id: "%d", item_name: "%s %s \\u010dern\\u00e1 \\u0159ada %d", price: %s, quantity: 1}'
+        % (rnd.randint(10**6, 10**7), rnd.choice(NAMES), rnd.choice(WORDS), i, js_price(rnd))
+        for i in range(products)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Televize | Mironet</title>'
+        + tracking_scripts(rnd) + '</head><body>' + mega_menu(rnd)
+        + '<div class="breadcrumbs"><a href="/">Úvod</a> › <a href="/tv-audio+c1/">TV a audio</a> › '
+          '<a href="/televize+c10781/">Televize</a></div>'
+        + '<div class="products">' + ''.join(
+            f'<div class="item"><img src="/img/{i}.jpg"><h3>Produkt {i}</h3></div>' for i in range(products))
+        + '</div><div class="pagination"><a href="?PgID=1">1</a><a class="next" href="?PgID=2">›</a></div>'
+        + '<script>gtag("event", "view_item_list", {item_list_name: "Televize", items: [' + items + ']});</script>'
+        + '<footer>' + '<p>Footer text</p>' * 200 + '</footer></body></html>'
+    ).encode('utf-8')
+
+
+def datart_page(rnd, products=36):
+    boxes = []
+    for i in range(products):
+        name = f'{rnd.choice(NAMES)} {rnd.choice(WORDS).title()} {i} "Edice"'
+        gtm = json.dumps({'item_name': name, 'item_id': str(i), 'item_category': 'TV, audio / Televize / Smart TV'},
+                         ensure_ascii=False).replace('"', '&quot;')
+        boxes.append(
+            f'<div class="product-box" data-gtm-data-product="{gtm}">'
+            f'<a href="/{rnd.choice(WORDS)}-{i}.html"><img src="/i/{i}.jpg"></a>'
+            f'<div class="price" data-product-price="{rnd.randint(299, 89999)}">cena</div>'
+            f'<div class="rating-wrap"><span class="bold"> {rnd.randint(50, 100)} % </span></div></div>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Televize | Datart</title>'
+        + tracking_scripts(rnd) + '</head><body>' + mega_menu(rnd)
+        + '<main><div class="product-list">' + ''.join(boxes) + '</div></main>'
+        + '<footer>' + '<p>Footer text</p>' * 200 + '</footer></body></html>'
+    ).encode('utf-8')
+
+
+# --- measuring ---
+
+def parse_outputs(fn, spider, body, url):
+    response = HtmlResponse(url=url, body=body, encoding='utf-8', request=Request(url))
+    results = []
+    for value in fn(spider, response):
+        if isinstance(value, Request):
+            results.append(('request', value.url))
+        else:
+            # spidery davaji surovou cenu, srovnava se az v halerich
+            results.append(('item', dict(value, price=parse_price(value.get('price')))))
+    return results
+
+
+def measure(fn, spider, pages, iterations):
+    # cas - kazda iterace dostane novou Response (selector se cachuje na response)
+    started = time.perf_counter()
+    for i in range(iterations):
+        body, url = pages[i % len(pages)]
+        parse_outputs(fn, spider, body, url)
+    per_page = (time.perf_counter() - started) / iterations
+
+    tracemalloc.start()
+    peaks = []
+    for body, url in pages:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        parse_outputs(fn, spider, body, url)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return {'ms_per_page': round(per_page * 1000, 3), 'peak_kb': round(max(peaks) / 1024)}
+
+
+def pool_throughput(pages, extractors, workers, tasks):
+    """Listing pages per second through extract_listing - inline (workers=0) or in a pool"""
+    args = [(url, body, 'utf-8', extractors) for body, url in pages]
+    jobs = [args[i % len(args)] for i in range(tasks)]
+    if not workers:
+        started = time.perf_counter()
+        for job in jobs:
+            extract_listing(*job)
+        return tasks / (time.perf_counter() - started)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        list(pool.map(extract_listing, *zip(*args)))       # zahrati workeru
+        started = time.perf_counter()
+        list(pool.map(extract_listing, *zip(*jobs)))
+        return tasks / (time.perf_counter() - started)
+
+
+def load_pages(directory, prefix, url, generate, rnd):
+    if directory:
+        return [(open(path, 'rb').read(), url) for path in sorted(glob.glob(os.path.join(directory, prefix + '-*.html')))]
+    return [(generate(rnd), url) for _ in range(3)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spider parsing callbacks")
+    parser.add_argument('--pages', help="directory with saved mironet-*.html / datart-*.html pages")
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--workers', help="comma separated parse pool sizes to measure, e.g. 1,2,4")
+    parser.add_argument('--output', help="write results as JSON")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    mironet, datart = MironetSpider(), DatartSpider()
+    cases = [
+        ('mironet', mironet, reference_mironet, lambda s, r: s.parse_html(r),
+         load_pages(args.pages, 'mironet', MIRONET_URL, mironet_page, rnd)),
+        ('datart', datart, reference_datart, lambda s, r: parse_products(r)[0],
+         load_pages(args.pages, 'datart', DATART_URL, datart_page, rnd)),
+    ]
+
+    results = {}
+    print(f"{'parser':<10} {'page KB':>8} {'impl':<10} {'ms/page':>9} {'peak KB':>9}  output")
+    for name, spider, reference, current, pages in cases:
+        if not pages:
+            continue
+        size = sum(len(body) for body, _ in pages) / len(pages) / 1024
+        same = all(parse_outputs(reference, spider, body, url) == parse_outputs(current, spider, body, url)
+                   for body, url in pages)
+        results[name] = {'page_kb': round(size), 'same_output': same}
+        for label, fn in (('reference', reference), ('fast path', current)):
+            stats = measure(fn, spider, pages, args.iterations)
+            results[name][label] = stats
+            print(f"{name:<10} {size:>8.0f} {label:<10} {stats['ms_per_page']:>9} {stats['peak_kb']:>9}  "
+                  f"{'identical' if same else 'DIFFERENT'}")
+
+    if args.workers:
+        pages = cases[1][4]
+        extractors = [rule.link_extractor for rule in datart._rules]
+        tasks = max(args.iterations, 40)
+        inline = pool_throughput(pages, extractors, 0, tasks)
+        results['parse_pool'] = {'inline': round(inline, 1)}
+        print(f"\n{'workers':>8} {'pages/s':>9} {'speedup':>8}")
+        print(f"{'inline':>8} {inline:>9.1f} {1:>8.2f}")
+        for workers in [int(w) for w in args.workers.split(',')]:
+            rate = pool_throughput(pages, extractors, workers, tasks)
+            results['parse_pool'][workers] = round(rate, 1)
+            print(f"{workers:>8} {rate:>9.1f} {rate / inline:>8.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+End-to-end web benchmark - realistic query mixes against a running server.
+
+    python bench/gen_catalogue.py --rows 2000000 --db big.db
+    python bench/web_bench.py --db big.db --output bench/results/web.json
+    python bench/web_bench.py --db big.db --workers 4 --threads 8 --db-mode memory --compare bench/results/web.json
+    python bench/web_bench.py --url http://localhost:5000 --db comparison_data.db   # server already running
+
+Without --url it publishes a snapshot of --db (Scraper/snapshot.py), starts
+serve.py on a free port against it and stops it at the end. --db is also
+where the queries come from - titles, words and categories of the catalogue.
+
+Scenarios (--scenarios, comma separated):
+  browse   category listings, page 1 most of the time, mostly cheapest first
+  search   autocomplete typing - /api/search for every prefix of a word
+  product  /product/<title>, popular products (Zipf) far more often
+  mixed    45 % browse, 25 % search, 20 % product, 10 % full-text listing
+
+Each scenario runs --concurrency clients for --warmup + --duration seconds
+and reports throughput and p50/p90/p99 overall and per endpoint. Results
+(plus git revision, catalogue size and server config) go to --output as
+JSON; --compare prints the change against an earlier result file.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+from loadtest import summarize
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, APP_DIR)
+
+SCENARIOS = ('browse', 'search', 'product', 'mixed')
+SORTS = (('price_asc', 6), ('price_desc', 2), ('name_asc', 1), ('name_desc', 1))
+
+
+class QueryMix:
+    """Draws (endpoint, path) requests from what is actually in the catalogue"""
+
+    def __init__(self, db_path, seed=1, sample=5000):
+        self.rnd = random.Random(seed)
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        self.rows = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        titles = [row[0] for row in conn.execute("SELECT title FROM products ORDER BY random() LIMIT ?", (sample,))]
+        try:
+            categories = conn.execute("""
+                SELECT slug, (SELECT COUNT(*) FROM products p WHERE p.category_id = c.id) AS count
+                FROM categories c
+            """).fetchall()
+        except sqlite3.OperationalError:
+            categories = []
+        conn.close()
+
+        # popularita produktu ~ Zipf podle nahodneho poradi
+        self.titles = titles
+        self.title_weights = [1 / rank ** 1.1 for rank in range(1, len(titles) + 1)]
+        words = {}
+        for title in titles:
+            for word in title.split():
+                if len(word) >= 3 and word.isalpha():
+                    words[word] = words.get(word, 0) + 1
+        self.words = sorted(words, key=words.get, reverse=True)[:300]
+        self.word_weights = [words[word] for word in self.words]
+        self.categories = [slug for slug, count in categories if count] or ['all']
+        self.category_weights = [count for _, count in categories if count] or [1]
+
+    def browse(self):
+        page = 1
+        while page < 10 and self.rnd.random() < 0.25:
+            page += 1
+        category = self.rnd.choices(self.categories, self.category_weights)[0]
+        sort = self.rnd.choices([s for s, _ in SORTS], [w for _, w in SORTS])[0]
+        return '/', f"/?category={category}&sort={sort}&page={page}"
+
+    def product(self):
+        title = self.rnd.choices(self.titles, self.title_weights)[0]
+        return '/product/<name>', '/product/' + quote(title)
+
+    def search(self):
+        # jeden "stisk klavesy" - prefix slova delky 2..len
+        word = self.rnd.choices(self.words, self.word_weights)[0]
+        return '/api/search', '/api/search?q=' + quote(word[:self.rnd.randint(2, len(word))])
+
+    def listing_search(self):
+        word = self.rnd.choices(self.words, self.word_weights)[0]
+        return '/?search=', f"/?search={quote(word)}&page=1"
+
+    def draw(self, scenario):
+        if scenario == 'mixed':
+            return self.rnd.choices((self.browse, self.search, self.product, self.listing_search),
+                                    (45, 25, 20, 10))[0]()
+        return getattr(self, scenario)()
+
+    def requests(self, scenario, count):
+        return [self.draw(scenario) for _ in range(count)]
+
+
+def run_scenario(base_url, requests, concurrency, warmup, duration):
+    """Replay `requests` round-robin from `concurrency` clients, measure after warm-up"""
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    deadline = start_at + duration
+
+    def client(offset):
+        local = {}
+        local_errors = {}
+        i = offset
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            endpoint, path = requests[i % len(requests)]
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=60) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                if started >= start_at:
+                    local_errors[endpoint] = local_errors.get(endpoint, 0) + 1
+                continue
+            if started >= start_at:
+                local.setdefault(endpoint, []).append(time.perf_counter() - started)
+        with lock:
+            for endpoint, values in local.items():
+                latencies.setdefault(endpoint, []).extend(values)
+            for endpoint, count in local_errors.items():
+                errors[endpoint] = errors.get(endpoint, 0) + count
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    result = summarize([v for values in latencies.values() for v in values], sum(errors.values()), duration)
+    result['endpoints'] = {endpoint: summarize(values, errors.get(endpoint, 0), duration)
+                           for endpoint, values in sorted(latencies.items())}
+    return result
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(snapshot, workers, threads, db_mode):
+    port = free_port()
+    env = dict(os.environ, WEB_SNAPSHOT_PATH=snapshot)
+    command = [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+               '--threads', str(threads), '--db-mode', db_mode]
+    server = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(600):
+        try:
+            with urllib.request.urlopen(base_url + '/health', timeout=5):
+                return server, base_url
+        except (urllib.error.URLError, OSError):
+            if server.poll() is not None:
+                raise SystemExit(f"serve.py exited with {server.returncode}")
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("serve.py did not come up within 60 s")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{'scenario':<9} {'endpoint':<17} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>7}")
+    for name, result in results.items():
+        rows = [('(all)', result)] + list(result['endpoints'].items())
+        for endpoint, row in rows:
+            print(f"{name:<9} {endpoint:<17} {row['requests']:>9} {row['rps']:>8} {row['p50_ms']!s:>8} "
+                  f"{row['p90_ms']!s:>8} {row['p99_ms']!s:>8} {row['errors']:>7}")
+
+
+def print_comparison(results, previous):
+    print(f"\nvs {previous['meta'].get('git_revision')} ({previous['meta'].get('timestamp')}):")
+    for name, result in results.items():
+        old = previous['scenarios'].get(name)
+        if not old:
+            continue
+        changes = []
+        for key in ('rps', 'p50_ms', 'p99_ms'):
+            if old.get(key) and result.get(key) is not None:
+                changes.append(f"{key} {old[key]} -> {result[key]} ({(result[key] / old[key] - 1) * 100:+.0f} %)")
+        print(f"  {name:<9} " + ', '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end web benchmark with realistic query mixes")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'comparison_data.db'),
+                        help="catalogue to serve and draw queries from (see gen_catalogue.py)")
+    parser.add_argument('--url', help="benchmark an already running server instead of starting serve.py")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help="measured seconds per scenario")
+    parser.add_argument('--warmup', type=float, default=3.0, help="unmeasured seconds per scenario")
+    parser.add_argument('--workers', type=int, default=2, help="serve.py workers")
+    parser.add_argument('--threads', type=int, default=8, help="serve.py threads per worker")
+    parser.add_argument('--db-mode', choices=('file', 'memory'), default='file')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--compare', help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    mix = QueryMix(args.db, args.seed)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}, choose from {', '.join(SCENARIOS)}")
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            from Scraper.snapshot import publish_snapshot
+
+            snapshot = os.path.join(tmp, 'snapshot.db')
+            publish_snapshot(os.path.abspath(args.db), snapshot)
+            server, base_url = start_server(snapshot, args.workers, args.threads, args.db_mode)
+        print(f"{mix.rows} products, {base_url}, {args.concurrency} clients, "
+              f"{args.warmup:.0f}+{args.duration:.0f} s per scenario\n")
+
+        results = {}
+        try:
+            for name in scenarios:
+                requests = mix.requests(name, 20000)
+                results[name] = run_scenario(base_url, requests, args.concurrency, args.warmup, args.duration)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print_results(results)
+    meta = {
+        'git_revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'db': os.path.abspath(args.db),
+        'products': mix.rows,
+        'url': args.url,
+        'server': None if args.url else {'workers': args.workers, 'threads': args.threads, 'db_mode': args.db_mode},
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'scenarios': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Static asset build step.
+Run: python build_assets.py
+
+Minifies CSS/JS from static/, copies every asset to static/dist/ under a
+content-hashed name (style.3f2a9c1e.css), pre-compresses text assets with
+gzip and brotli (if the brotli package is installed) and writes
+static/dist/manifest.json, which app.py uses to link the hashed files.
+Hashed files never change, so they are served with immutable cache headers.
+The previous build's files stay (manifest.previous.json) - pages rendered or
+cached before the rebuild still link them; older builds are removed.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = 'static'
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+PREVIOUS_MANIFEST_NAME = 'manifest.previous.json'
+
+# Files worth compressing - images are already compressed
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # ':' jen v deklaracich - v selektoru je ".a :hover" neco jineho nez ".a:hover"
+    text = re.sub(r'\{[^{}]*\}', lambda block: re.sub(r'\s*:\s*', ':', block.group(0)), text)
+    text = text.replace(';}', '}')
+    return text.strip()
+
+
+def minify_js(text):
+    # Konzervativni - jen odsazeni, prazdne radky a celoradkove komentare.
+    # Neprepisuje nic uvnitr radku, takze retezce a template literaly zustanou.
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:8]
+
+
+def build_asset(rel_path):
+    """Minify, hash and compress one asset; return its hashed relative path"""
+    src = os.path.join(STATIC_DIR, rel_path)
+    root, ext = os.path.splitext(rel_path)
+
+    with open(src, 'rb') as f:
+        data = f.read()
+    if ext in MINIFIERS:
+        data = MINIFIERS[ext](data.decode('utf-8')).encode('utf-8')
+
+    hashed = f"{root}.{content_hash(data)}{ext}"
+    dest = os.path.join(DIST_DIR, hashed)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with open(dest, 'wb') as f:
+        f.write(data)
+
+    if ext in COMPRESSIBLE:
+        with open(dest + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(dest + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+    return hashed.replace(os.sep, '/')
+
+
+def iter_assets():
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        # dist/ is our own output
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')
+
+
+def read_manifest(name):
+    path = os.path.join(DIST_DIR, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def prune(keep):
+    """Delete dist files of builds older than the previous one"""
+    keep = {os.path.normpath(os.path.join(DIST_DIR, name)) for name in keep}
+    keep.update({os.path.join(DIST_DIR, MANIFEST_NAME), os.path.join(DIST_DIR, PREVIOUS_MANIFEST_NAME)})
+    for dirpath, dirnames, filenames in os.walk(DIST_DIR, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            # .gz/.br patri k souboru bez pripony
+            base = path[:-3] if path.endswith(('.gz', '.br')) else path
+            if path not in keep and base not in keep:
+                os.remove(path)
+        if dirpath != DIST_DIR and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+def build():
+    # stary build se nemaze cely - klienti s drive vydanou strankou ho jeste nactou
+    previous = read_manifest(MANIFEST_NAME)
+    os.makedirs(DIST_DIR, exist_ok=True)
+
+    manifest = {}
+    for rel_path in iter_assets():
+        manifest[rel_path] = build_asset(rel_path)
+
+    if previous and previous != manifest:
+        with open(os.path.join(DIST_DIR, PREVIOUS_MANIFEST_NAME), 'w') as f:
+            json.dump(previous, f, indent=2, sort_keys=True)
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    prune(set(manifest.values()) | set(read_manifest(PREVIOUS_MANIFEST_NAME).values()))
+    return manifest
+
+
+if __name__ == '__main__':
+    manifest = build()
+    for src, dest in sorted(manifest.items()):
+        before = os.path.getsize(os.path.join(STATIC_DIR, src))
+        after = os.path.getsize(os.path.join(DIST_DIR, dest))
+        gz = os.path.join(DIST_DIR, dest + '.gz')
+        gz_size = f"{os.path.getsize(gz):>8} gz" if os.path.exists(gz) else ''
+        print(f"{src:<30} {before:>8} -> {after:>8} {gz_size}")
+    if brotli is None:
+        print("brotli not installed - skipped .br variants")
@@ -0,0 +1,141 @@
+"""
+SQLite connection pool for the web app.
+
+Connections come from sqlite3.connect(factory=PooledConnection), so the
+existing `conn = get_db_connection() ... conn.close()` code keeps working:
+close() just hands the connection back to the pool.
+
+With immutable=True the file is opened as a read snapshot (Scraper/snapshot.py):
+no locking, no change checks, read through mmap. switch() points the pool at
+a newly published snapshot - connections still in use finish their query on
+the old file and are closed when they come back.
+
+switch(..., in_memory=True) copies the file into a shared-cache in-memory
+database with the backup API and serves every connection from that copy,
+so reads never touch the file system. Costs the size of the DB per worker
+(twice that while a new snapshot is being loaded).
+"""
+
+import queue
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its pool"""
+
+    pool = None
+    generation = 0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """LIFO pool of SQLite connections shared by the threads of one worker"""
+
+    def __init__(self, path, size=8, immutable=False, mmap_size=0):
+        self.path = path
+        self.size = size
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.generation = 0
+        self.memory = None      # drzi in-memory kopii nazivu
+        self.memory_uri = None
+        self.created = 0
+        self.in_use = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.memory_uri:
+            conn = sqlite3.connect(self.memory_uri, uri=True, factory=PooledConnection,
+                                   check_same_thread=False)
+        elif self.immutable:
+            conn = sqlite3.connect(f"file:{pathname2url(self.path)}?immutable=1", uri=True,
+                                   factory=PooledConnection, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False)
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        conn.generation = self.generation
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self.in_use -= 1
+        if conn.generation == self.generation and self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.really_close()
+
+    def warm(self, count=None):
+        """Open connections up front so the first requests don't pay for it"""
+        count = self.size if count is None else count
+        while self._idle.qsize() < count:
+            self._idle.put(self._connect())
+
+    def _load(self, path, generation):
+        """Copy a database file into a new shared in-memory database"""
+        uri = f"file:dbpool-{id(self)}-{generation}?mode=memory&cache=shared"
+        memory = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(f"file:{pathname2url(path)}?mode=ro", uri=True)
+        try:
+            source.backup(memory)
+        finally:
+            source.close()
+        return uri, memory
+
+    def switch(self, path, immutable=False, in_memory=False):
+        """Serve a different file from now on (a new snapshot was swapped in)"""
+        # kopie se nacte driv, nez se pool prepne - do te doby se obsluhuje ze stare
+        memory_uri, memory = self._load(path, self.generation + 1) if in_memory else (None, None)
+        with self._lock:
+            self.path = path
+            self.immutable = immutable
+            self.generation += 1
+            old_memory, self.memory, self.memory_uri = self.memory, memory, memory_uri
+        self.close_all()
+        if old_memory is not None:
+            # stara kopie zmizi, az se vrati i posledni pujcene spojeni
+            old_memory.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().really_close()
+            except queue.Empty:
+                break
+
+    def info(self):
+        with self._lock:
+            return {
+                'path': self.path,
+                'immutable': self.immutable,
+                'in_memory': self.memory is not None,
+                'generation': self.generation,
+                'size': self.size,
+                'created': self.created,
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+            }
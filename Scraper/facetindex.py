@@ -0,0 +1,164 @@
+"""
+In-memory facet index for /api/products.
+
+Loads the posting bitmaps the snapshot was published with (facet_postings,
+Scraper/facets.py) as Python ints - one per facet value, bit i = products
+row i. A filter is an OR of the selected values of each facet and an AND
+across facets; a facet count is int.bit_count() of that AND with the
+value's bitmap. Counts are disjunctive: each facet is counted with every
+filter except its own, so ticking a second shop still shows how many
+products the other shops have.
+
+Price and rating are range facets stored as buckets. A range that cuts
+through a bucket takes the whole buckets inside it from the bitmaps and
+only the cut part from SQL (load_rowids), remembered per index.
+"""
+
+import threading
+import time
+
+# sloupec products pro rozsahove facety
+RANGE_COLUMNS = {'price': 'price', 'rating': 'rating'}
+MEMO_SIZE = 256
+
+
+def bitmap_of(rowids):
+    """rowids -> int bitmap (built in a bytearray, `|= 1 << i` on a big int is O(n) per row)"""
+    rowids = list(rowids)
+    if not rowids:
+        return 0
+    bits = bytearray(max(rowids) // 8 + 1)
+    for rowid in rowids:
+        bits[rowid >> 3] |= 1 << (rowid & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class FacetIndex:
+
+    def __init__(self, rows, version=None, load_rowids=None):
+        """rows: iterable of (facet, value, bitmap as int)"""
+        started = time.perf_counter()
+        self.version = version
+        self.load_rowids = load_rowids
+        self.bitmaps = {}
+        for facet, value, bitmap in rows:
+            self.bitmaps.setdefault(facet, {})[value] = bitmap
+        self.universe = self.bitmaps.pop('*', {}).get('', 0)
+
+        # rozsahove facety -> serazene dolni hrany a bitmapa kazdeho pasma
+        self.edges = {}
+        self.buckets = {}
+        for facet in RANGE_COLUMNS:
+            values = self.bitmaps.pop(facet, {})
+            edges = sorted(values, key=float)
+            self.edges[facet] = [float(edge) for edge in edges]
+            buckets = [values[edge] for edge in edges]
+            if facet == 'rating':
+                # rating >= krok je kumulativni -> pasmo [krok, dalsi krok)
+                buckets = [bitmap & ~nxt for bitmap, nxt in zip(buckets, buckets[1:] + [0])]
+            self.buckets[facet] = buckets
+        self.memo = {}
+        self.build_seconds = time.perf_counter() - started
+
+    def union(self, facet, values):
+        """Rows having any of the values (None when nothing is selected = no filter)"""
+        if not values:
+            return None
+        postings = self.bitmaps.get(facet, {})
+        bitmap = 0
+        for value in values:
+            bitmap |= postings.get(str(value), 0)
+        return bitmap
+
+    def _cut(self, facet, lo, hi):
+        """Rows with lo <= column < hi from SQL (None = open end)"""
+        key = (facet, lo, hi)
+        bitmap = self.memo.get(key)
+        if bitmap is None:
+            bitmap = bitmap_of(self.load_rowids(RANGE_COLUMNS[facet], lo, hi))
+            if len(self.memo) < MEMO_SIZE:
+                self.memo[key] = bitmap
+        return bitmap
+
+    def range(self, facet, lo=None, hi=None):
+        """Rows with lo <= value < hi; None when the range is open on both ends"""
+        if lo is None and hi is None:
+            return None
+        edges = self.edges[facet]
+        if not edges:
+            return self._cut(facet, lo, hi)
+        bitmap = 0
+        # pod prvni hranou zadne pasmo neni
+        if lo is None or lo < edges[0]:
+            top = edges[0] if hi is None else min(hi, edges[0])
+            if lo is None or lo < top:
+                bitmap |= self._cut(facet, lo, top)
+        for i, start in enumerate(edges):
+            end = edges[i + 1] if i + 1 < len(edges) else None
+            if (hi is not None and start >= hi) or (lo is not None and end is not None and end <= lo):
+                continue
+            if (lo is None or lo <= start) and (hi is None or (end is not None and end <= hi)):
+                bitmap |= self.buckets[facet][i]
+            else:
+                cut_lo = start if lo is None else max(lo, start)
+                cut_hi = end if hi is None else (hi if end is None else min(hi, end))
+                bitmap |= self._cut(facet, cut_lo, cut_hi)
+        return bitmap
+
+    def search(self, filters):
+        """filters: {facet: bitmap or None} -> (matching rows bitmap, per-facet counts)"""
+        active = {facet: bitmap for facet, bitmap in filters.items() if bitmap is not None}
+
+        def without(facet):
+            bitmap = self.universe
+            for other, other_bitmap in active.items():
+                if other != facet:
+                    bitmap &= other_bitmap
+            return bitmap
+
+        counts = {}
+        for facet, postings in self.bitmaps.items():
+            base = without(facet)
+            counts[facet] = {value: (base & bitmap).bit_count() for value, bitmap in postings.items()}
+        for facet, edges in self.edges.items():
+            base = without(facet)
+            counts[facet] = [(edge, (base & bitmap).bit_count()) for edge, bitmap in zip(edges, self.buckets[facet])]
+
+        matching = self.universe
+        for bitmap in active.values():
+            matching &= bitmap
+        return matching, counts
+
+    def info(self):
+        return {
+            'version': self.version,
+            'rows': self.universe.bit_count(),
+            'postings': sum(len(p) for p in self.bitmaps.values()) + sum(len(b) for b in self.buckets.values()),
+            'memory_bytes': sum((b.bit_length() + 7) // 8 for p in self.bitmaps.values() for b in p.values())
+                            + sum((b.bit_length() + 7) // 8 for bs in self.buckets.values() for b in bs),
+            'memo': len(self.memo),
+            'build_seconds': round(self.build_seconds, 3),
+        }
+
+
+class Facets:
+    """Holds the current FacetIndex and reloads it when the data version changes"""
+
+    def __init__(self, load_rows, load_rowids):
+        self.load_rows = load_rows
+        self.load_rowids = load_rowids
+        self.index = None
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        # nacteni je jen dekomprese bitmap - synchronne, at bitmapy sedi k rowid snapshotu
+        index = self.index
+        if index is not None and index.version == version:
+            return index
+        with self._lock:
+            if self.index is None or self.index.version != version:
+                self.index = FacetIndex(self.load_rows(), version, self.load_rowids)
+            return self.index
+
+    def info(self):
+        return self.index.info() if self.index is not None else None
@@ -0,0 +1,90 @@
+"""
+Production server for the price comparison web app.
+
+Run: python serve.py [--workers N] [--threads N] [--bind HOST:PORT]
+
+Uses gunicorn (multi-process, gthread workers) when it is installed and
+falls back to waitress (single process, thread pool) otherwise, e.g. on
+Windows. Every worker opens its own DB connections and pre-warms the caches
+before taking traffic; GET /health reports the pool and cache state.
+
+Defaults come from WEB_WORKERS / WEB_THREADS / WEB_BIND, use
+bench/loadtest.py to find the right numbers for a given machine.
+--db-mode memory (WEB_DB_MODE) serves every worker from an in-memory copy of
+the published snapshot, see bench/memdb_bench.py for what it buys.
+"""
+
+import argparse
+import multiprocessing
+import os
+
+
+def default_workers():
+    return int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+
+def run_gunicorn(bind, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class PriceComparisonApp(BaseApplication):
+
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # No preload - SQLite connections must not cross fork()
+            self.cfg.set('preload_app', False)
+            self.cfg.set('post_worker_init', post_worker_init)
+            self.cfg.set('accesslog', '-')
+
+        def load(self):
+            from app import app
+            return app
+
+    PriceComparisonApp().run()
+
+
+def post_worker_init(worker):
+    from app import warm_up
+    warm_up()
+    worker.log.info("Worker %s warmed up", worker.pid)
+
+
+def run_waitress(bind, threads):
+    from waitress import serve
+    from app import app, warm_up
+
+    warm_up()
+    serve(app, listen=bind, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the web app under a production WSGI server")
+    parser.add_argument('--bind', default=os.environ.get('WEB_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)))
+    parser.add_argument('--db-mode', choices=('file', 'memory'), default=os.environ.get('WEB_DB_MODE', 'file'))
+    args = parser.parse_args()
+
+    # app.py sizes its connection pool from WEB_THREADS
+    os.environ['WEB_THREADS'] = str(args.threads)
+    os.environ['WEB_DB_MODE'] = args.db_mode
+
+    # Schema/migrace jednou pred startem workeru, at se o ni neperou.
+    # Import app connection neotevira, takze po fork() zadna nezustane.
+    from app import prepare_database
+    prepare_database()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print(f"gunicorn not installed - serving with waitress ({args.threads} threads, 1 process)")
+        run_waitress(args.bind, args.threads)
+    else:
+        print(f"Serving on {args.bind} with gunicorn ({args.workers} workers x {args.threads} threads)")
+        run_gunicorn(args.bind, args.workers, args.threads)
+
+
+if __name__ == '__main__':
+    main()
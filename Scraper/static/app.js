@@ -1,21 +1,32 @@
 // --- 1. Konfigurace a Globální Stav ---
-let allProducts = []; 
-let currentFilters = { categories: [], sources: [] }; 
-
-// !!! OPRAVA LOGA: Klíče musí odpovídat tomu, co je v DB (např. "dtrspider")
-const logoMap = {
-    // Tady musí být přesně to, co máš ve sloupci 'source_site' v DB
-    'dtrspider': '/static/logos/datart.png', 
-    'planeospider': '/static/logos/planeo.png',
-    'mironetspider': '/static/logos/mironet.png',
-    
-    // Fallbacky, kdybys to měl čistě (pro jistotu)
-    'datart': '/static/logos/datart.png', 
-    'planeo': '/static/logos/planeo.png',
-    'mironet': '/static/logos/mironet.png',
-    'default': '/static/logos/default.png',
+// Seznam i počty filtrů počítá server (/api/products) - prohlížeč drží jen zobrazené stránky
+let currentFilters = { categories: [], sources: [], priceMin: null, priceMax: null, minRating: null, sort: 'price_asc' };
+let productGrid = null;
+let pendingRequest = null;
+
+// Virtuální seznam - DOM uzly jen pro viditelné karty + rezerva, karty mají pevnou výšku
+const GRID = {
+    cardHeight: 230,    // px, stejné jako .virtual-grid .product-card v css/index.css
+    gap: 20,
+    minColumn: 280,     // jako grid-template-columns: minmax(280px, 1fr)
+    bufferRows: 4,      // řádky nad a pod oknem, které se vykreslí dopředu
+    maxPages: 40,       // načtené stránky v paměti, vzdálenější se zahodí
+};
+
+// Loga - URL (hashované přes asset_url) posílá šablona v data-logos, klíčem je obchod
+let logoMap = {};
+// source_site v DB je jméno spideru
+const shopOfSource = {
+    'dtrspider': 'datart',
+    'planeospider': 'planeo',
+    'mironetspider': 'mironet',
 };
 
+function logoUrl(source) {
+    const key = source ? source.toLowerCase() : '';
+    return logoMap[shopOfSource[key] || key] || null;
+}
+
 // --- 2. Tmavý Režim Logika (Funkční) ---
 function toggleDarkMode() {
     const body = document.body;
@@ -58,15 +69,15 @@ function loadDarkModeState() {
 
 function createProductCard(product) {
     // Hledáme logo podle toho, co je v DB
-    const sourceSiteKey = product.source_site ? product.source_site.toLowerCase() : 'default';
-    const logoSrc = logoMap[sourceSiteKey] || logoMap.default;
+    const logoSrc = logoUrl(product.source_site);
+    const logoHtml = logoSrc ? `<img src="${logoSrc}" alt="${product.source_site} logo" class="source-logo">` : '';
     const ratingHtml = product.rating ? `<span class="product-rating">⭐ ${product.rating}</span>` : '';
 
     return `
         <div class="product-card" data-category="${product.category || 'Neznámá'}" data-source="${product.source_site || 'Neznámý'}">
             <div class="product-info">
                 <div class="source-logo-container">
-                    <img src="${logoSrc}" alt="${product.source_site} logo" class="source-logo">
+                    ${logoHtml}
                 </div>
                 <h3 class="product-title">${product.title}</h3>
                 <p class="product-category">Kategorie: ${product.category || 'N/A'}</p>
@@ -80,29 +91,40 @@ function createProductCard(product) {
     `;
 }
 
-// Funkce pro filtry (zůstávají stejné)
-function getUniqueOptions(data, key) {
-    return [...new Set(data.map(item => item[key]).filter(Boolean))].sort(); 
-}
-
-function renderFilters() {
-    const categories = getUniqueOptions(allProducts, 'category');
-    const sources = getUniqueOptions(allProducts, 'source_site');
-    
+// Filtry z facet počtů serveru - počet u každé volby, zaškrtnuté zůstávají zaškrtnuté
+function renderFilters(facets) {
     const categoryContainer = document.getElementById('category-filters');
     const sourceContainer = document.getElementById('source-filters');
 
-    const createFilterHtml = (options, type) => options.map(option => `
-        <label>
-            <input type="checkbox" data-filter-type="${type}" value="${option}">
-            ${option}
+    const createFilterHtml = (options, type, selected) => options.map(option => `
+        <label class="${option.count ? '' : 'filter-empty'}">
+            <input type="checkbox" data-filter-type="${type}" value="${option.value}"
+                   ${selected.includes(option.value) ? 'checked' : ''}>
+            ${option.label} <span class="filter-count">(${option.count})</span>
         </label>
     `).join('');
 
-    if (categoryContainer) categoryContainer.innerHTML = createFilterHtml(categories, 'category');
-    if (sourceContainer) sourceContainer.innerHTML = createFilterHtml(sources, 'source');
+    const categories = [];
+    facets.category.forEach(top => {
+        categories.push({ value: top.slug, label: top.name, count: top.count });
+        top.children.forEach(child => categories.push({ value: child.slug, label: `– ${child.name}`, count: child.count }));
+    });
+    const sources = facets.source.map(option => ({ value: option.value, label: option.value, count: option.count }));
+
+    if (categoryContainer) categoryContainer.innerHTML = createFilterHtml(categories, 'category', currentFilters.categories);
+    if (sourceContainer) sourceContainer.innerHTML = createFilterHtml(sources, 'source', currentFilters.sources);
+
+    // Počet u "4+" = produkty s hodnocením aspoň 4 (server posílá kumulativní počty)
+    const ratingSelect = document.getElementById('min-rating');
+    if (ratingSelect) {
+        ratingSelect.innerHTML = '<option value="">Jakékoli</option>' + facets.rating.map(option => `
+            <option value="${option.min}" ${currentFilters.minRating === option.min ? 'selected' : ''}>
+                ${option.min}+ (${option.count})
+            </option>
+        `).join('');
+    }
 
-    document.querySelectorAll('.filter-options input').forEach(checkbox => {
+    document.querySelectorAll('.filter-options input[type="checkbox"]').forEach(checkbox => {
         checkbox.addEventListener('change', updateFilters);
     });
 }
@@ -121,49 +143,273 @@ function updateFilters(event) {
             filterArray.splice(index, 1);
         }
     }
-    filterAndRenderProducts(); 
+    loadProducts();
+}
+
+// Jedna karta jako DOM uzel - při scrollu se jen přeplní jiným produktem
+// Stejné třídy jako karty ze šablony index.html, odkaz vede na detail produktu
+function createCardNode() {
+    const node = document.createElement('a');
+    node.className = 'product-card';
+    node.innerHTML = `
+        <div class="product-info">
+            <div class="product-name"></div>
+            <div class="product-category"></div>
+            <span class="product-rating"></span>
+        </div>
+        <div class="product-footer">
+            <div class="product-price"></div>
+            <img class="source-logo" alt="">
+        </div>
+    `;
+    node.parts = {
+        logo: node.querySelector('.source-logo'),
+        title: node.querySelector('.product-name'),
+        category: node.querySelector('.product-category'),
+        rating: node.querySelector('.product-rating'),
+        price: node.querySelector('.product-price'),
+        link: node,
+    };
+    return node;
+}
+
+function fillCard(node, product) {
+    const parts = node.parts;
+    if (!product) {
+        // stránka se teprve načítá
+        node.classList.add('placeholder');
+        parts.title.textContent = 'Načítám…';
+        parts.category.textContent = '';
+        parts.rating.textContent = '';
+        parts.price.textContent = '';
+        parts.logo.removeAttribute('src');
+        parts.logo.hidden = true;
+        parts.link.removeAttribute('href');
+        return;
+    }
+    const logoSrc = logoUrl(product.source_site);
+    node.classList.remove('placeholder');
+    node.dataset.source = product.source_site || 'Neznámý';
+    if (logoSrc) {
+        parts.logo.src = logoSrc;
+    } else {
+        parts.logo.removeAttribute('src');
+    }
+    parts.logo.hidden = !logoSrc;
+    parts.logo.alt = `${product.source_site} logo`;
+    parts.title.textContent = product.title;
+    parts.category.textContent = product.category || 'Nezařazeno';
+    parts.rating.textContent = product.rating ? `⭐ ${product.rating}` : '';
+    parts.price.textContent = product.price ? `${Math.round(product.price).toLocaleString('cs-CZ')} Kč` : 'N/A';
+    parts.link.href = `/product/${encodeURIComponent(product.title)}`;
+}
+
+class VirtualGrid {
+    constructor(container, fetchPage) {
+        this.container = container;
+        this.fetchPage = fetchPage;
+        this.container.classList.add('virtual-grid');
+        this.active = new Map();     // index produktu -> uzel
+        this.free = [];              // uzly mimo okno, připravené k použití
+        this.reset(0, 1);
+
+        this.scheduled = false;
+        const schedule = () => this.schedule();
+        window.addEventListener('scroll', schedule, { passive: true });
+        window.addEventListener('resize', () => { this.layout(); schedule(); });
+    }
+
+    // Nové filtry - zahodí stránky, uzly zůstanou k dalšímu použití
+    reset(total, perPage) {
+        this.total = total;
+        this.perPage = perPage;
+        this.pages = new Map();      // číslo stránky -> pole produktů
+        this.loading = new Set();
+        this.generation = (this.generation || 0) + 1;
+        this.active.forEach(node => { node.dataset.index = ''; });
+        this.layout();
+        this.schedule();
+    }
+
+    setPage(page, products) {
+        this.pages.set(page, products);
+        this.loading.delete(page);
+        this.schedule();
+    }
+
+    layout() {
+        const width = this.container.clientWidth;
+        this.columns = Math.max(1, Math.floor((width + GRID.gap) / (GRID.minColumn + GRID.gap)));
+        this.columnWidth = (width - GRID.gap * (this.columns - 1)) / this.columns;
+        this.rowHeight = GRID.cardHeight + GRID.gap;
+        const rows = Math.ceil(this.total / this.columns);
+        this.container.style.height = `${Math.max(0, rows * this.rowHeight - GRID.gap)}px`;
+        this.active.forEach(node => { node.dataset.index = ''; });
+    }
+
+    // Jedno překreslení na snímek, ať scroll posílá událostí kolik chce
+    schedule() {
+        if (this.scheduled) return;
+        this.scheduled = true;
+        requestAnimationFrame(() => {
+            this.scheduled = false;
+            this.render();
+        });
+    }
+
+    product(index) {
+        const page = Math.floor(index / this.perPage) + 1;
+        const products = this.pages.get(page);
+        if (products) return products[index % this.perPage];
+        if (!this.loading.has(page)) {
+            this.loading.add(page);
+            const generation = this.generation;
+            this.fetchPage(page).then(data => {
+                if (data && generation === this.generation) this.setPage(page, data.products);
+            }).catch(() => this.loading.delete(page));
+        }
+        return null;
+    }
+
+    render() {
+        const top = -this.container.getBoundingClientRect().top;
+        const firstRow = Math.max(0, Math.floor(top / this.rowHeight) - GRID.bufferRows);
+        const lastRow = Math.floor((top + window.innerHeight) / this.rowHeight) + GRID.bufferRows;
+        const first = firstRow * this.columns;
+        const last = Math.min(this.total, (lastRow + 1) * this.columns);
+
+        // uzly, které odjely z okna, jdou do zásobníku
+        this.active.forEach((node, index) => {
+            if (index < first || index >= last) {
+                this.active.delete(index);
+                node.style.display = 'none';
+                this.free.push(node);
+            }
+        });
+
+        const added = document.createDocumentFragment();
+        for (let index = first; index < last; index++) {
+            let node = this.active.get(index);
+            if (!node) {
+                node = this.free.pop();
+                if (!node) {
+                    node = createCardNode();
+                    node.style.position = 'absolute';
+                    added.appendChild(node);
+                }
+                node.style.display = '';
+                this.active.set(index, node);
+            }
+            const product = this.product(index);
+            // přeplnit jen když se změnil produkt nebo dorazila jeho stránka
+            const state = product ? `${index}` : `${index}?`;
+            if (node.dataset.index !== state) {
+                node.dataset.index = state;
+                fillCard(node, product);
+                const row = Math.floor(index / this.columns);
+                const column = index % this.columns;
+                node.style.width = `${this.columnWidth}px`;
+                node.style.transform = `translate(${column * (this.columnWidth + GRID.gap)}px, ${row * this.rowHeight}px)`;
+            }
+        }
+        this.container.appendChild(added);
+        this.dropFarPages(first);
+    }
+
+    // Dlouhé scrollování - v paměti zůstane jen okolí okna
+    dropFarPages(first) {
+        if (this.pages.size <= GRID.maxPages) return;
+        const current = Math.floor(first / this.perPage) + 1;
+        [...this.pages.keys()]
+            .sort((a, b) => Math.abs(b - current) - Math.abs(a - current))
+            .slice(0, this.pages.size - GRID.maxPages)
+            .forEach(page => this.pages.delete(page));
+    }
 }
 
-function filterAndRenderProducts() {
+function renderProducts(total, perPage, products) {
     const listContainer = document.getElementById('product-list');
     if (!listContainer) return;
-    
-    const activeCategories = currentFilters.categories.length > 0;
-    const activeSources = currentFilters.sources.length > 0;
 
-    const filteredData = allProducts.filter(product => {
-        const matchesCategory = !activeCategories || currentFilters.categories.includes(product.category);
-        const matchesSource = !activeSources || currentFilters.sources.includes(product.source_site);
-        return matchesCategory && matchesSource;
-    });
+    if (!productGrid) {
+        // karty vykreslené serverem nahradí virtuální mřížka
+        listContainer.textContent = '';
+        productGrid = new VirtualGrid(listContainer, page => fetchProducts(page));
+    }
+    productGrid.reset(total, perPage);
+    productGrid.setPage(1, products);
+    // nové výsledky od začátku seznamu
+    const listTop = listContainer.getBoundingClientRect().top + window.scrollY;
+    if (window.scrollY > listTop) window.scrollTo({ top: listTop });
 
-    listContainer.innerHTML = filteredData.map(createProductCard).join('');
-    
-    const resultsHeader = document.querySelector('.results-area h2');
+    const resultsHeader = document.querySelector('.results-area .results-title');
     if (resultsHeader) {
-        resultsHeader.textContent = `Nalezené produkty (${filteredData.length})`;
+        resultsHeader.textContent = `Nalezené produkty (${total})`;
+        resultsHeader.hidden = false;
     }
 }
 
 
 // --- 4. Načítání Dat z Backendu (DB) ---
 
-async function loadDataFromDB() {
+function buildQuery(page) {
+    const params = new URLSearchParams();
+    currentFilters.categories.forEach(slug => params.append('category', slug));
+    currentFilters.sources.forEach(source => params.append('source', source));
+    if (currentFilters.priceMin !== null) params.set('price_min', currentFilters.priceMin);
+    if (currentFilters.priceMax !== null) params.set('price_max', currentFilters.priceMax);
+    if (currentFilters.minRating !== null) params.set('min_rating', currentFilters.minRating);
+    params.set('sort', currentFilters.sort);
+    params.set('page', page);
+    return params.toString();
+}
+
+async function fetchProducts(page, signal) {
+    const response = await fetch(`/api/products?${buildQuery(page)}`, { signal });
+    if (!response.ok) throw new Error('Chyba při načítání API');
+    return response.json();
+}
+
+// Nové filtry -> první stránka + počty; další stránky si řekne VirtualGrid při scrollu
+async function loadProducts() {
+    // Rychlé klikání - starší odpověď se zahodí
+    if (pendingRequest) pendingRequest.abort();
+    pendingRequest = new AbortController();
+
     try {
-        const response = await fetch('/api/products'); 
-        if (!response.ok) throw new Error('Chyba při načítání API');
-        
-        const products = await response.json();
-        allProducts = products;
-        
-        renderFilters();
-        filterAndRenderProducts(); 
-        
+        const data = await fetchProducts(1, pendingRequest.signal);
+        renderFilters(data.facets);
+        renderProducts(data.total, data.per_page, data.products);
+
     } catch (error) {
-        console.error("Chyba při inicializaci dat:", error);
+        if (error.name !== 'AbortError') {
+            console.error("Chyba při načítání produktů:", error);
+        }
     }
 }
 
+function readNumber(id) {
+    const input = document.getElementById(id);
+    const value = input ? parseFloat(input.value) : NaN;
+    return Number.isNaN(value) ? null : value;
+}
+
+// Cena od/do, minimální hodnocení a řazení (pokud jsou na stránce)
+function setupRangeFilters() {
+    ['price-min', 'price-max', 'min-rating', 'sort-select'].forEach(id => {
+        const input = document.getElementById(id);
+        if (!input) return;
+        input.addEventListener('change', () => {
+            currentFilters.priceMin = readNumber('price-min');
+            currentFilters.priceMax = readNumber('price-max');
+            currentFilters.minRating = readNumber('min-rating');
+            const sort = document.getElementById('sort-select');
+            if (sort) currentFilters.sort = sort.value;
+            loadProducts();
+        });
+    });
+}
+
 
 // --- 5. Logika Vyhledávání (Opraveno vkládání do modálu) ---
 
@@ -251,12 +497,20 @@ document.addEventListener('DOMContentLoaded', () => {
     const darkModeToggle = document.getElementById('dark-mode-toggle');
     if (darkModeToggle) {
         darkModeToggle.addEventListener('click', toggleDarkMode);
-    } else {
-        console.error("Chyba: Tlačítko tmavého režimu (ID: dark-mode-toggle) nebylo nalezeno.");
     }
 
-    // 2. Načtení dat z DB (pro filtry a hlavní seznam)
-    loadDataFromDB(); 
+    // 2. Facety a virtuální seznam - jen na výpisu bez fulltextu (/api/products hledání nezná)
+    const catalogue = document.getElementById('catalogue');
+    if (catalogue && catalogue.dataset.logos) logoMap = JSON.parse(catalogue.dataset.logos);
+    if (catalogue && catalogue.dataset.facets !== 'off') {
+        const category = catalogue.dataset.category;
+        if (category && category !== 'all') currentFilters.categories.push(category);
+        if (catalogue.dataset.sort) currentFilters.sort = catalogue.dataset.sort;
+        const panel = catalogue.querySelector('.facet-panel');
+        if (panel) panel.hidden = false;
+        setupRangeFilters();
+        loadProducts();
+    }
 
     // 3. PŘIPOJENÍ VYHLEDÁVÁNÍ (Enter v poli)
     const searchInput = document.getElementById('search-input');
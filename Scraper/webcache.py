@@ -0,0 +1,73 @@
+"""
+Response caching for the web app.
+
+Pages and query results only change when a crawl finishes, so everything is
+cached against the data version that ScraperPipeline bumps in the 'meta'
+table at the end of each crawl.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a size cap, tied to one data version"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # Nova data z crawlu (nebo DB obnovena ze zalohy) -> vse co mame je neplatne
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, version):
+        """Store `value` - ignored unless `version` is the current one"""
+        with self._lock:
+            # Request, ktery cetl data pred zmenou verze, dopocital az po ni -
+            # jeho vysledek uz neplati a cache nesmi vratit na starou verzi
+            if version != self.version:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'version': self.version,
+            }
+
+
+def make_etag(version, key):
+    """Strong ETag for a cache key at a given data version"""
+    raw = repr((version, key)).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:20]